@@ -2,6 +2,8 @@ from fastapi import FastAPI, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 from backend.api import routes, websocket
 from backend.core.logger import get_logger
+from backend.db.storage import get_storage
+from backend.orchestrator import weights
 
 logger = get_logger(__name__)
 
@@ -43,6 +45,10 @@ async def startup():
     logger.info("API server starting up")
     # Initialize connection manager
     websocket.manager = websocket.ConnectionManager()
+    # Index nodes saved before the secondary indexes existed
+    await get_storage().ensure_indexes()
+    # Scheduler weights changed at runtime outlive restarts
+    await weights.load()
 
 
 @app.on_event("shutdown")
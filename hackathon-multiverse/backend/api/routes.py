@@ -1,14 +1,14 @@
 from fastapi import APIRouter, HTTPException
 from backend.core.schemas import FocusZone, SettingsUpdate, Node, SeedRequest
-from backend.orchestrator.scheduler import boost_or_seed
+from backend.orchestrator import weights
+from backend.orchestrator.scheduler import boost_or_seed, seed_terms
 from backend.config.settings import settings
 from backend.core.logger import get_logger
-from backend.db.redis_client import get_redis
-from backend.db.node_store import get, save
-from backend.db.frontier import push
+from backend.db.storage import get_storage
 from backend.core.utils import uuid_str
-from backend.core.embeddings import embed, to_xy
-from backend.core.conversation import get_conversation_path, format_dialogue_history
+from backend.core import layout
+from backend.core.embeddings import embed_async, to_xy_many_async
+from backend.core.conversation import get_ancestor_ids_async, get_dialogue_history_async
 import asyncio
 import subprocess
 import os
@@ -37,22 +37,17 @@ async def focus_zone(payload: FocusZone):
 @router.patch("/settings")
 async def update_settings(updates: SettingsUpdate):
     """
-    Update lambda values at runtime.
+    Update lambda values at runtime, in every worker, and re-score the frontier.
     """
     try:
         # Update only provided values
-        if updates.lambda_trend is not None:
-            settings.lambda_trend = updates.lambda_trend
-        if updates.lambda_sim is not None:
-            settings.lambda_sim = updates.lambda_sim
-        if updates.lambda_depth is not None:
-            settings.lambda_depth = updates.lambda_depth
+        values = updates.model_dump(exclude_none=True)
+        if values:
+            await weights.update(values)
 
         # Return full settings
         return {
-            "lambda_trend": settings.lambda_trend,
-            "lambda_sim": settings.lambda_sim,
-            "lambda_depth": settings.lambda_depth,
+            **weights.current(),
             "redis_url": settings.redis_url,
             "log_level": settings.log_level,
         }
@@ -67,9 +62,7 @@ async def get_settings():
     Get current settings.
     """
     return {
-        "lambda_trend": settings.lambda_trend,
-        "lambda_sim": settings.lambda_sim,
-        "lambda_depth": settings.lambda_depth,
+        **await weights.load(),
         "redis_url": settings.redis_url,
         "log_level": settings.log_level,
     }
@@ -80,24 +73,9 @@ async def get_graph():
     """
     Dump all nodes with full conversation data for frontend – UI calls once on load.
     """
-    r = get_redis()
-    nodes = []
-    for key in r.keys("node:*"):
-        node = get(key.replace("node:", ""))
-        if node:
-            nodes.append(
-                {
-                    "id": node.id,
-                    "xy": node.xy,
-                    "score": node.score,
-                    "parent": node.parent,
-                    "depth": node.depth,
-                    "prompt": node.prompt,
-                    "reply": node.reply,
-                    "emb": node.emb,
-                }
-            )
-    return nodes
+    fields = {"id", "xy", "score", "parent", "depth", "prompt", "reply", "emb"}
+    # model_dump turns packed embeddings back into plain float lists
+    return [node.model_dump(include=fields) async for node in get_storage().iter_nodes(fields=fields)]
 
 
 @router.get("/conversation/{node_id}")
@@ -107,24 +85,24 @@ async def get_conversation(node_id: str):
     Returns the complete dialogue from root to this node.
     """
     try:
-        # Get the full conversation path
-        conversation_path = get_conversation_path(node_id)
+        # Get the materialized root-to-node path
+        ancestor_ids = await get_ancestor_ids_async(node_id)
         
-        if not conversation_path:
+        if not ancestor_ids:
             return {"error": "Node not found"}
         
-        # Format as dialogue history
-        dialogue_history = format_dialogue_history(conversation_path)
+        # Dialogue history, reusing the cached prefix the worker built
+        dialogue_history = await get_dialogue_history_async(node_id, ancestor_ids)
         
         # Get the target node details
-        target_node = get(node_id)
+        target_node = await get_storage().get(node_id, fields=["score"])
         
         return {
             "node_id": node_id,
-            "depth": len(conversation_path) - 1,
+            "depth": len(ancestor_ids) - 1,
             "score": target_node.score if target_node else None,
             "conversation": dialogue_history,
-            "nodes_in_path": len(conversation_path)
+            "nodes_in_path": len(ancestor_ids)
         }
     except Exception as e:
         return {"error": f"Failed to get conversation: {str(e)}"}
@@ -139,8 +117,9 @@ async def seed(request: SeedRequest):
         prompt = request.prompt
         
         # Generate embedding and coordinates
-        prompt_embedding = embed(prompt)
-        coordinates = list(to_xy(prompt_embedding))
+        prompt_embedding = await embed_async(prompt)
+        await layout.sync()
+        coordinates = list((await to_xy_many_async([prompt_embedding]))[0])
         
         node = Node(
             id=uuid_str(),
@@ -151,8 +130,9 @@ async def seed(request: SeedRequest):
             xy=coordinates,
         )
         
-        save(node)
-        push(node.id, 1.0)
+        storage = get_storage()
+        await storage.save(node)
+        await storage.push(node.id, 1.0, seed_terms(1.0))
         
         logger.info(f"Seeded conversation with prompt: {prompt[:50]}...")
         return {"seed_id": node.id, "message": "Conversation seeded successfully"}
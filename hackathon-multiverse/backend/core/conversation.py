@@ -1,24 +1,154 @@
-from typing import List, Dict
-from backend.core.schemas import Node
-from backend.db.node_store import get
+import json
+from typing import List, Dict, Optional
+from backend.config.settings import settings
+from backend.core.schemas import NodeSummary
+from backend.db import async_node_store
+from backend.db.node_store import ANCESTORS_PREFIX, DIALOGUE_PREFIX, NODE_PREFIX, get_many
+from backend.db.redis_client import get_async_redis, get_redis
+from backend.db.storage import get_storage
+from backend.db.write_buffer import writer
 
 
-def get_conversation_path(node_id: str) -> List[Node]:
-    """Trace back from a node to the root, building full conversation path."""
-    path = []
-    current_node = get(node_id)
-    
-    while current_node:
-        path.append(current_node)
-        if current_node.parent:
-            current_node = get(current_node.parent)
+# The only fields a conversation path needs
+PATH_FIELDS = ["parent", "prompt", "reply"]
+
+
+def _embedded() -> bool:
+    # Embedded engines resolve a whole path in one local query, no caches needed
+    return settings.storage_backend != "redis"
+
+
+def _materialize(prefix: List[str], walked: List[str]) -> Dict[str, List[str]]:
+    """Ancestor paths for nodes walked leaf first down from a known prefix."""
+    paths = {}
+    path = list(prefix)
+    for node_id in reversed(walked):
+        path = path + [node_id]
+        paths[node_id] = path
+    return paths
+
+
+class _AncestorWalk:
+    """Parent walk from a node up to the first cached path, shared by the sync
+    and async lookups: each step queues one node's lookups on a pipeline and
+    takes their replies; the paths found are cached on the way out."""
+
+    def __init__(self, node_id: str):
+        self.node_id = node_id
+        self.current: Optional[str] = node_id
+        self.walked: List[str] = []
+        self.prefix: List[str] = []
+
+    def queue(self, pipe) -> None:
+        pipe.get(ANCESTORS_PREFIX + self.current)
+        pipe.hmget(NODE_PREFIX + self.current, ["id", "parent"])
+
+    def step(self, replies: list) -> None:
+        cached, (found, parent) = replies
+        if cached is not None:
+            self.prefix, self.current = json.loads(cached), None
+        elif found is None:
+            self.current = None  # a missing ancestor cuts the path, as the old parent walk did
         else:
-            break
-    
-    return list(reversed(path))  # Root to leaf order
+            self.walked.append(self.current)
+            self.current = parent
+
+    def store(self, pipe) -> List[str]:
+        """Queue the walked nodes' paths, cached as long as dialogues; returns the node's path."""
+        paths = _materialize(self.prefix, self.walked)
+        for nid, path in paths.items():
+            pipe.set(ANCESTORS_PREFIX + nid, json.dumps(path), ex=settings.dialogue_cache_ttl)
+        return paths.get(self.node_id, self.prefix)
+
+
+def get_ancestor_ids(node_id: str) -> List[str]:
+    """Root-to-node id path, walking parents only up to the first cached path."""
+    r = get_redis()
+    walk = _AncestorWalk(node_id)
+    while walk.current:
+        pipe = r.pipeline(transaction=False)
+        walk.queue(pipe)
+        walk.step(pipe.execute())
+    pipe = r.pipeline(transaction=False)
+    path = walk.store(pipe)
+    if len(pipe):
+        pipe.execute()
+    return path
+
+
+async def get_ancestor_ids_async(node_id: str) -> List[str]:
+    """Async version of get_ancestor_ids for event-loop callers."""
+    if _embedded():
+        return [node.id for node in await get_storage().get_path(node_id, ["parent"])]
+    r = get_async_redis()
+    walk = _AncestorWalk(node_id)
+    while walk.current:
+        pipe = r.pipeline(transaction=False)
+        walk.queue(pipe)
+        walk.step(await pipe.execute())
+    pipe = r.pipeline(transaction=False)
+    path = walk.store(pipe)
+    if len(pipe):
+        await pipe.execute()
+    return path
+
+
+def get_conversation_path(node_id: str) -> List[NodeSummary]:
+    """Load the conversation path from the root to a node, root first."""
+    return get_many(get_ancestor_ids(node_id), fields=PATH_FIELDS)
+
+
+async def get_conversation_path_async(node_id: str) -> List[NodeSummary]:
+    """Async version of get_conversation_path for event-loop callers."""
+    if _embedded():
+        return await get_storage().get_path(node_id, PATH_FIELDS)
+    return await async_node_store.get_many(await get_ancestor_ids_async(node_id), fields=PATH_FIELDS)
+
+
+async def get_dialogue_history_async(
+    node_id: str, ancestor_ids: Optional[List[str]] = None
+) -> List[Dict[str, str]]:
+    """Dialogue from the root to a node, reusing the deepest cached prefix."""
+    if _embedded():
+        return format_dialogue_history(await get_storage().get_path(node_id, PATH_FIELDS))
+    r = get_async_redis()
+    cached = await r.get(DIALOGUE_PREFIX + node_id)
+    if cached is not None:
+        return json.loads(cached)
+
+    if ancestor_ids is None:
+        ancestor_ids = await get_ancestor_ids_async(node_id)
+    if not ancestor_ids:
+        return []
+
+    # Find the deepest ancestor whose history is still cached
+    pipe = r.pipeline(transaction=False)
+    for ancestor_id in ancestor_ids[:-1]:
+        pipe.exists(DIALOGUE_PREFIX + ancestor_id)
+    hits = [i for i, exists in enumerate(await pipe.execute()) if exists]
+    start, dialogue = 0, []
+    if hits:
+        start = hits[-1] + 1
+        dialogue = json.loads(await r.get(DIALOGUE_PREFIX + ancestor_ids[hits[-1]]) or "[]")
+
+    path = await async_node_store.get_many(ancestor_ids[start:], fields=PATH_FIELDS)
+    dialogue = dialogue + format_dialogue_history(path)
+    await r.set(DIALOGUE_PREFIX + node_id, json.dumps(dialogue), ex=settings.dialogue_cache_ttl)
+    return dialogue
+
+
+async def cache_conversation_async(
+    node_id: str, ancestor_ids: List[str], dialogue: List[Dict[str, str]]
+) -> None:
+    """Record a new node's ancestor path and dialogue so its children skip the walk;
+    inside a worker batch the writes are queued on its write buffer."""
+    if _embedded():
+        return
+    entries = {ANCESTORS_PREFIX + node_id: json.dumps(ancestor_ids), DIALOGUE_PREFIX + node_id: json.dumps(dialogue)}
+    await writer().cache(entries, ttl=settings.dialogue_cache_ttl)
 
 
-def format_dialogue_history(conversation_path: List[Node]) -> List[Dict[str, str]]:
+def format_dialogue_history(conversation_path: List[NodeSummary]) -> List[Dict[str, str]]:
     """Convert conversation path to alternating user/assistant messages."""
     dialogue = []
     
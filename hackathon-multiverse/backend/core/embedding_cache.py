@@ -0,0 +1,180 @@
+"""Content-addressed embedding cache shared by every embedding call site.
+
+Vectors are keyed by a hash of (model, text). Lookups go through an
+in-process LRU of settings.embedding_cache_size entries, then Redis, where
+vectors are stored as packed float32 with a TTL that each hit refreshes.
+Hit and miss counts are kept per process and added to the stats:embcache
+hash on the next pipeline that goes to Redis anyway, so a local hit costs
+no round trip.
+
+The Redis tier is only used with the Redis storage backend; embedded
+backends keep the LRU alone. If Redis cannot be reached, lookups count as
+misses and stores stay local, so callers fall back to computing vectors.
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+from redis.exceptions import RedisError
+from backend.config.settings import settings
+from backend.core.logger import get_logger
+from backend.core.packed_embedding import PackedEmbedding, pack
+from backend.db.redis_client import get_async_redis, get_redis
+
+logger = get_logger(__name__)
+
+CACHE_PREFIX = "embcache:"
+STATS_KEY = "stats:embcache"  # hash: local_hits, redis_hits, misses
+
+
+def _shared() -> bool:
+    """Whether the Redis tier is in use (the Redis storage backend is)."""
+    return settings.storage_backend == "redis"
+
+
+def cache_key(model: str, text: str) -> str:
+    digest = hashlib.blake2b(f"{model}\0{text}".encode(), digest_size=16).hexdigest()
+    return CACHE_PREFIX + digest
+
+
+class EmbeddingCache:
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = settings.embedding_cache_size if max_entries is None else max_entries
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.counts = {"local_hits": 0, "redis_hits": 0, "misses": 0}
+        self._unreported: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def stats(self) -> dict:
+        """This process's hit/miss counts and hit rate."""
+        lookups = sum(self.counts.values())
+        hits = self.counts["local_hits"] + self.counts["redis_hits"]
+        return {**self.counts, "entries": len(self._lru), "hit_rate": hits / lookups if lookups else 0.0}
+
+    def clear(self) -> None:
+        """Drop the in-process tier (Redis entries expire on their own)."""
+        self._lru.clear()
+
+    def _remember(self, key: str, emb: List[float]) -> None:
+        if self.max_entries <= 0:
+            return
+        self._lru[key] = emb
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def _count(self, name: str, count: int) -> None:
+        if count:
+            self.counts[name] += count
+            self._unreported[name] = self._unreported.get(name, 0) + count
+
+    def _local(self, keys: List[str]) -> tuple:
+        """Vectors from the LRU, and the indexes it does not have."""
+        found = []
+        for key in keys:
+            emb = self._lru.get(key)
+            if emb is not None:
+                self._lru.move_to_end(key)
+            found.append(emb)
+        missing = [i for i, emb in enumerate(found) if emb is None]
+        self._count("local_hits", len(keys) - len(missing))
+        return found, missing
+
+    def _queue_lookup(self, pipe, keys: List[str]) -> None:
+        for key in keys:
+            pipe.getex(key, ex=settings.embedding_cache_ttl)
+        self._queue_stats(pipe)
+
+    def _queue_stats(self, pipe) -> None:
+        for name, count in self._unreported.items():
+            pipe.hincrby(STATS_KEY, name, count)
+        self._unreported = {}
+
+    def _merge(self, keys: List[str], found: List, missing: List[int], replies: List) -> List[Optional[List[float]]]:
+        hits = 0
+        # Stats increments queued after the lookups add replies past the end
+        for i, blob in zip(missing, replies, strict=False):
+            if blob is not None:
+                found[i] = PackedEmbedding(blob).tolist()
+                self._remember(keys[i], found[i])
+                hits += 1
+        self._count("redis_hits", hits)
+        self._count("misses", len(missing) - hits)
+        return found
+
+    def _queue_store(self, pipe, keys: List[str], embeddings: Sequence[List[float]]) -> None:
+        for key, emb in zip(keys, embeddings, strict=True):
+            pipe.set(key, pack(emb, "f4"), ex=settings.embedding_cache_ttl)
+        self._queue_stats(pipe)
+
+    def _store_local(self, keys: List[str], embeddings: Sequence[List[float]]) -> None:
+        for key, emb in zip(keys, embeddings, strict=True):
+            self._remember(key, list(emb))
+
+    def _unreachable(self, error: RedisError, keys: List[str], found: List, missing: List[int]) -> List[Optional[List[float]]]:
+        logger.warning(f"Embedding cache unavailable: {error}")
+        return self._merge(keys, found, missing, [None] * len(missing))
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Cached vectors for texts, None where neither tier has one."""
+        keys = [cache_key(model, text) for text in texts]
+        found, missing = self._local(keys)
+        if not missing or not _shared():
+            return self._merge(keys, found, missing, [None] * len(missing))
+        pipe = get_redis(decode_responses=False).pipeline(transaction=False)
+        self._queue_lookup(pipe, [keys[i] for i in missing])
+        try:
+            replies = pipe.execute()
+        except RedisError as e:
+            return self._unreachable(e, keys, found, missing)
+        return self._merge(keys, found, missing, replies)
+
+    async def get_many_async(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        keys = [cache_key(model, text) for text in texts]
+        found, missing = self._local(keys)
+        if not missing or not _shared():
+            return self._merge(keys, found, missing, [None] * len(missing))
+        pipe = get_async_redis(decode_responses=False).pipeline(transaction=False)
+        self._queue_lookup(pipe, [keys[i] for i in missing])
+        try:
+            replies = await pipe.execute()
+        except RedisError as e:
+            return self._unreachable(e, keys, found, missing)
+        return self._merge(keys, found, missing, replies)
+
+    def put_many(self, model: str, texts: Sequence[str], embeddings: Sequence[List[float]]) -> None:
+        """Store freshly computed vectors in both tiers."""
+        keys = [cache_key(model, text) for text in texts]
+        self._store_local(keys, embeddings)
+        if not _shared():
+            return
+        pipe = get_redis(decode_responses=False).pipeline(transaction=False)
+        self._queue_store(pipe, keys, embeddings)
+        try:
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Embedding cache unavailable: {e}")
+
+    async def put_many_async(self, model: str, texts: Sequence[str], embeddings: Sequence[List[float]]) -> None:
+        keys = [cache_key(model, text) for text in texts]
+        self._store_local(keys, embeddings)
+        if not _shared():
+            return
+        pipe = get_async_redis(decode_responses=False).pipeline(transaction=False)
+        self._queue_store(pipe, keys, embeddings)
+        try:
+            await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Embedding cache unavailable: {e}")
+
+
+def redis_stats() -> Dict[str, int]:
+    """Hit/miss counts reported by every process so far (none without the Redis tier)."""
+    if not _shared():
+        return {}
+    return {name: int(value) for name, value in get_redis().hgetall(STATS_KEY).items()}
+
+
+cache = EmbeddingCache()
@@ -0,0 +1,130 @@
+"""In-memory matrix of every node's embedding for vectorized novelty scoring.
+
+Rows are unit-normalized float32 once, when a node is added, so the cosine
+similarity of a new embedding to the whole graph (or to any reference set
+of nodes) is a single matrix-vector product. The matrix grows by doubling,
+so appending the nodes a worker saves is amortized O(dim). sync() follows
+the storage node log, so catching up costs one read of what changed.
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+INITIAL_CAPACITY = 1024
+
+
+def _unit(vec: Sequence[float]) -> Optional[np.ndarray]:
+    row = np.asarray(vec, dtype=np.float32)
+    norm = np.linalg.norm(row)
+    return row / norm if norm > 0 else None
+
+
+class EmbeddingIndex:
+    def __init__(self):
+        self.ids: List[str] = []
+        self._rows: Optional[np.ndarray] = None  # (capacity, dim); the first len(self) rows are used
+        self._positions: Dict[str, int] = {}
+        self._skipped: Set[str] = set()  # stored nodes without a usable embedding
+        self._cursor: Optional[str] = None  # storage node log position (see Storage.node_changes)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._positions
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """(n, dim) unit-length rows, in the order of self.ids."""
+        if self._rows is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return self._rows[:len(self.ids)]
+
+    def add(self, node_id: str, emb: Optional[Sequence[float]]) -> bool:
+        """Append a node's embedding; returns False for known ids, zero vectors and
+        embeddings of another width than the indexed ones."""
+        if emb is None or not len(emb) or node_id in self._positions:
+            return False
+        row = _unit(emb)
+        if row is None:
+            return False
+        if self._rows is None:
+            self._rows = np.empty((INITIAL_CAPACITY, len(row)), dtype=np.float32)
+        elif len(row) != self._rows.shape[1]:
+            return False
+        elif len(self.ids) == len(self._rows):
+            self._rows = np.concatenate([self._rows, np.empty_like(self._rows)])
+        self._rows[len(self.ids)] = row
+        self._positions[node_id] = len(self.ids)
+        self.ids.append(node_id)
+        return True
+
+    def add_many(self, pairs: Iterable[Tuple[str, Optional[Sequence[float]]]]) -> int:
+        return sum(self.add(node_id, emb) for node_id, emb in pairs)
+
+    def retain(self, node_ids: Iterable[str]) -> int:
+        """Drop every node not in node_ids (e.g. pruned ones); returns how many were dropped."""
+        keep = set(node_ids)
+        self._skipped &= keep
+        kept = [i for i, node_id in enumerate(self.ids) if node_id in keep]
+        dropped = len(self.ids) - len(kept)
+        if dropped:
+            self._rows[:len(kept)] = self._rows[kept]
+            self.ids = [self.ids[i] for i in kept]
+            self._positions = {node_id: i for i, node_id in enumerate(self.ids)}
+        return dropped
+
+    def remove(self, node_ids: Iterable[str]) -> int:
+        """Drop deleted nodes; returns how many were indexed."""
+        gone = set(node_ids) & (set(self._positions) | self._skipped)
+        if not gone:
+            return 0
+        self._skipped -= gone
+        return self.retain(node_id for node_id in self.ids if node_id not in gone)
+
+    def similarities(self, vec: Sequence[float], reference: Optional[Iterable[str]] = None) -> np.ndarray:
+        """Cosine similarity of vec to every indexed node, or to the indexed nodes among reference."""
+        matrix = self.matrix
+        if reference is not None:
+            matrix = matrix[[self._positions[i] for i in reference if i in self._positions]]
+        query = _unit(vec) if vec is not None and len(vec) else None
+        if query is None or len(matrix) == 0 or len(query) != matrix.shape[1]:
+            return np.empty(0, dtype=np.float32)
+        return matrix @ query
+
+    def max_similarity(self, vec: Sequence[float], reference: Optional[Iterable[str]] = None) -> float:
+        """Similarity to the nearest node: 1.0 for a duplicate, near 0 for a new direction."""
+        sims = self.similarities(vec, reference)
+        return float(sims.max()) if len(sims) else 0.0
+
+    def knn_density(self, vec: Sequence[float], k: int, reference: Optional[Iterable[str]] = None) -> float:
+        """Mean similarity to the k nearest nodes: how crowded vec's neighbourhood is."""
+        sims = self.similarities(vec, reference)
+        if not len(sims) or k <= 0:
+            return 0.0
+        if k < len(sims):
+            sims = np.partition(sims, len(sims) - k)[-k:]
+        return float(sims.mean())
+
+    async def sync(self, storage) -> int:
+        """Add the nodes stored since the last sync (by other workers, seeds or the
+        API) and drop deleted ones; returns how many were added. Changes are read
+        from the storage node log; the first sync, or one the log no longer
+        reaches back for, scans every node instead."""
+        changes = None if self._cursor is None else await storage.node_changes(self._cursor)
+        if changes is None:
+            self._cursor = await storage.node_log_cursor()
+            ids = [node.id async for node in storage.iter_nodes(fields=["depth"])]
+            self.retain(ids)
+        else:
+            self._cursor, ids, removed = changes
+            self.remove(removed)
+        missing = [node_id for node_id in dict.fromkeys(ids) if node_id not in self._positions and node_id not in self._skipped]
+        added = 0
+        for node in await storage.get_many(missing, fields=["emb"]):
+            if self.add(node.id, node.emb):
+                added += 1
+            else:
+                self._skipped.add(node.id)
+        return added
@@ -1,183 +1,400 @@
+import asyncio
+import threading
+import time
+import weakref
 import openai
 import numpy as np
 import pickle
-import os
-from typing import List, Tuple, Optional
-from umap import UMAP
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple, Optional
+from backend.core import layout
+from backend.core.embedding_cache import cache
+from backend.core.local_embeddings import embed_local
 from backend.core.logger import get_logger
+from backend.core.projection import IncrementalProjector
 from backend.config.settings import settings
-from backend.db.node_store import get_all_nodes
+from backend.db.storage import get_storage
 
 logger = get_logger(__name__)
 
-# Global UMAP reducer instance
-_reducer: Optional[UMAP] = None
-_reducer_file = "umap_reducer.pkl"
+# Incremental projector, the streaming alternative to UMAP. Its state is
+# shared through storage as a versioned blob, like layout versions: processes
+# swap in newer versions before projecting and publish their own updates
+# with a compare-and-set.
+PROJECTOR_STATE = "projector"
+_projector: Optional[IncrementalProjector] = None
+_projector_version = 0
+_projector_update: Optional[bytes] = None  # pickled state not saved yet
+PROJECTION_ENGINES = ("umap", "incremental")
+
+# Projections run one at a time (reducers and the projector are not
+# thread-safe); to_xy_many_async runs them on a dedicated thread so the
+# event loop keeps serving LLM I/O meanwhile
+_projection_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="to_xy")
+_projection_lock = threading.Lock()
+_projection_counts = {"calls": 0, "points": 0, "seconds": 0.0}
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_PROVIDERS = ("openai", "local")
+MAX_INPUTS = 2048  # texts the embeddings API accepts per request
+
+# Pooled clients: one sync client per process, one async client per event loop
+_client: Optional[openai.OpenAI] = None
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, openai.AsyncOpenAI]" = weakref.WeakKeyDictionary()
+
+
+def _get_client() -> openai.OpenAI:
+    global _client
+    if _client is None:
+        _client = openai.OpenAI(api_key=settings.openai_api_key, timeout=30.0)
+    return _client
+
+
+def _get_async_client() -> openai.AsyncOpenAI:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = openai.AsyncOpenAI(api_key=settings.openai_api_key, timeout=30.0)
+    return client
+
+
+def _local() -> bool:
+    """Whether settings select the offline provider (which needs no batching or cache)."""
+    provider = settings.embedding_provider
+    if provider not in EMBEDDING_PROVIDERS:
+        raise ValueError(f"Unknown embedding provider: {provider}")
+    return provider == "local"
+
+
+def _batches(texts: List[str]) -> List[List[str]]:
+    size = max(1, min(settings.embedding_batch_size, MAX_INPUTS))
+    return [texts[start:start + size] for start in range(0, len(texts), size)]
 
 
 def embed(text: str) -> List[float]:
     """Generate semantic embeddings using OpenAI's text-embedding-3-small model."""
+    return embed_many([text])[0]
+
+
+def _fill(texts: List[str], cached: List[Optional[List[float]]], fresh: List[List[float]]) -> List[List[float]]:
+    """Merge cache hits with vectors for the distinct missing texts, in order."""
+    fresh_by_text = dict(zip(_missing(texts, cached), fresh, strict=True))
+    return [emb if emb is not None else fresh_by_text[text] for text, emb in zip(texts, cached, strict=True)]
+
+
+def _missing(texts: List[str], cached: List[Optional[List[float]]]) -> List[str]:
+    return list(dict.fromkeys(text for text, emb in zip(texts, cached, strict=True) if emb is None))
+
+
+def embed_many(texts: List[str]) -> List[List[float]]:
+    """Embed texts, serving repeats from the cache and requesting the rest
+    with as few API calls as the input limit allows."""
+    texts = list(texts)
+    if _local():
+        return embed_local(texts)
+    cached = cache.get_many(EMBEDDING_MODEL, texts)
+    fresh = []
+    for batch in _batches(_missing(texts, cached)):
+        try:
+            response = _get_client().embeddings.create(model=EMBEDDING_MODEL, input=batch)
+            embeddings = [item.embedding for item in response.data]
+            cache.put_many(EMBEDDING_MODEL, batch, embeddings)
+        except Exception as e:
+            logger.warning(f"OpenAI embedding failed: {e}, using local embeddings")
+            embeddings = embed_local(batch)
+        fresh.extend(embeddings)
+    return _fill(texts, cached, fresh)
+
+
+async def embed_many_async(texts: List[str]) -> List[List[float]]:
+    """Async embed_many; missing batches are requested concurrently."""
+    texts = list(texts)
+    if _local():
+        return embed_local(texts)
+    cached = await cache.get_many_async(EMBEDDING_MODEL, texts)
+    batches = await asyncio.gather(*map(_embed_batch_async, _batches(_missing(texts, cached))))
+    return _fill(texts, cached, [emb for batch in batches for emb in batch])
+
+
+async def _embed_batch_async(batch: List[str]) -> List[List[float]]:
     try:
-        client = openai.OpenAI(
-            api_key=settings.openai_api_key,
-            timeout=30.0  # 30 second timeout
-        )
-        response = client.embeddings.create(
-            model="text-embedding-3-small",
-            input=[text]
-        )
-        return response.data[0].embedding
+        response = await _get_async_client().embeddings.create(model=EMBEDDING_MODEL, input=batch)
     except Exception as e:
-        logger.warning(f"OpenAI embedding failed: {e}, using fallback")
-        return _create_fallback_embedding(text)
+        logger.warning(f"OpenAI embedding failed: {e}, using local embeddings")
+        return embed_local(batch)
+    embeddings = [item.embedding for item in response.data]
+    await cache.put_many_async(EMBEDDING_MODEL, batch, embeddings)
+    return embeddings
 
 
-def _create_fallback_embedding(text: str, dimensions: int = 1536) -> List[float]:
-    """Create a simple hash-based embedding as fallback."""
-    import hashlib
-    import struct
-    
-    # Create a deterministic hash of the text
-    hash_obj = hashlib.md5(text.encode('utf-8'))
-    hash_bytes = hash_obj.digest()
-    
-    # Convert to float values
-    embedding = []
-    for i in range(0, dimensions, 4):
-        # Take 4 bytes at a time and convert to float
-        byte_chunk = hash_bytes[(i // 4) % len(hash_bytes):(i // 4) % len(hash_bytes) + 4]
-        if len(byte_chunk) < 4:
-            byte_chunk = byte_chunk + b'\x00' * (4 - len(byte_chunk))
-        
-        # Convert bytes to float and normalize to [-1, 1]
-        int_val = struct.unpack('i', byte_chunk)[0]
-        float_val = int_val / (2**31 - 1)  # Normalize to [-1, 1]
-        embedding.append(float_val)
-    
-    return embedding[:dimensions]
+class _Coalescer:
+    """Collects the embed_async calls of one event loop into shared requests.
 
+    The first call opens a window of settings.embedding_batch_window seconds;
+    every text submitted before it closes (or before a full batch is reached)
+    goes out in one embed_many_async, with duplicate texts embedded once.
+    """
 
-def _load_reducer() -> Optional[UMAP]:
-    """Load saved UMAP reducer from disk."""
-    global _reducer
-    if _reducer is not None:
-        return _reducer
-        
-    if os.path.exists(_reducer_file):
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.pending: Dict[str, List[asyncio.Future]] = {}
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.sending: set = set()  # keeps in-flight send tasks referenced
+
+    def submit(self, text: str) -> asyncio.Future:
+        future = self.loop.create_future()
+        self.pending.setdefault(text, []).append(future)
+        if len(self.pending) >= min(settings.embedding_batch_size, MAX_INPUTS):
+            self.flush()
+        elif self.timer is None:
+            self.timer = self.loop.call_later(settings.embedding_batch_window, self.flush)
+        return future
+
+    def flush(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        pending, self.pending = self.pending, {}
+        if pending:
+            task = self.loop.create_task(self._send(pending))
+            self.sending.add(task)
+            task.add_done_callback(self.sending.discard)
+
+    async def _send(self, pending: Dict[str, List[asyncio.Future]]) -> None:
         try:
-            with open(_reducer_file, 'rb') as f:
-                _reducer = pickle.load(f)
-            logger.info("Loaded existing UMAP reducer from disk")
-            return _reducer
+            embeddings = await embed_many_async(list(pending))
         except Exception as e:
-            logger.warning(f"Failed to load UMAP reducer: {e}")
-    
-    return None
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for emb, futures in zip(embeddings, pending.values(), strict=True):
+            for future in futures:
+                if not future.done():
+                    future.set_result(emb)
+
+
+_coalescers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _Coalescer]" = weakref.WeakKeyDictionary()
+
+
+async def embed_async(text: str) -> List[float]:
+    """Embed one text, sharing a request with concurrent embed_async calls."""
+    if _local():
+        return embed_local([text])[0]
+    loop = asyncio.get_running_loop()
+    coalescer = _coalescers.get(loop)
+    if coalescer is None:
+        coalescer = _coalescers[loop] = _Coalescer(loop)
+    return await coalescer.submit(text)
+
+
+def _incremental() -> bool:
+    """Whether settings select the incremental projector over UMAP."""
+    engine = settings.projection_engine
+    if engine not in PROJECTION_ENGINES:
+        raise ValueError(f"Unknown projection engine: {engine}")
+    return engine == "incremental"
 
 
-def _save_reducer(reducer: UMAP) -> None:
-    """Save UMAP reducer to disk."""
+def _load_projector() -> IncrementalProjector:
+    """The incremental projector this process projects with (see sync_projector)."""
+    global _projector
+    if _projector is None:
+        _projector = IncrementalProjector(settings.projection_batch_size)
+    return _projector
+
+
+def _updated(projector: IncrementalProjector) -> None:
+    """Queue the projector's new state for the next save_projector."""
+    global _projector_update
+    _projector_update = pickle.dumps(projector)
+
+
+async def sync_projector() -> int:
+    """Swap in the newest shared projector if this process is behind; returns the version in use."""
+    global _projector, _projector_version, _projector_update
     try:
-        with open(_reducer_file, 'wb') as f:
-            pickle.dump(reducer, f)
-        logger.info("Saved UMAP reducer to disk")
+        storage = get_storage()
+        if await storage.state_version(PROJECTOR_STATE) > _projector_version:
+            version, blob = await storage.load_state(PROJECTOR_STATE)
+            if blob is not None and version > _projector_version:
+                _projector, _projector_version, _projector_update = pickle.loads(blob), version, None
+                logger.info(f"Switched to incremental projector version {version}")
     except Exception as e:
-        logger.error(f"Failed to save UMAP reducer: {e}")
+        logger.warning(f"Failed to load incremental projector: {e}")
+    return _projector_version
 
 
-def fit_reducer(prompts: List[str]) -> None:
-    """Fit UMAP reducer on conversation prompts for semantic clustering."""
-    global _reducer
-    
-    if len(prompts) < 2:
-        logger.warning("Need at least 2 prompts to fit UMAP reducer")
+async def save_projector() -> None:
+    """Publish this process's projector updates as the next shared version. If
+    another process published first, its version is adopted and these updates
+    are dropped (the projector keeps learning from later points)."""
+    global _projector_version, _projector_update
+    update, _projector_update = _projector_update, None
+    if update is None:
         return
+    try:
+        if await get_storage().save_state(PROJECTOR_STATE, _projector_version + 1, update):
+            _projector_version += 1
+        else:
+            await sync_projector()
+    except Exception as e:
+        logger.error(f"Failed to save incremental projector: {e}")
+
+
+def fit_reducer(prompts: List[str] = None, embeddings: List[List[float]] = None) -> None:
+    """Fit UMAP reducer on conversation prompts or embeddings for semantic clustering.
+
+    Outside an event loop (scripts) the reducer is also published as the next
+    layout version, so running workers and the API pick it up.
+    """
     
-    logger.info(f"Fitting UMAP reducer on {len(prompts)} prompts...")
+    if embeddings is None:
+        if prompts is None or len(prompts) < 2:
+            logger.warning("Need at least 2 prompts to fit UMAP reducer")
+            return
+        logger.info(f"Fitting UMAP reducer on {len(prompts)} prompts...")
+    else:
+        logger.info(f"Fitting UMAP reducer on {len(embeddings)} provided embeddings...")
     
     try:
-        # Generate embeddings for all prompts
-        embeddings = []
-        for prompt in prompts:
-            emb = embed(prompt)
-            embeddings.append(emb)
-        
-        # Fit UMAP with parameters optimized for conversation clustering
-        _reducer = UMAP(
-            n_neighbors=min(15, len(prompts) - 1),  # Adaptive to data size
-            min_dist=0.1,                           # Allow some overlap for related conversations
-            n_components=2,                         # 2D output for visualization
-            metric='cosine',                        # Good for text embeddings
-            random_state=42                         # Reproducible results
-        )
-        
-        # Fit the reducer
-        _reducer.fit(np.array(embeddings))
-        
-        # Save for future use
-        _save_reducer(_reducer)
+        # Generate embeddings for all prompts in batched requests
+        if embeddings is None:
+            embeddings = embed_many(prompts)
+        emb_array = np.array([np.asarray(emb, dtype=np.float32) for emb in embeddings])
         
+        if _incremental():
+            # Fold the embeddings into the running projection instead of refitting
+            projector = _load_projector()
+            projector.partial_fit(emb_array)
+            _updated(projector)
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                # A script: share the projector with the running workers and API
+                asyncio.run(save_projector())
+            logger.info("Incremental projector updated")
+            return
+
+        reducer = layout.fit_umap(emb_array)
+        layout.install(reducer)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # A script: share the reducer with the running workers and API
+            asyncio.run(layout.publish(reducer, {}))
+
         logger.info("UMAP reducer fitted successfully")
         
     except Exception as e:
         logger.error(f"Failed to fit UMAP reducer: {e}")
-        _reducer = None
 
 
-def refit_reducer_if_needed() -> None:
-    """Refit UMAP reducer if we have new data and sufficient nodes."""
+async def refit_reducer_if_needed() -> None:
+    """Start a background UMAP refit once the graph has outgrown the current
+    layout (see layout.refit_if_needed), or warm an unfitted incremental
+    projector from the stored embeddings."""
     try:
-        nodes = get_all_nodes() 
+        if not _incremental():
+            await layout.refit_if_needed()
+            return
+        await sync_projector()
+        if _load_projector().fitted:
+            return  # the projector learns from every to_xy call
+
+        nodes = [node async for node in get_storage().iter_nodes()]
         if len(nodes) < 10:  # Don't refit for small datasets
             return
-            
-        # Check if we need to refit (every 50 nodes or if no reducer exists)
-        if _load_reducer() is None or len(nodes) % 50 == 0:
-            prompts = [node.prompt for node in nodes if node.prompt]
-            if len(prompts) >= 10:
-                logger.info(f"Refitting UMAP reducer with {len(prompts)} prompts")
-                fit_reducer(prompts)
-                
+        nodes = [node for node in nodes if node.prompt]
+        if len(nodes) >= 10:
+            logger.info(f"Warming incremental projector with {len(nodes)} prompts")
+            fit_reducer(embeddings=_stored_embeddings(nodes, [node.prompt for node in nodes]))
+            await save_projector()
+
     except Exception as e:
         logger.error(f"Failed to refit UMAP reducer: {e}")
 
 
+def _stored_embeddings(nodes: list, texts: List[str]) -> list:
+    """Each node's saved embedding, embedding only the nodes saved without one."""
+    fresh = iter(embed_many([text for node, text in zip(nodes, texts, strict=True) if not node.emb]))
+    return [node.emb if node.emb else next(fresh) for node in nodes]
+
+
+def _fallback_xy(vec: List[float]) -> Tuple[float, float]:
+    """Projection used until a reducer or projector is fitted."""
+    if len(vec) >= 2:
+        # Simple normalization to [-2, 2] range for visualization
+        return ((vec[0] - 0.5) * 4, (vec[1] - 0.5) * 4)
+    return (0.0, 0.0)
+
+
 def to_xy(vec: List[float]) -> Tuple[float, float]:
     """Project high-dimensional embedding to 2D using UMAP for semantic clustering."""
-    global _reducer
+    return to_xy_many([vec])[0]
+
+
+def to_xy_many(vectors: List[List[float]]) -> List[Tuple[float, float]]:
+    """Project many embeddings to 2D in one vectorized transform."""
+    if not vectors:
+        return []
+    with _projection_lock:
+        started = time.perf_counter()
+        coords = _project(vectors)
+        _projection_counts["calls"] += 1
+        _projection_counts["points"] += len(vectors)
+        _projection_counts["seconds"] += time.perf_counter() - started
+    return coords
+
+
+def _project(vectors: List[List[float]]) -> List[Tuple[float, float]]:
+    if _incremental():
+        # Project under the current axes, then let the points update them
+        projector = _load_projector()
+        if projector.fitted:
+            coords = [(float(x), float(y)) for x, y in projector.transform(vectors)]
+        else:
+            coords = [_fallback_xy(vec) for vec in vectors]
+        updated = [projector.observe(vec) for vec in vectors]
+        if any(updated):
+            _updated(projector)
+        return coords
     
-    # Try to load existing reducer
-    if _reducer is None:
-        _reducer = _load_reducer()
+    # The current layout's reducer (see layout.sync)
+    reducer = layout.current()
     
     # If no reducer available, fall back to simple projection
-    if _reducer is None:
+    if reducer is None:
         logger.debug("No UMAP reducer available, using fallback projection")
-        if len(vec) >= 2:
-            # Simple normalization to [-2, 2] range for visualization
-            x = (vec[0] - 0.5) * 4
-            y = (vec[1] - 0.5) * 4
-            return (x, y)
-        else:
-            return (0.0, 0.0)
+        return [_fallback_xy(vec) for vec in vectors]
     
     try:
         # Use UMAP to project to 2D
-        vec_array = np.array([vec])
-        xy = _reducer.transform(vec_array)[0]
-        
-        # Scale to reasonable range for visualization ([-3, 3])
-        x_scaled = float(xy[0]) 
-        y_scaled = float(xy[1])
-        
-        return (x_scaled, y_scaled)
+        vec_array = np.array([np.asarray(vec, dtype=np.float32) for vec in vectors])
+        return [(float(x), float(y)) for x, y in reducer.transform(vec_array)]
         
     except Exception as e:
         logger.warning(f"UMAP projection failed: {e}, falling back to simple projection")
         # Fallback to simple projection
-        if len(vec) >= 2:
-            x = (vec[0] - 0.5) * 4
-            y = (vec[1] - 0.5) * 4
-            return (x, y)
-        else:
-            return (0.0, 0.0)
+        return [_fallback_xy(vec) for vec in vectors]
+
+
+async def to_xy_many_async(vectors: List[List[float]]) -> List[Tuple[float, float]]:
+    """to_xy_many on the projection thread, so CPU-bound transforms never stall the event loop."""
+    if not _incremental():
+        return await asyncio.get_running_loop().run_in_executor(_projection_pool, to_xy_many, vectors)
+    await sync_projector()
+    coords = await asyncio.get_running_loop().run_in_executor(_projection_pool, to_xy_many, vectors)
+    await save_projector()
+    return coords
+
+
+def projection_stats() -> dict:
+    """This process's projection calls, points and time spent projecting."""
+    calls, points, seconds = (_projection_counts[k] for k in ("calls", "points", "seconds"))
+    return {
+        **_projection_counts,
+        "ms_per_call": seconds * 1000 / calls if calls else 0.0,
+        "ms_per_point": seconds * 1000 / points if points else 0.0,
+    }
@@ -0,0 +1,66 @@
+"""Offline embedding provider: hashed n-gram features and a fixed random projection.
+
+Each text becomes signed counts of its word unigrams, word bigrams and
+character trigrams hashed into BUCKETS slots, which a seeded Gaussian matrix
+projects to DIM dimensions (the width of text-embedding-3-small). Texts that
+share wording land close together, so similarity penalties and UMAP layouts
+keep meaningful geometry with no network and no API cost.
+"""
+
+import re
+import zlib
+from itertools import pairwise
+from typing import List, Optional
+
+import numpy as np
+from scipy import sparse
+
+MODEL = "local-ngram-v1"
+DIM = 1536
+BUCKETS = 4096
+SEED = 20240601  # fixed so every process projects identically
+
+_WORD = re.compile(r"\w+")
+_projection: Optional[np.ndarray] = None
+
+
+def _get_projection() -> np.ndarray:
+    global _projection
+    if _projection is None:
+        rng = np.random.default_rng(SEED)
+        _projection = rng.standard_normal((BUCKETS, DIM), dtype=np.float32) / np.float32(np.sqrt(DIM))
+    return _projection
+
+
+def _ngrams(text: str) -> List[str]:
+    words = _WORD.findall(text.lower())
+    joined = f" {' '.join(words)} "
+    return (
+        words
+        + [f"{a} {b}" for a, b in pairwise(words)]
+        + [f"#{joined[i:i + 3]}" for i in range(len(joined) - 2)]
+    )
+
+
+def embed_local(texts: List[str]) -> List[List[float]]:
+    """Unit-length DIM-dimensional embeddings for texts."""
+    if not texts:
+        return []
+    rows, hashes = [], []
+    for row, text in enumerate(texts):
+        grams = _ngrams(text)
+        rows.extend([row] * len(grams))
+        hashes.extend(zlib.crc32(gram.encode()) for gram in grams)
+    hashes = np.asarray(hashes, dtype=np.uint32)
+
+    # The top hash bit picks the sign, so colliding features tend to cancel;
+    # duplicate (row, bucket) entries are summed into the count
+    signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+    counts = sparse.csr_matrix((signs, (rows, hashes % BUCKETS)), shape=(len(texts), BUCKETS))
+    counts.sum_duplicates()
+    counts.data = np.sign(counts.data) * np.log1p(np.abs(counts.data))
+
+    vectors = np.asarray(counts @ _get_projection())
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors /= np.where(norms > 0, norms, 1.0)
+    return vectors.tolist()
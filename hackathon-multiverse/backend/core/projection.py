@@ -0,0 +1,77 @@
+"""Streaming 2-D projection: incremental PCA updated with mini-batches.
+
+An alternative to refitting UMAP. Embeddings are buffered and folded into
+a running mean and top-TRACKED principal subspace (the merge-of-SVDs
+update of Ross et al., as in scikit-learn's IncrementalPCA), so each update
+costs O(batch x dim) however large the graph is, and projecting a point is
+one (dim x 2) product. After every update the 2-D basis is rotated onto the
+previous one (orthogonal Procrustes), so sign flips and in-plane rotations
+of the principal axes never move the layout under the existing nodes.
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+TRACKED = 8  # principal directions kept; more than 2 so the top pair is tracked accurately
+SCALE = 10.0  # unit-length embeddings spread about +-0.2 on their top axes; the canvas draws about +-2
+
+
+class IncrementalProjector:
+    def __init__(self, batch_size: int = 32):
+        self.batch_size = max(2, batch_size)
+        self.n_seen = 0
+        self.mean: Optional[np.ndarray] = None
+        self.components: Optional[np.ndarray] = None  # (TRACKED, dim), rows by decreasing variance
+        self.singular_values: Optional[np.ndarray] = None
+        self.basis: Optional[np.ndarray] = None  # (2, dim) aligned projection axes
+        self._pending: List[np.ndarray] = []
+
+    @property
+    def fitted(self) -> bool:
+        return self.basis is not None
+
+    def partial_fit(self, vectors: Sequence[Sequence[float]]) -> None:
+        """Fold a batch of embeddings into the running mean and subspace."""
+        batch = np.asarray(vectors, dtype=np.float64)
+        if batch.ndim != 2 or len(batch) == 0:
+            return
+        m, n = len(batch), self.n_seen
+        batch_mean = batch.mean(axis=0)
+        if n == 0:
+            stacked = batch - batch_mean
+            mean = batch_mean
+        else:
+            # Previous subspace, the centered batch, and the shift between the two means
+            shift = np.sqrt(n * m / (n + m)) * (self.mean - batch_mean)
+            stacked = np.vstack([self.singular_values[:, None] * self.components, batch - batch_mean, shift])
+            mean = self.mean + (batch_mean - self.mean) * (m / (n + m))
+        _, singular_values, components = np.linalg.svd(stacked, full_matrices=False)
+        self.components, self.singular_values = components[:TRACKED], singular_values[:TRACKED]
+        self.mean, self.n_seen = mean, n + m
+        if len(self.components) >= 2:
+            self._align(self.components[:2])
+
+    def _align(self, basis: np.ndarray) -> None:
+        if self.basis is not None:
+            # The rotation/reflection of the new axes closest to the old ones
+            u, _, vt = np.linalg.svd(self.basis @ basis.T)
+            basis = (u @ vt) @ basis
+        self.basis = basis
+
+    def observe(self, vec: Sequence[float]) -> bool:
+        """Queue an embedding; returns True when it completed a batch and the model updated."""
+        self._pending.append(np.asarray(vec, dtype=np.float64))
+        if len(self._pending) < self.batch_size:
+            return False
+        pending, self._pending = self._pending, []
+        self.partial_fit(pending)
+        return True
+
+    def transform(self, vectors: Sequence[Sequence[float]]) -> np.ndarray:
+        """(n, 2) coordinates for embeddings under the current basis."""
+        return (np.asarray(vectors, dtype=np.float64) - self.mean) @ self.basis.T * SCALE
+
+    def project(self, vec: Sequence[float]) -> Tuple[float, float]:
+        x, y = self.transform([vec])[0]
+        return (float(x), float(y))
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_serializer
 from typing import Optional, List
+from backend.core.packed_embedding import PackedEmbedding
 
 
 class Node(BaseModel):
@@ -16,6 +17,36 @@ class Node(BaseModel):
     completion_tokens: Optional[int] = None
     agent_cost: Optional[float] = None
 
+    @field_serializer("emb")
+    def _serialize_emb(self, emb):
+        # Embeddings loaded from Redis are PackedEmbedding; dump them as plain lists
+        if isinstance(emb, PackedEmbedding):
+            return emb.tolist()
+        return emb
+
+
+class NodeSummary(BaseModel):
+    """Partial Node from a projected read; fields that were not requested stay None."""
+
+    id: str
+    prompt: Optional[str] = None
+    reply: Optional[str] = None
+    score: Optional[float] = None
+    grader_reasoning: Optional[str] = None
+    depth: Optional[int] = None
+    parent: Optional[str] = None
+    emb: Optional[List[float]] = None
+    xy: Optional[List[float]] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    agent_cost: Optional[float] = None
+
+    @field_serializer("emb")
+    def _serialize_emb(self, emb):
+        if isinstance(emb, PackedEmbedding):
+            return emb.tolist()
+        return emb
+
 
 class FocusZone(BaseModel):
     poly: List[List[float]]  # List of [x, y] coordinates
@@ -41,6 +72,8 @@ class SettingsUpdate(BaseModel):
 
     lambda_trend: Optional[float] = None
     lambda_sim: Optional[float] = None
+    lambda_max_sim: Optional[float] = None
+    lambda_density: Optional[float] = None
     lambda_depth: Optional[float] = None
 
 
@@ -0,0 +1,208 @@
+"""Async twin of frontier for code running on an event loop."""
+
+from typing import Iterable, Optional, Sequence
+from backend.config.settings import settings
+from backend.db.redis_client import get_async_redis
+from backend.db.frontier import (
+    CONSUMER_ID,
+    DEAD_KEY,
+    FAIL_KEYS,
+    FRONTIER_KEY,
+    INFLIGHT_KEY,
+    LEASE_KEYS,
+    RELEASE_KEYS,
+    TERMS_KEY,
+    TRIM_KEYS,
+    _BOOST_LUA,
+    _CLAIM_IDS_LUA,
+    _CLAIM_LUA,
+    _EVICT_LUA,
+    _EXTEND_LUA,
+    _FAIL_LUA,
+    _REAP_LUA,
+    _RELEASE_LUA,
+    _REWEIGH_LUA,
+    _TRIM_LUA,
+    _QuotaWalk,
+    _attempts,
+    _page_groups,
+    _queue_page_lookups,
+    _quotas,
+    _stored_depths,
+    encode_terms,
+)
+from backend.db.node_store import BATCH_SIZE, ROOTS_INDEX, STATS_KEY, _chunks
+
+
+async def push(node_id: str, priority: float, terms: Optional[Sequence[float]] = None) -> None:
+    """Queue a node; with its priority terms, later weight changes re-score it."""
+    if terms is None:
+        await get_async_redis().zadd(FRONTIER_KEY, {node_id: priority})
+        return
+    pipe = get_async_redis().pipeline()
+    pipe.zadd(FRONTIER_KEY, {node_id: priority})
+    pipe.hset(TERMS_KEY, node_id, encode_terms(terms))
+    await pipe.execute()
+
+
+async def pop_max() -> str | None:
+    res = await get_async_redis().zpopmax(FRONTIER_KEY, 1)
+    return res[0][0] if res else None
+
+
+async def size() -> int:
+    """Return current number of items in the frontier sorted-set."""
+    return int(await get_async_redis().zcard(FRONTIER_KEY))
+
+
+async def pop_batch(count: int) -> list[str]:
+    """Pop up to count highest priority nodes from the frontier."""
+    result = await get_async_redis().zpopmax(FRONTIER_KEY, count)
+    return [node_id for node_id, priority in result]
+
+
+async def claim_batch(
+    count: int, lease_seconds: float | None = None, owner: str = CONSUMER_ID
+) -> list[str]:
+    """Atomically lease up to count highest priority nodes."""
+    lease = lease_seconds if lease_seconds is not None else settings.frontier_lease_seconds
+    script = get_async_redis().register_script(_CLAIM_LUA)
+    return await script(keys=LEASE_KEYS, args=[count, lease, owner])
+
+
+async def top(count: int) -> list[tuple[str, float]]:
+    """The count highest priority queued nodes as (id, priority), without claiming them."""
+    if count <= 0:
+        return []
+    return await get_async_redis().zrevrange(FRONTIER_KEY, 0, count - 1, withscores=True)
+
+
+async def claim(
+    node_ids: Iterable[str], lease_seconds: float | None = None, owner: str = CONSUMER_ID
+) -> list[str]:
+    """Atomically lease the given nodes that are still queued; returns those leased."""
+    lease = lease_seconds if lease_seconds is not None else settings.frontier_lease_seconds
+    node_ids = list(node_ids)
+    if not node_ids:
+        return []
+    script = get_async_redis().register_script(_CLAIM_IDS_LUA)
+    return await script(keys=LEASE_KEYS, args=[lease, owner, *node_ids])
+
+
+async def roots(node_ids: Iterable[str]) -> dict[str, str]:
+    """Root id of each node (a root maps to itself; unknown ids are left out)."""
+    node_ids = list(node_ids)
+    found = {}
+    for chunk in _chunks(node_ids, BATCH_SIZE):
+        for node_id, root in zip(chunk, await get_async_redis().hmget(ROOTS_INDEX, chunk), strict=True):
+            if root is not None:
+                found[node_id] = root
+    return found
+
+
+async def ack(node_ids: Iterable[str], owner: str = CONSUMER_ID) -> int:
+    """Finish claimed nodes; returns how many leases this owner still held."""
+    node_ids = list(node_ids)
+    if not node_ids:
+        return 0
+    script = get_async_redis().register_script(_RELEASE_LUA)
+    return await script(keys=RELEASE_KEYS, args=[owner, 0, *node_ids])
+
+
+async def nack(node_ids: Iterable[str], owner: str = CONSUMER_ID) -> int:
+    """Give claimed nodes back to the frontier with their original priority."""
+    node_ids = list(node_ids)
+    if not node_ids:
+        return 0
+    script = get_async_redis().register_script(_RELEASE_LUA)
+    return await script(keys=RELEASE_KEYS, args=[owner, 1, *node_ids])
+
+
+async def fail(node_ids: Iterable[str], retry: bool = True, owner: str = CONSUMER_ID) -> list[str]:
+    """Re-queue claimed nodes whose expansion failed, or dead-letter them once
+    out of attempts (see frontier.fail); returns the dead-lettered ids."""
+    node_ids = list(node_ids)
+    if not node_ids:
+        return []
+    script = get_async_redis().register_script(_FAIL_LUA)
+    return await script(keys=FAIL_KEYS, args=[owner, _attempts(retry), *node_ids])
+
+
+async def dead_letters() -> list[str]:
+    """Nodes given up on after failed expansions, highest priority first."""
+    return await get_async_redis().zrevrange(DEAD_KEY, 0, -1)
+
+
+async def extend_leases(
+    node_ids: Iterable[str], lease_seconds: float | None = None, owner: str = CONSUMER_ID
+) -> int:
+    """Push back the deadline of leases this owner still holds."""
+    node_ids = list(node_ids)
+    if not node_ids:
+        return 0
+    lease = lease_seconds if lease_seconds is not None else settings.frontier_lease_seconds
+    script = get_async_redis().register_script(_EXTEND_LUA)
+    return await script(keys=LEASE_KEYS, args=[owner, lease, *node_ids])
+
+
+async def requeue_expired() -> list[str]:
+    """Re-queue nodes whose lease ran out, e.g. after a worker crash."""
+    script = get_async_redis().register_script(_REAP_LUA)
+    return await script(keys=LEASE_KEYS)
+
+
+async def inflight_size() -> int:
+    """Number of nodes currently leased by workers."""
+    return int(await get_async_redis().zcard(INFLIGHT_KEY))
+
+
+async def trim(max_size: int | None = None) -> list[str]:
+    """Evict the lowest-priority tail beyond max_size queued nodes."""
+    cap = settings.frontier_max_size if max_size is None else max_size
+    if cap <= 0:
+        return []
+    script = get_async_redis().register_script(_TRIM_LUA)
+    return await script(keys=TRIM_KEYS, args=[cap])
+
+
+async def boost(node_ids: Iterable[str], factor: float) -> int:
+    """Multiply the priorities of the queued nodes among node_ids by factor."""
+    script = get_async_redis().register_script(_BOOST_LUA)
+    boosted = 0
+    for chunk in _chunks(list(node_ids), BATCH_SIZE):
+        boosted += await script(keys=[FRONTIER_KEY, TERMS_KEY], args=[factor, *chunk])
+    return boosted
+
+
+async def reweigh(weights: Sequence[float]) -> int:
+    """Recompute every queued and claimed priority from its stored terms under
+    new weights, one script call per page of ids; returns how many changed."""
+    r = get_async_redis()
+    script = r.register_script(_REWEIGH_LUA)
+    ids = [node_id async for node_id, _ in r.hscan_iter(TERMS_KEY, count=BATCH_SIZE)]
+    updated = 0
+    for chunk in _chunks(ids, BATCH_SIZE):
+        updated += await script(keys=[*LEASE_KEYS, TERMS_KEY], args=[len(weights), *weights, *chunk])
+    return updated
+
+
+async def enforce_quotas(depth_quota: int | None = None, root_quota: int | None = None) -> list[str]:
+    """Evict the lowest-priority queued nodes beyond the per-depth and per-root quotas."""
+    depth_quota, root_quota = _quotas(depth_quota, root_quota)
+    if depth_quota <= 0 and root_quota <= 0:
+        return []
+    # Paged like frontier.enforce_quotas
+    r = get_async_redis()
+    depths = _stored_depths(await r.hgetall(STATS_KEY)) if depth_quota > 0 else []
+    walk = _QuotaWalk(depth_quota, root_quota)
+    over, start = [], 0
+    while page := await r.zrevrange(FRONTIER_KEY, start, start + BATCH_SIZE - 1):
+        pipe = r.pipeline(transaction=False)
+        _queue_page_lookups(pipe, page, depths)
+        over.extend(walk.over(page, *_page_groups(page, depths, await pipe.execute())))
+        start += len(page)
+    script = r.register_script(_EVICT_LUA)
+    evicted = []
+    for chunk in _chunks(over, BATCH_SIZE):
+        evicted.extend(await script(keys=TRIM_KEYS, args=chunk))
+    return evicted
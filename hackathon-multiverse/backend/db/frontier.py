@@ -1,11 +1,274 @@
+import os
+import socket
+from typing import Iterable, Optional, Sequence
+from backend.config.settings import settings
+from backend.db.node_store import BATCH_SIZE, DEPTH_INDEX_PREFIX, ROOTS_INDEX, STATS_KEY, TERMS_KEY, _chunks
 from backend.db.redis_client import get_redis
 
 r = get_redis()
 FRONTIER_KEY = "frontier"
 
+# Claimed nodes move from the frontier into an in-flight sorted set scored by
+# lease deadline; the leases hash keeps "<priority> <owner>" so an expired or
+# nacked claim goes back with its original priority.
+INFLIGHT_KEY = "frontier:inflight"
+LEASES_KEY = "frontier:leases"
 
-def push(node_id: str, priority: float) -> None:
-    r.zadd(FRONTIER_KEY, {node_id: priority})
+# Failed expansions per queued or claimed node, and the nodes that failed
+# settings.frontier_max_attempts times (or with an error not worth a retry),
+# scored by their priority; dead-lettered nodes stay in the graph.
+ATTEMPTS_KEY = "frontier:attempts"
+DEAD_KEY = "frontier:dead"
+
+# TERMS_KEY holds the priority terms of pushed nodes (see
+# scheduler.PRIORITY_TERMS) as "<factor> <term>...", so their priorities can
+# be recomputed when the scheduler weights change; factor accumulates
+# focus-zone boosts. An entry lives as long as its node is queued or claimed.
+
+# Identifies this process as the owner of its leases
+CONSUMER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# KEYS: frontier, in-flight, leases. Deadlines use the Redis clock so workers
+# on different hosts agree on when a lease has expired.
+_LEASE_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local function reap()
+  local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now, 'LIMIT', 0, 1000)
+  for _, id in ipairs(expired) do
+    local lease = redis.call('HGET', KEYS[3], id)
+    redis.call('ZADD', KEYS[1], lease and string.match(lease, '^(%S+)') or 0, id)
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('HDEL', KEYS[3], id)
+  end
+  return expired
+end
+
+local function owned(id, owner)
+  local lease = redis.call('HGET', KEYS[3], id)
+  if lease and string.match(lease, ' (.*)$') == owner then
+    return string.match(lease, '^(%S+)')
+  end
+  return nil
+end
+"""
+
+# ARGV: count, lease seconds, owner
+_CLAIM_LUA = _LEASE_LUA + """
+reap()
+local popped = redis.call('ZPOPMAX', KEYS[1], ARGV[1])
+local deadline = now + tonumber(ARGV[2])
+local ids = {}
+for i = 1, #popped, 2 do
+  redis.call('ZADD', KEYS[2], deadline, popped[i])
+  redis.call('HSET', KEYS[3], popped[i], popped[i + 1] .. ' ' .. ARGV[3])
+  ids[#ids + 1] = popped[i]
+end
+return ids
+"""
+
+# Lease the given ids that are still queued, e.g. the ones a selection policy
+# picked from top(); ids claimed meanwhile by another worker are skipped.
+# ARGV: lease seconds, owner, node ids...
+_CLAIM_IDS_LUA = _LEASE_LUA + """
+reap()
+local deadline = now + tonumber(ARGV[1])
+local ids = {}
+for i = 3, #ARGV do
+  local priority = redis.call('ZSCORE', KEYS[1], ARGV[i])
+  if priority then
+    redis.call('ZREM', KEYS[1], ARGV[i])
+    redis.call('ZADD', KEYS[2], deadline, ARGV[i])
+    redis.call('HSET', KEYS[3], ARGV[i], priority .. ' ' .. ARGV[2])
+    ids[#ids + 1] = ARGV[i]
+  end
+end
+return ids
+"""
+
+# KEYS: frontier, in-flight, leases, terms, attempts
+# ARGV: owner, "1" to re-queue (nack) or "0" to drop (ack), node ids...
+_RELEASE_LUA = _LEASE_LUA + """
+local released = 0
+for i = 3, #ARGV do
+  local priority = owned(ARGV[i], ARGV[1])
+  if priority then
+    if ARGV[2] == '1' then
+      redis.call('ZADD', KEYS[1], priority, ARGV[i])
+    else
+      redis.call('HDEL', KEYS[4], ARGV[i])
+      redis.call('HDEL', KEYS[5], ARGV[i])
+    end
+    redis.call('ZREM', KEYS[2], ARGV[i])
+    redis.call('HDEL', KEYS[3], ARGV[i])
+    released = released + 1
+  end
+end
+return released
+"""
+
+# Count a failed expansion of each claimed id: re-queue it with its original
+# priority while it has failed fewer than ARGV[2] times, else move it to the
+# dead letters. Returns the dead-lettered ids.
+# KEYS: frontier, in-flight, leases, terms, attempts, dead letters
+# ARGV: owner, attempts allowed, node ids...
+_FAIL_LUA = _LEASE_LUA + """
+local dead = {}
+for i = 3, #ARGV do
+  local priority = owned(ARGV[i], ARGV[1])
+  if priority then
+    redis.call('ZREM', KEYS[2], ARGV[i])
+    redis.call('HDEL', KEYS[3], ARGV[i])
+    if redis.call('HINCRBY', KEYS[5], ARGV[i], 1) < tonumber(ARGV[2]) then
+      redis.call('ZADD', KEYS[1], priority, ARGV[i])
+    else
+      redis.call('ZADD', KEYS[6], priority, ARGV[i])
+      redis.call('HDEL', KEYS[4], ARGV[i])
+      redis.call('HDEL', KEYS[5], ARGV[i])
+      dead[#dead + 1] = ARGV[i]
+    end
+  end
+end
+return dead
+"""
+
+# ARGV: owner, lease seconds, node ids...
+_EXTEND_LUA = _LEASE_LUA + """
+local extended = 0
+for i = 3, #ARGV do
+  if owned(ARGV[i], ARGV[1]) then
+    redis.call('ZADD', KEYS[2], 'XX', now + tonumber(ARGV[2]), ARGV[i])
+    extended = extended + 1
+  end
+end
+return extended
+"""
+
+_REAP_LUA = _LEASE_LUA + """
+return reap()
+"""
+
+# Keep the top ARGV[1] entries and return the ids dropped from the tail.
+# KEYS: frontier, terms, attempts
+_TRIM_LUA = """
+local excess = redis.call('ZCARD', KEYS[1]) - tonumber(ARGV[1])
+if excess <= 0 then
+  return {}
+end
+local dropped = redis.call('ZRANGE', KEYS[1], 0, excess - 1)
+redis.call('ZREMRANGEBYRANK', KEYS[1], 0, excess - 1)
+for _, id in ipairs(dropped) do
+  redis.call('HDEL', KEYS[2], id)
+  redis.call('HDEL', KEYS[3], id)
+end
+return dropped
+"""
+
+# Multiply the priority of each queued id by ARGV[1], and the factor of its
+# stored terms so a later reweigh keeps the boost; ids not queued (claimed,
+# finished or never pushed) are left alone. Returns how many were boosted.
+# KEYS: frontier, terms
+_BOOST_LUA = """
+local factor = tonumber(ARGV[1])
+local boosted = 0
+for i = 2, #ARGV do
+  local priority = redis.call('ZSCORE', KEYS[1], ARGV[i])
+  if priority then
+    redis.call('ZADD', KEYS[1], 'XX', tonumber(priority) * factor, ARGV[i])
+    local terms = redis.call('HGET', KEYS[2], ARGV[i])
+    if terms then
+      local old, rest = string.match(terms, '^(%S+)(.*)$')
+      redis.call('HSET', KEYS[2], ARGV[i], tostring(tonumber(old) * factor) .. rest)
+    end
+    boosted = boosted + 1
+  end
+end
+return boosted
+"""
+
+# Recompute the priority of each id in ARGV[n + 2..] from its stored terms
+# and the n weights ARGV[2..n + 1]: factor * sum(term * weight). Queued ids
+# are re-scored, claimed ones get the new priority in their lease (for a
+# nack), and terms of ids in neither are dropped. Returns how many changed.
+# KEYS: frontier, in-flight, leases, terms. ARGV: n, weights..., ids...
+_REWEIGH_LUA = """
+local n = tonumber(ARGV[1])
+local updated = 0
+for i = n + 2, #ARGV do
+  local id = ARGV[i]
+  local terms = redis.call('HGET', KEYS[4], id)
+  if terms then
+    local priority, factor, k = 0, nil, 1
+    for term in string.gmatch(terms, '%S+') do
+      if not factor then
+        factor = tonumber(term)
+      elseif k <= n then
+        priority = priority + tonumber(term) * tonumber(ARGV[k + 1])
+        k = k + 1
+      end
+    end
+    priority = priority * factor
+    local lease = redis.call('HGET', KEYS[3], id)
+    if redis.call('ZSCORE', KEYS[1], id) then
+      redis.call('ZADD', KEYS[1], priority, id)
+      updated = updated + 1
+    elseif lease then
+      redis.call('HSET', KEYS[3], id, priority .. ' ' .. string.match(lease, '^%S+ (.*)$'))
+      updated = updated + 1
+    else
+      redis.call('HDEL', KEYS[4], id)
+    end
+  end
+end
+return updated
+"""
+
+# Remove the ids still queued, with their terms and failure counts; ids
+# claimed meanwhile are left alone. Returns the removed ids.
+# KEYS: frontier, terms, attempts. ARGV: node ids...
+_EVICT_LUA = """
+local evicted = {}
+for _, id in ipairs(ARGV) do
+  if redis.call('ZREM', KEYS[1], id) == 1 then
+    redis.call('HDEL', KEYS[2], id)
+    redis.call('HDEL', KEYS[3], id)
+    evicted[#evicted + 1] = id
+  end
+end
+return evicted
+"""
+
+LEASE_KEYS = [FRONTIER_KEY, INFLIGHT_KEY, LEASES_KEY]
+RELEASE_KEYS = [*LEASE_KEYS, TERMS_KEY, ATTEMPTS_KEY]
+FAIL_KEYS = [*RELEASE_KEYS, DEAD_KEY]
+TRIM_KEYS = [FRONTIER_KEY, TERMS_KEY, ATTEMPTS_KEY]
+
+_claim_script = r.register_script(_CLAIM_LUA)
+_claim_ids_script = r.register_script(_CLAIM_IDS_LUA)
+_release_script = r.register_script(_RELEASE_LUA)
+_fail_script = r.register_script(_FAIL_LUA)
+_extend_script = r.register_script(_EXTEND_LUA)
+_reap_script = r.register_script(_REAP_LUA)
+_trim_script = r.register_script(_TRIM_LUA)
+_boost_script = r.register_script(_BOOST_LUA)
+_evict_script = r.register_script(_EVICT_LUA)
+
+
+def encode_terms(terms: Sequence[float], factor: float = 1.0) -> str:
+    """Stored form of a node's priority terms (see TERMS_KEY)."""
+    return " ".join(repr(float(value)) for value in (factor, *terms))
+
+
+def push(node_id: str, priority: float, terms: Optional[Sequence[float]] = None) -> None:
+    """Queue a node; with its priority terms, later weight changes re-score it."""
+    if terms is None:
+        r.zadd(FRONTIER_KEY, {node_id: priority})
+        return
+    pipe = r.pipeline()
+    pipe.zadd(FRONTIER_KEY, {node_id: priority})
+    pipe.hset(TERMS_KEY, node_id, encode_terms(terms))
+    pipe.execute()
 
 
 def pop_max() -> str | None:
@@ -22,3 +285,192 @@ def pop_batch(count: int) -> list[str]:
     """Pop up to count highest priority nodes from the frontier."""
     result = r.zpopmax(FRONTIER_KEY, count)
     return [node_id for node_id, priority in result]
+
+
+def claim_batch(
+    count: int, lease_seconds: float | None = None, owner: str = CONSUMER_ID
+) -> list[str]:
+    """Atomically lease up to count highest priority nodes.
+
+    Claimed nodes stay in flight until they are acked, nacked or their lease
+    runs out; expired leases are re-queued before claiming.
+    """
+    lease = lease_seconds if lease_seconds is not None else settings.frontier_lease_seconds
+    return _claim_script(keys=LEASE_KEYS, args=[count, lease, owner])
+
+
+def top(count: int) -> list[tuple[str, float]]:
+    """The count highest priority queued nodes as (id, priority), without claiming them."""
+    return r.zrevrange(FRONTIER_KEY, 0, count - 1, withscores=True) if count > 0 else []
+
+
+def claim(
+    node_ids: Iterable[str], lease_seconds: float | None = None, owner: str = CONSUMER_ID
+) -> list[str]:
+    """Atomically lease the given nodes that are still queued; returns those leased."""
+    lease = lease_seconds if lease_seconds is not None else settings.frontier_lease_seconds
+    node_ids = list(node_ids)
+    if not node_ids:
+        return []
+    return _claim_ids_script(keys=LEASE_KEYS, args=[lease, owner, *node_ids])
+
+
+def ack(node_ids: Iterable[str], owner: str = CONSUMER_ID) -> int:
+    """Finish claimed nodes; returns how many leases this owner still held."""
+    node_ids = list(node_ids)
+    if not node_ids:
+        return 0
+    return _release_script(keys=RELEASE_KEYS, args=[owner, 0, *node_ids])
+
+
+def nack(node_ids: Iterable[str], owner: str = CONSUMER_ID) -> int:
+    """Give claimed nodes back to the frontier with their original priority."""
+    node_ids = list(node_ids)
+    if not node_ids:
+        return 0
+    return _release_script(keys=RELEASE_KEYS, args=[owner, 1, *node_ids])
+
+
+def _attempts(retry: bool) -> int:
+    return max(settings.frontier_max_attempts, 1) if retry else 1
+
+
+def fail(node_ids: Iterable[str], retry: bool = True, owner: str = CONSUMER_ID) -> list[str]:
+    """Give back claimed nodes whose expansion failed.
+
+    Each is re-queued with its original priority until it has failed
+    settings.frontier_max_attempts times, or at once without retry, and is
+    then moved to the dead letters. Returns the dead-lettered ids.
+    """
+    node_ids = list(node_ids)
+    if not node_ids:
+        return []
+    return _fail_script(keys=FAIL_KEYS, args=[owner, _attempts(retry), *node_ids])
+
+
+def dead_letters() -> list[str]:
+    """Nodes given up on after failed expansions, highest priority first."""
+    return r.zrevrange(DEAD_KEY, 0, -1)
+
+
+def extend_leases(
+    node_ids: Iterable[str], lease_seconds: float | None = None, owner: str = CONSUMER_ID
+) -> int:
+    """Push back the deadline of leases this owner still holds."""
+    node_ids = list(node_ids)
+    if not node_ids:
+        return 0
+    lease = lease_seconds if lease_seconds is not None else settings.frontier_lease_seconds
+    return _extend_script(keys=LEASE_KEYS, args=[owner, lease, *node_ids])
+
+
+def requeue_expired() -> list[str]:
+    """Re-queue nodes whose lease ran out, e.g. after a worker crash."""
+    return _reap_script(keys=LEASE_KEYS)
+
+
+def inflight_size() -> int:
+    """Number of nodes currently leased by workers."""
+    return int(r.zcard(INFLIGHT_KEY))
+
+
+def trim(max_size: int | None = None) -> list[str]:
+    """Evict the lowest-priority tail beyond max_size queued nodes.
+
+    Defaults to settings.frontier_max_size; 0 leaves the frontier unbounded.
+    Returns the evicted ids.
+    """
+    cap = settings.frontier_max_size if max_size is None else max_size
+    if cap <= 0:
+        return []
+    return _trim_script(keys=TRIM_KEYS, args=[cap])
+
+
+def boost(node_ids: Iterable[str], factor: float) -> int:
+    """Multiply the priorities of the queued nodes among node_ids by factor."""
+    boosted = 0
+    for chunk in _chunks(list(node_ids), BATCH_SIZE):
+        boosted += _boost_script(keys=[FRONTIER_KEY, TERMS_KEY], args=[factor, *chunk])
+    return boosted
+
+
+def _quotas(depth_quota: int | None, root_quota: int | None) -> tuple[int, int]:
+    return (
+        settings.frontier_depth_quota if depth_quota is None else depth_quota,
+        settings.frontier_root_quota if root_quota is None else root_quota,
+    )
+
+
+class _QuotaWalk:
+    """Queued nodes seen in descending priority order, a page at a time,
+    keeping at most depth_quota per depth and root_quota per root (0: no limit)."""
+
+    def __init__(self, depth_quota: int, root_quota: int):
+        self.depth_quota = depth_quota
+        self.root_quota = root_quota
+        self.kept_by_depth: dict = {}
+        self.kept_by_root: dict = {}
+
+    def over(self, ids: Sequence[str], depths: Sequence[Optional[str]], roots: Sequence[Optional[str]]) -> list[str]:
+        """Ids of the next page beyond their depth or root quota."""
+        evicted = []
+        for node_id, depth, root in zip(ids, depths, roots, strict=True):
+            root = root or node_id
+            if (self.depth_quota > 0 and self.kept_by_depth.get(depth, 0) >= self.depth_quota) or (
+                self.root_quota > 0 and self.kept_by_root.get(root, 0) >= self.root_quota
+            ):
+                evicted.append(node_id)
+                continue
+            self.kept_by_depth[depth] = self.kept_by_depth.get(depth, 0) + 1
+            self.kept_by_root[root] = self.kept_by_root.get(root, 0) + 1
+        return evicted
+
+
+def _stored_depths(stats: dict) -> list[str]:
+    """Depths that have nodes, from the node stats hash."""
+    return [field[len("depth:"):] for field, count in stats.items() if field.startswith("depth:") and int(count) > 0]
+
+
+def _queue_page_lookups(pipe, page: Sequence[str], depths: Sequence[str]) -> None:
+    """Queue the depth set memberships and roots of a page of ids: one command
+    per depth rather than one per id."""
+    for depth in depths:
+        pipe.smismember(DEPTH_INDEX_PREFIX + depth, page)
+    pipe.hmget(ROOTS_INDEX, page)
+
+
+def _page_groups(page: Sequence[str], depths: Sequence[str], replies: list) -> tuple[list, list]:
+    """Depth (None if unknown) and root of each id of a page, from its lookups' replies."""
+    *members, roots = replies
+    page_depths = [None] * len(page)
+    for depth, flags in zip(depths, members, strict=True):
+        for i, member in enumerate(flags):
+            if member:
+                page_depths[i] = depth
+    return page_depths, roots
+
+
+def enforce_quotas(depth_quota: int | None = None, root_quota: int | None = None) -> list[str]:
+    """Evict the lowest-priority queued nodes beyond the per-depth and per-root quotas.
+
+    Quotas default to settings.frontier_depth_quota / frontier_root_quota;
+    0 disables either. Returns the evicted ids.
+    """
+    depth_quota, root_quota = _quotas(depth_quota, root_quota)
+    if depth_quota <= 0 and root_quota <= 0:
+        return []
+    # A page of BATCH_SIZE ids per round trip, so Redis is never held for the
+    # whole frontier; nodes pushed or claimed meanwhile shift the walk, and the
+    # next call catches up
+    depths = _stored_depths(r.hgetall(STATS_KEY)) if depth_quota > 0 else []
+    walk = _QuotaWalk(depth_quota, root_quota)
+    over, start = [], 0
+    while page := r.zrevrange(FRONTIER_KEY, start, start + BATCH_SIZE - 1):
+        pipe = r.pipeline(transaction=False)
+        _queue_page_lookups(pipe, page, depths)
+        over.extend(walk.over(page, *_page_groups(page, depths, pipe.execute())))
+        start += len(page)
+    evicted = []
+    for chunk in _chunks(over, BATCH_SIZE):
+        evicted.extend(_evict_script(keys=TRIM_KEYS, args=chunk))
+    return evicted
@@ -0,0 +1,174 @@
+"""Columnar run snapshots for offline analysis and warm starts.
+
+A snapshot directory holds:
+  nodes.parquet    one row per node, every Node field except emb; emb_row
+                   points into the embedding matrix (-1 when a node has none)
+  embeddings.npy   contiguous float32 (n, dim) matrix, meant to be opened
+                   with np.load(..., mmap_mode="r")
+  frontier.parquet frontier ids and priorities
+  manifest.json    counts and embedding shape
+"""
+
+import json
+import os
+import tempfile
+import time
+import typing
+from typing import Iterator, List, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from backend.core.packed_embedding import PackedEmbedding, pack
+from backend.core.schemas import Node
+from backend.config.settings import settings
+from backend.db.frontier import FRONTIER_KEY
+from backend.db.node_store import BATCH_SIZE, iter_nodes, save_many
+from backend.db.redis_client import get_redis
+
+NODES_FILE = "nodes.parquet"
+EMBEDDINGS_FILE = "embeddings.npy"
+FRONTIER_FILE = "frontier.parquet"
+MANIFEST_FILE = "manifest.json"
+
+FRONTIER_SCHEMA = pa.schema([("id", pa.string()), ("priority", pa.float64())])
+
+_SCALARS = {str: pa.string(), int: pa.int64(), float: pa.float64()}
+
+
+def _arrow_type(annotation) -> Tuple[pa.DataType, bool]:
+    """Arrow type for a Node field annotation; the flag marks JSON-encoded columns."""
+    args = [a for a in typing.get_args(annotation) if a is not type(None)]
+    if typing.get_origin(annotation) is typing.Union and len(args) == 1:
+        annotation = args[0]
+    if annotation in _SCALARS:
+        return _SCALARS[annotation], False
+    if typing.get_origin(annotation) is list and typing.get_args(annotation)[0] in _SCALARS:
+        return pa.list_(_SCALARS[typing.get_args(annotation)[0]]), False
+    return pa.string(), True
+
+
+def _node_schema() -> Tuple[pa.Schema, set]:
+    fields, json_columns = [], set()
+    for name, info in Node.model_fields.items():
+        if name == "emb":
+            continue
+        arrow_type, is_json = _arrow_type(info.annotation)
+        fields.append(pa.field(name, arrow_type))
+        if is_json:
+            json_columns.add(name)
+    fields.append(pa.field("emb_row", pa.int64()))
+    return pa.schema(fields), json_columns
+
+
+def _iter_batches(batch_size: int) -> Iterator[List[Node]]:
+    batch = []
+    for node in iter_nodes(batch_size):
+        batch.append(node)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def export_snapshot(out_dir: str, batch_size: int = BATCH_SIZE) -> dict:
+    """Stream every node and the frontier from Redis into a snapshot directory."""
+    os.makedirs(out_dir, exist_ok=True)
+    schema, json_columns = _node_schema()
+    count, dim = 0, None
+
+    # Embeddings are spooled as raw float32 rows, then framed as .npy once
+    # the row count is known
+    with tempfile.TemporaryFile() as spool:
+        with pq.ParquetWriter(os.path.join(out_dir, NODES_FILE), schema) as writer:
+            for batch in _iter_batches(batch_size):
+                rows = []
+                for node in batch:
+                    row = node.model_dump(exclude={"emb"})
+                    for name in json_columns:
+                        if row[name] is not None:
+                            row[name] = json.dumps(row[name])
+                    row["emb_row"] = -1
+                    if node.emb:
+                        vector = np.asarray(node.emb, dtype=np.float32)
+                        if dim is None:
+                            dim = len(vector)
+                        if len(vector) == dim:
+                            spool.write(vector.tobytes())
+                            row["emb_row"] = count
+                            count += 1
+                    rows.append(row)
+                writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+
+        matrix = np.lib.format.open_memmap(
+            os.path.join(out_dir, EMBEDDINGS_FILE), mode="w+", dtype=np.float32, shape=(count, dim or 0)
+        )
+        spool.seek(0)
+        for start in range(0, count, batch_size):
+            block = np.frombuffer(spool.read(4 * dim * batch_size), dtype=np.float32)
+            matrix[start:start + len(block) // dim] = block.reshape(-1, dim)
+        matrix.flush()
+        del matrix
+
+    frontier = get_redis().zrange(FRONTIER_KEY, 0, -1, withscores=True)
+    pq.write_table(
+        pa.table(
+            {"id": [node_id for node_id, _ in frontier], "priority": [p for _, p in frontier]},
+            schema=FRONTIER_SCHEMA,
+        ),
+        os.path.join(out_dir, FRONTIER_FILE),
+    )
+
+    nodes = pq.ParquetFile(os.path.join(out_dir, NODES_FILE)).metadata.num_rows
+    manifest = {
+        "created_at": time.time(),
+        "nodes": nodes,
+        "embeddings": count,
+        "embedding_dim": dim or 0,
+        "frontier": len(frontier),
+    }
+    with open(os.path.join(out_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_snapshot(snapshot_dir: str) -> Tuple[pa.Table, np.ndarray]:
+    """Open a snapshot: the node table and a memory-mapped embedding matrix."""
+    table = pq.read_table(os.path.join(snapshot_dir, NODES_FILE))
+    embeddings = np.load(os.path.join(snapshot_dir, EMBEDDINGS_FILE), mmap_mode="r")
+    return table, embeddings
+
+
+def import_snapshot(snapshot_dir: str, batch_size: int = BATCH_SIZE, restore_frontier: bool = True) -> int:
+    """Bulk-restore a snapshot into Redis with pipelined saves; returns the node count."""
+    _, json_columns = _node_schema()
+    embeddings = np.load(os.path.join(snapshot_dir, EMBEDDINGS_FILE), mmap_mode="r")
+    dtype = settings.emb_storage_dtype
+    restored = 0
+
+    for record_batch in pq.ParquetFile(os.path.join(snapshot_dir, NODES_FILE)).iter_batches(batch_size):
+        nodes = []
+        for row in record_batch.to_pylist():
+            emb_row = row.pop("emb_row")
+            for name in json_columns:
+                if row.get(name) is not None:
+                    row[name] = json.loads(row[name])
+            node = Node(**{k: v for k, v in row.items() if v is not None})
+            if emb_row is not None and emb_row >= 0:
+                # Pack straight from the mapped row, no float list round trip
+                node.emb = PackedEmbedding(pack(embeddings[emb_row], dtype), dtype)
+            nodes.append(node)
+        save_many(nodes, batch_size)
+        restored += len(nodes)
+
+    frontier_path = os.path.join(snapshot_dir, FRONTIER_FILE)
+    if restore_frontier and os.path.exists(frontier_path):
+        frontier = pq.read_table(frontier_path).to_pydict()
+        items = list(zip(frontier["id"], frontier["priority"], strict=True))
+        r = get_redis()
+        for start in range(0, len(items), batch_size):
+            r.zadd(FRONTIER_KEY, dict(items[start:start + batch_size]))
+    return restored
+
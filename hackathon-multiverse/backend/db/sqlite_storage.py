@@ -0,0 +1,766 @@
+"""Embedded SQLite (WAL) storage for single-host runs and CI without Redis.
+
+Nodes keep their indexed columns (parent, depth, score, cost) next to a JSON
+body and the packed embedding, and their coordinates in a grid-cell index
+(see core.spatial); the frontier is a table with a partial index
+on queued priorities, so claims are one short IMMEDIATE transaction that any
+process on the host can take. Pub/sub is an append-only events table that
+subscribers poll. Conversation samples of system prompt nodes are kept out of
+the JSON body in their own table, compressed and trimmed to
+settings.samples_retention as node_store does on Redis.
+
+Each storage runs its statements on one database thread: a WAL commit with
+synchronous=NORMAL is far cheaper than a network round trip, but waiting out
+another process's write lock (busy_timeout) must not stall the event loop.
+"""
+
+import asyncio
+import functools
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterable, List, Optional, Sequence
+import numpy as np
+from backend.config.settings import settings
+from backend.core.packed_embedding import PackedEmbedding, pack
+from backend.core.schemas import Node, NodeSummary
+from backend.core.spatial import cell_of, cell_ranges, points_in_polygon
+from backend.db.frontier import CONSUMER_ID, _QuotaWalk, _quotas
+from backend.db.node_store import BATCH_SIZE, NODE_LOG_MAXLEN, _chunks, _projection
+from backend.db.storage import NODE_COUNTER_PREFIXES, Storage
+
+SAMPLED = "conversation_samples" in Node.model_fields
+if SAMPLED:
+    from backend.db.node_store import _attach_samples, _encode_samples
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS nodes (
+    id TEXT PRIMARY KEY,
+    parent TEXT,
+    depth INTEGER NOT NULL,
+    score REAL,
+    agent_cost REAL,
+    emb BLOB,
+    emb_dtype TEXT,
+    data TEXT NOT NULL,
+    root TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS nodes_score ON nodes (score);
+CREATE INDEX IF NOT EXISTS nodes_parent ON nodes (parent);
+CREATE INDEX IF NOT EXISTS nodes_depth ON nodes (depth);
+
+CREATE TABLE IF NOT EXISTS node_xy (
+    id TEXT PRIMARY KEY,
+    cell INTEGER NOT NULL,
+    x REAL NOT NULL,
+    y REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS node_xy_cell ON node_xy (cell);
+CREATE TRIGGER IF NOT EXISTS node_xy_delete AFTER DELETE ON nodes BEGIN
+    DELETE FROM node_xy WHERE id = old.id;
+END;
+
+CREATE TABLE IF NOT EXISTS samples (
+    id TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS samples_delete AFTER DELETE ON nodes BEGIN
+    DELETE FROM samples WHERE id = old.id;
+END;
+
+-- Node creations and deletions for readers catching up (see Storage.node_changes),
+-- trimmed to the last NODE_LOG_MAXLEN entries
+CREATE TABLE IF NOT EXISTS node_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL,
+    deleted INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS node_log_insert BEFORE INSERT ON nodes
+WHEN NOT EXISTS (SELECT 1 FROM nodes WHERE id = new.id) BEGIN
+    INSERT INTO node_log (id, deleted) VALUES (new.id, 0);
+END;
+CREATE TRIGGER IF NOT EXISTS node_log_delete AFTER DELETE ON nodes BEGIN
+    INSERT INTO node_log (id, deleted) VALUES (old.id, 1);
+END;
+CREATE TRIGGER IF NOT EXISTS node_log_trim AFTER INSERT ON node_log BEGIN
+    DELETE FROM node_log WHERE seq <= new.seq - {NODE_LOG_MAXLEN};
+END;
+
+CREATE TABLE IF NOT EXISTS frontier (
+    id TEXT PRIMARY KEY,
+    priority REAL NOT NULL,
+    deadline REAL,
+    owner TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS frontier_queued ON frontier (priority) WHERE deadline IS NULL;
+CREATE INDEX IF NOT EXISTS frontier_leased ON frontier (deadline) WHERE deadline IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS frontier_terms (
+    id TEXT PRIMARY KEY,
+    factor REAL NOT NULL,
+    terms TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS dead_letters (
+    id TEXT PRIMARY KEY,
+    priority REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS layouts (
+    version INTEGER PRIMARY KEY,
+    reducer BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS states (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS locks (
+    name TEXT PRIMARY KEY,
+    deadline REAL NOT NULL,
+    owner TEXT NOT NULL DEFAULT ''
+);
+"""
+
+# Columns added since the first schema, for tables created before them
+_ADDED_COLUMNS = [
+    ("locks", "owner", "TEXT NOT NULL DEFAULT ''"),
+    ("frontier", "attempts", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+_NODE_COLUMNS = "id, emb, emb_dtype, data"
+
+# A node inherits its parent's root; a parent not stored here is taken as a root
+_INSERT_NODE = (
+    "INSERT OR REPLACE INTO nodes VALUES "
+    "(?, ?, ?, ?, ?, ?, ?, ?, COALESCE((SELECT root FROM nodes WHERE id = ?2), ?2, ?1))"
+)
+# Only for nodes that (still) exist, so a re-projection never indexes deleted ones
+_INDEX_XY = (
+    "INSERT OR REPLACE INTO node_xy SELECT ?1, ?2, ?3, ?4 "
+    "WHERE EXISTS (SELECT 1 FROM nodes WHERE id = ?1)"
+)
+_PUSH = (
+    "INSERT INTO frontier (id, priority) VALUES (?, ?) "
+    "ON CONFLICT (id) DO UPDATE SET priority = excluded.priority, deadline = NULL, owner = NULL"
+)
+_SET_TERMS = "INSERT OR REPLACE INTO frontier_terms VALUES (?, 1.0, ?)"
+_INCR = (
+    "INSERT INTO counters (name, value) VALUES (?, ?) "
+    "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value RETURNING value"
+)
+
+EVENTS_KEPT = 10_000  # published messages retained for slow subscribers
+POLL_INTERVAL = 0.1  # seconds between subscriber polls
+
+
+def _threaded(method):
+    """Make a blocking SQLiteStorage method a coroutine run on its database thread."""
+
+    @functools.wraps(method)
+    async def run(self, *args, **kwargs):
+        return await self._run(method, self, *args, **kwargs)
+
+    return run
+
+
+class SQLiteStorage(Storage):
+    def __init__(self, path: str):
+        self.path = path
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA busy_timeout=5000")
+        self.db.executescript(_SCHEMA)
+        self._backfill_xy()
+        self._add_columns()
+
+    async def _run(self, fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self._thread, functools.partial(fn, *args, **kwargs))
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the write lock up front so claims never interleave
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.db
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    # Nodes
+
+    @staticmethod
+    def _row(node: Node) -> tuple:
+        dtype = settings.emb_storage_dtype
+        emb = None
+        if node.emb:
+            emb = node.emb.raw if isinstance(node.emb, PackedEmbedding) and node.emb.dtype == dtype else pack(node.emb, dtype)
+        data = json.dumps(node.model_dump(exclude={"emb", "conversation_samples"}, exclude_none=True))
+        return (node.id, node.parent, node.depth, node.score, node.agent_cost, emb, dtype if emb else None, data)
+
+    @staticmethod
+    def _xy_row(node_id: str, xy: Sequence[float]) -> tuple:
+        return (node_id, cell_of(xy), xy[0], xy[1])
+
+    def _backfill_xy(self) -> None:
+        """Index the coordinates of nodes saved before the node_xy table existed."""
+        if self.db.execute("SELECT 1 FROM node_xy LIMIT 1").fetchone():
+            return
+        rows = self.db.execute("SELECT id, json_extract(data, '$.xy') FROM nodes WHERE json_extract(data, '$.xy') IS NOT NULL")
+        xy_rows = [self._xy_row(node_id, json.loads(xy)) for node_id, xy in rows]
+        if xy_rows:
+            with self._transaction() as db:
+                db.executemany(_INDEX_XY, xy_rows)
+
+    def _add_columns(self) -> None:
+        """Add the _ADDED_COLUMNS missing from tables an older schema created."""
+        for table, column, definition in _ADDED_COLUMNS:
+            if column not in [row[1] for row in self.db.execute(f"PRAGMA table_info({table})")]:
+                self.db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    @staticmethod
+    def _node(row: tuple, names: Optional[List[str]] = None) -> Node | NodeSummary:
+        _, emb, emb_dtype, data = row
+        values = json.loads(data)
+        if names is None:
+            node = Node(**values)
+        else:
+            node = NodeSummary(**{k: v for k, v in values.items() if k in names})
+        if emb is not None and (names is None or "emb" in names):
+            node.emb = PackedEmbedding(emb, emb_dtype)
+        return node
+
+    @staticmethod
+    def _names(fields: Optional[Sequence[str]]) -> Optional[List[str]]:
+        return None if fields is None else _projection(fields)
+
+    @staticmethod
+    def _sample_rows(nodes: List[Node]) -> List[tuple]:
+        """Samples to store; nodes loaded without samples leave theirs alone."""
+        if not SAMPLED:
+            return []
+        return [(node.id, _encode_samples(node.conversation_samples)) for node in nodes if node.conversation_samples]
+
+    async def save(self, node):
+        await self.save_many([node])
+
+    @_threaded
+    def save_many(self, nodes):
+        nodes = list(nodes)
+        for chunk in _chunks(nodes, BATCH_SIZE):
+            with self._transaction() as db:
+                db.executemany(_INSERT_NODE, [self._row(node) for node in chunk])
+                db.executemany(_INDEX_XY, [self._xy_row(node.id, node.xy) for node in chunk if node.xy])
+                db.executemany("INSERT OR REPLACE INTO samples VALUES (?, ?)", self._sample_rows(chunk))
+
+    @_threaded
+    def get(self, node_id, fields=None):
+        row = self.db.execute(f"SELECT {_NODE_COLUMNS} FROM nodes WHERE id = ?", (node_id,)).fetchone()
+        return self._node(row, self._names(fields)) if row else None
+
+    @_threaded
+    def get_many(self, node_ids, fields=None):
+        names = self._names(fields)
+        nodes = []
+        for chunk in _chunks(list(node_ids), BATCH_SIZE):
+            placeholders = ",".join("?" * len(chunk))
+            rows = {
+                row[0]: row
+                for row in self.db.execute(f"SELECT {_NODE_COLUMNS} FROM nodes WHERE id IN ({placeholders})", chunk)
+            }
+            nodes.extend(self._node(rows[node_id], names) for node_id in chunk if node_id in rows)
+        return nodes
+
+    async def iter_nodes(self, fields=None):
+        names = self._names(fields)
+        cursor = await self._run(self.db.execute, f"SELECT {_NODE_COLUMNS} FROM nodes")
+        while rows := await self._run(lambda: [self._node(row, names) for row in cursor.fetchmany(BATCH_SIZE)]):
+            for node in rows:
+                yield node
+
+    @_threaded
+    def top_by_score(self, k, fields=None):
+        if k <= 0:
+            return []
+        rows = self.db.execute(
+            f"SELECT {_NODE_COLUMNS} FROM nodes WHERE score IS NOT NULL ORDER BY score DESC LIMIT ?", (k,)
+        )
+        names = self._names(fields)
+        return [self._node(row, names) for row in rows]
+
+    @_threaded
+    def get_path(self, node_id, fields=None):
+        names = self._names(fields) or list(NodeSummary.model_fields)
+        rows = self.db.execute(
+            """
+            WITH RECURSIVE path(id, parent, level) AS (
+                SELECT id, parent, 0 FROM nodes WHERE id = ?
+                UNION ALL
+                SELECT nodes.id, nodes.parent, path.level + 1 FROM nodes JOIN path ON nodes.id = path.parent
+            )
+            SELECT nodes.id, nodes.emb, nodes.emb_dtype, nodes.data
+            FROM path JOIN nodes ON nodes.id = path.id ORDER BY path.level DESC
+            """,
+            (node_id,),
+        )
+        return [self._node(row, names) for row in rows]
+
+    @_threaded
+    def delete_many(self, node_ids):
+        deleted = 0
+        for chunk in _chunks(list(node_ids), BATCH_SIZE):
+            placeholders = ",".join("?" * len(chunk))
+            with self._transaction() as db:
+                deleted += db.execute(f"DELETE FROM nodes WHERE id IN ({placeholders})", chunk).rowcount
+                db.execute(f"DELETE FROM frontier_terms WHERE id IN ({placeholders})", chunk)
+                db.executemany(
+                    "DELETE FROM counters WHERE name = ?",
+                    [(prefix + node_id,) for node_id in chunk for prefix in NODE_COUNTER_PREFIXES],
+                )
+        return deleted
+
+    async def load_full(self, node_ids):
+        nodes = await self.get_many(node_ids)
+        if SAMPLED:
+            blobs = await self._samples([node.id for node in nodes])
+            for node in nodes:
+                _attach_samples(node, blobs.get(node.id))
+        return nodes
+
+    @_threaded
+    def _samples(self, node_ids: List[str]) -> dict:
+        blobs = {}
+        for chunk in _chunks(node_ids, BATCH_SIZE):
+            placeholders = ",".join("?" * len(chunk))
+            blobs.update(self.db.execute(f"SELECT id, data FROM samples WHERE id IN ({placeholders})", chunk))
+        return blobs
+
+    @_threaded
+    def leaves(self, node_ids):
+        leaves = []
+        for chunk in _chunks(list(node_ids), BATCH_SIZE):
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.db.execute(
+                f"SELECT id FROM nodes WHERE id IN ({placeholders}) "
+                "AND NOT EXISTS (SELECT 1 FROM nodes AS child WHERE child.parent = nodes.id)",
+                chunk,
+            )
+            leaves.extend(row[0] for row in rows)
+        return leaves
+
+    @_threaded
+    def nodes_in_polygon(self, polygon):
+        rows = []
+        for first, last in cell_ranges(polygon):
+            rows.extend(self.db.execute("SELECT id, x, y FROM node_xy WHERE cell BETWEEN ? AND ?", (first, last)))
+        if not rows:
+            return []
+        inside = points_in_polygon(np.array([(x, y) for _, x, y in rows]), polygon)
+        return [node_id for (node_id, _, _), hit in zip(rows, inside, strict=True) if hit]
+
+    @_threaded
+    def roots(self, node_ids):
+        found = {}
+        for chunk in _chunks(list(node_ids), BATCH_SIZE):
+            placeholders = ",".join("?" * len(chunk))
+            found.update(self.db.execute(f"SELECT id, root FROM nodes WHERE id IN ({placeholders})", chunk))
+        return found
+
+    @_threaded
+    def node_count(self):
+        return self.db.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+
+    @_threaded
+    def node_log_cursor(self):
+        return str(self.db.execute("SELECT COALESCE(MAX(seq), 0) FROM node_log").fetchone()[0])
+
+    @_threaded
+    def node_changes(self, cursor):
+        seq = int(cursor)
+        oldest = self.db.execute("SELECT MIN(seq) FROM node_log").fetchone()[0]
+        if oldest is not None and oldest > seq + 1:
+            return None  # trimmed past the cursor
+        rows = self.db.execute("SELECT seq, id, deleted FROM node_log WHERE seq > ? ORDER BY seq", (seq,)).fetchall()
+        added = [node_id for _, node_id, deleted in rows if not deleted]
+        removed = [node_id for _, node_id, deleted in rows if deleted]
+        return (str(rows[-1][0]) if rows else cursor), added, removed
+
+    async def ensure_indexes(self):
+        pass  # indexed on write; the xy backfill runs at open
+
+    @_threaded
+    def node_stats(self):
+        total, cost = self.db.execute("SELECT COUNT(*), COALESCE(SUM(agent_cost), 0) FROM nodes").fetchone()
+        depths = dict(self.db.execute("SELECT depth, COUNT(*) FROM nodes GROUP BY depth ORDER BY depth"))
+        return {"total": total, "cost": float(cost), "depths": depths}
+
+    # Frontier
+
+    @_threaded
+    def push(self, node_id, priority, terms=None):
+        with self._transaction() as db:
+            db.execute(_PUSH, (node_id, priority))
+            if terms is not None:
+                db.execute(_SET_TERMS, (node_id, json.dumps(list(terms))))
+
+    def _reap(self, db) -> List[str]:
+        rows = db.execute(
+            "UPDATE frontier SET deadline = NULL, owner = NULL WHERE deadline <= ? RETURNING id", (time.time(),)
+        )
+        return [row[0] for row in rows]
+
+    @_threaded
+    def claim_batch(self, count, lease_seconds=None):
+        lease = lease_seconds if lease_seconds is not None else settings.frontier_lease_seconds
+        with self._transaction() as db:
+            self._reap(db)
+            ids = [
+                row[0]
+                for row in db.execute(
+                    "SELECT id FROM frontier WHERE deadline IS NULL ORDER BY priority DESC LIMIT ?", (count,)
+                )
+            ]
+            db.executemany(
+                "UPDATE frontier SET deadline = ?, owner = ? WHERE id = ?",
+                [(time.time() + lease, CONSUMER_ID, node_id) for node_id in ids],
+            )
+        return ids
+
+    @_threaded
+    def frontier_top(self, count):
+        rows = self.db.execute(
+            "SELECT id, priority FROM frontier WHERE deadline IS NULL ORDER BY priority DESC LIMIT ?", (count,)
+        )
+        return [(node_id, float(priority)) for node_id, priority in rows]
+
+    @_threaded
+    def claim(self, node_ids, lease_seconds=None):
+        lease = lease_seconds if lease_seconds is not None else settings.frontier_lease_seconds
+        node_ids = list(dict.fromkeys(node_ids))
+        with self._transaction() as db:
+            self._reap(db)
+            claimed = []
+            for node_id in node_ids:
+                cursor = db.execute(
+                    "UPDATE frontier SET deadline = ?, owner = ? WHERE id = ? AND deadline IS NULL",
+                    (time.time() + lease, CONSUMER_ID, node_id),
+                )
+                if cursor.rowcount:
+                    claimed.append(node_id)
+        return claimed
+
+    def _release(self, node_ids: Iterable[str], requeue: bool) -> int:
+        node_ids = list(node_ids)
+        if not node_ids:
+            return 0
+        if requeue:
+            sql = "UPDATE frontier SET deadline = NULL, owner = NULL WHERE id = ? AND owner = ?"
+        else:
+            sql = "DELETE FROM frontier WHERE id = ? AND owner = ?"
+        with self._transaction() as db:
+            before = db.total_changes
+            db.executemany(sql, [(node_id, CONSUMER_ID) for node_id in node_ids])
+            released = db.total_changes - before
+            if not requeue:
+                db.executemany(
+                    "DELETE FROM frontier_terms WHERE id = ? "
+                    "AND NOT EXISTS (SELECT 1 FROM frontier WHERE frontier.id = frontier_terms.id)",
+                    [(node_id,) for node_id in node_ids],
+                )
+            return released
+
+    @_threaded
+    def ack(self, node_ids):
+        return self._release(node_ids, requeue=False)
+
+    @_threaded
+    def nack(self, node_ids):
+        return self._release(node_ids, requeue=True)
+
+    @_threaded
+    def fail(self, node_ids, retry=True):
+        allowed = max(settings.frontier_max_attempts, 1) if retry else 1
+        dead = []
+        with self._transaction() as db:
+            for node_id in dict.fromkeys(node_ids):
+                row = db.execute(
+                    "UPDATE frontier SET deadline = NULL, owner = NULL, attempts = attempts + 1 "
+                    "WHERE id = ? AND owner = ? RETURNING priority, attempts",
+                    (node_id, CONSUMER_ID),
+                ).fetchone()
+                if row and row[1] >= allowed:
+                    db.execute("DELETE FROM frontier WHERE id = ?", (node_id,))
+                    db.execute("DELETE FROM frontier_terms WHERE id = ?", (node_id,))
+                    db.execute("INSERT OR REPLACE INTO dead_letters VALUES (?, ?)", (node_id, row[0]))
+                    dead.append(node_id)
+        return dead
+
+    @_threaded
+    def dead_letters(self):
+        return [row[0] for row in self.db.execute("SELECT id FROM dead_letters ORDER BY priority DESC")]
+
+    @_threaded
+    def extend_leases(self, node_ids, lease_seconds=None):
+        lease = lease_seconds if lease_seconds is not None else settings.frontier_lease_seconds
+        with self._transaction() as db:
+            before = db.total_changes
+            db.executemany(
+                "UPDATE frontier SET deadline = ? WHERE id = ? AND owner = ?",
+                [(time.time() + lease, node_id, CONSUMER_ID) for node_id in node_ids],
+            )
+            return db.total_changes - before
+
+    @_threaded
+    def requeue_expired(self):
+        with self._transaction() as db:
+            return self._reap(db)
+
+    @_threaded
+    def frontier_size(self):
+        return self.db.execute("SELECT COUNT(*) FROM frontier WHERE deadline IS NULL").fetchone()[0]
+
+    @_threaded
+    def inflight_size(self):
+        return self.db.execute("SELECT COUNT(*) FROM frontier WHERE deadline IS NOT NULL").fetchone()[0]
+
+    @_threaded
+    def boost(self, node_ids, factor):
+        boosted = 0
+        for chunk in _chunks(list(node_ids), BATCH_SIZE):
+            placeholders = ",".join("?" * len(chunk))
+            with self._transaction() as db:
+                db.execute(
+                    "UPDATE frontier_terms SET factor = factor * ? WHERE id IN "
+                    f"(SELECT id FROM frontier WHERE id IN ({placeholders}) AND deadline IS NULL)",
+                    [factor, *chunk],
+                )
+                boosted += db.execute(
+                    f"UPDATE frontier SET priority = priority * ? WHERE id IN ({placeholders}) AND deadline IS NULL",
+                    [factor, *chunk],
+                ).rowcount
+        return boosted
+
+    @_threaded
+    def reweigh_frontier(self, weights):
+        with self._transaction() as db:
+            db.execute("DELETE FROM frontier_terms WHERE id NOT IN (SELECT id FROM frontier)")
+            rows = db.execute("SELECT id, factor, terms FROM frontier_terms").fetchall()
+            if not rows:
+                return 0
+            ids, factors, terms = zip(*rows, strict=True)
+            # Terms stored under a different term list are cut or zero-padded
+            # to the weights, as the Redis script reads them
+            matrix = np.zeros((len(terms), len(weights)), dtype=np.float64)
+            for row, values in zip(matrix, terms, strict=True):
+                values = json.loads(values)[: len(weights)]
+                row[: len(values)] = values
+            priorities = np.asarray(factors) * (matrix @ np.asarray(weights, dtype=np.float64))
+            # Claimed rows keep their priority column, so a nack re-queues them re-scored too
+            db.executemany("UPDATE frontier SET priority = ? WHERE id = ?", zip(priorities.tolist(), ids, strict=True))
+        return len(ids)
+
+    @_threaded
+    def trim_frontier(self, max_size=None):
+        cap = settings.frontier_max_size if max_size is None else max_size
+        if cap <= 0:
+            return []
+        with self._transaction() as db:
+            rows = db.execute(
+                "DELETE FROM frontier WHERE id IN "
+                "(SELECT id FROM frontier WHERE deadline IS NULL ORDER BY priority DESC LIMIT -1 OFFSET ?) RETURNING id",
+                (cap,),
+            )
+            dropped = [row[0] for row in rows]
+            db.executemany("DELETE FROM frontier_terms WHERE id = ?", [(node_id,) for node_id in dropped])
+            return dropped
+
+    @_threaded
+    def enforce_quotas(self, depth_quota=None, root_quota=None):
+        depth_quota, root_quota = _quotas(depth_quota, root_quota)
+        if depth_quota <= 0 and root_quota <= 0:
+            return []
+        with self._transaction() as db:
+            rows = db.execute(
+                "SELECT frontier.id, nodes.depth, nodes.root FROM frontier LEFT JOIN nodes ON nodes.id = frontier.id "
+                "WHERE frontier.deadline IS NULL ORDER BY frontier.priority DESC"
+            ).fetchall()
+            evicted = _QuotaWalk(depth_quota, root_quota).over(*zip(*rows, strict=True)) if rows else []
+            db.executemany("DELETE FROM frontier WHERE id = ?", [(node_id,) for node_id in evicted])
+            db.executemany("DELETE FROM frontier_terms WHERE id = ?", [(node_id,) for node_id in evicted])
+        return evicted
+
+    # Counters
+
+    @_threaded
+    def incr_counters(self, amounts):
+        with self._transaction() as db:
+            return self._incr(db, amounts)
+
+    @staticmethod
+    def _incr(db, amounts) -> dict:
+        return {name: db.execute(_INCR, (name, amount)).fetchone()[0] for name, amount in amounts.items()}
+
+    @_threaded
+    def get_counter(self, name):
+        row = self.db.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return float(row[0]) if row else 0.0
+
+    @_threaded
+    def get_counters(self, names):
+        values = dict.fromkeys(names, 0.0)
+        for chunk in _chunks(list(values), BATCH_SIZE):
+            placeholders = ",".join("?" * len(chunk))
+            values.update(self.db.execute(f"SELECT name, value FROM counters WHERE name IN ({placeholders})", chunk))
+        return values
+
+    # Caches
+
+    async def cache(self, entries, ttl=None):
+        pass  # paths resolve in one local query, nothing to cache
+
+    # Pub/sub
+
+    @_threaded
+    def publish(self, channel, message):
+        with self._transaction() as db:
+            self._publish(db, [(channel, message)])
+
+    @staticmethod
+    def _publish(db, messages) -> None:
+        event_id = None
+        for channel, message in messages:
+            event_id = db.execute("INSERT INTO events (channel, message) VALUES (?, ?)", (channel, message)).lastrowid
+        if event_id is not None:
+            db.execute("DELETE FROM events WHERE id <= ?", (event_id - EVENTS_KEPT,))
+
+    @_threaded
+    def _events(self, channel: str, after: Optional[int]) -> List[tuple]:
+        """(id, message) events of channel after id; with no id, just the latest event's id."""
+        if after is None:
+            return [(self.db.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0], None)]
+        return self.db.execute(
+            "SELECT id, message FROM events WHERE id > ? AND channel = ? ORDER BY id", (after, channel)
+        ).fetchall()
+
+    async def subscribe(self, channel):
+        last_id = (await self._events(channel, None))[0][0]
+        while True:
+            rows = await self._events(channel, last_id)
+            for _, message in rows:
+                yield message
+            if rows:
+                last_id = rows[-1][0]
+            else:
+                await asyncio.sleep(POLL_INTERVAL)
+
+    # Settings overrides
+
+    @_threaded
+    def save_settings(self, values, channel, message):
+        with self._transaction() as db:
+            db.executemany("INSERT OR REPLACE INTO settings VALUES (?, ?)", values.items())
+            self._publish(db, [(channel, message)])
+
+    @_threaded
+    def load_settings(self):
+        return dict(self.db.execute("SELECT name, value FROM settings"))
+
+    # Layouts
+
+    @_threaded
+    def layout_version(self):
+        return self.db.execute("SELECT COALESCE(MAX(version), 0) FROM layouts").fetchone()[0]
+
+    @_threaded
+    def load_layout(self):
+        row = self.db.execute("SELECT version, reducer FROM layouts ORDER BY version DESC LIMIT 1").fetchone()
+        return (row[0], row[1]) if row else (0, None)
+
+    @_threaded
+    def save_layout(self, version, reducer, xy, channel, message):
+        with self._transaction() as db:
+            if db.execute("SELECT COALESCE(MAX(version), 0) FROM layouts").fetchone()[0] != version - 1:
+                return False
+            db.execute("DELETE FROM layouts")  # only the current reducer is kept
+            db.execute("INSERT INTO layouts VALUES (?, ?)", (version, reducer))
+            db.executemany(
+                "UPDATE nodes SET data = json_set(data, '$.xy', json(?)) WHERE id = ?",
+                [(json.dumps(coords), node_id) for node_id, coords in xy.items()],
+            )
+            db.executemany(_INDEX_XY, [self._xy_row(node_id, coords) for node_id, coords in xy.items()])
+            self._publish(db, [(channel, message)])
+        return True
+
+    # Versioned state
+
+    @_threaded
+    def state_version(self, name):
+        row = self.db.execute("SELECT version FROM states WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    @_threaded
+    def load_state(self, name):
+        row = self.db.execute("SELECT version, data FROM states WHERE name = ?", (name,)).fetchone()
+        return (row[0], row[1]) if row else (0, None)
+
+    @_threaded
+    def save_state(self, name, version, data):
+        with self._transaction() as db:
+            row = db.execute("SELECT version FROM states WHERE name = ?", (name,)).fetchone()
+            if (row[0] if row else 0) != version - 1:
+                return False
+            db.execute("INSERT OR REPLACE INTO states VALUES (?, ?, ?)", (name, version, data))
+        return True
+
+    # Locks
+
+    @_threaded
+    def try_lock(self, name, seconds):
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("DELETE FROM locks WHERE name = ? AND deadline <= ?", (name, now))
+            return db.execute("INSERT OR IGNORE INTO locks VALUES (?, ?, ?)", (name, now + seconds, CONSUMER_ID)).rowcount == 1
+
+    @_threaded
+    def unlock(self, name):
+        with self._transaction() as db:
+            return db.execute("DELETE FROM locks WHERE name = ? AND owner = ?", (name, CONSUMER_ID)).rowcount == 1
+
+    # Batched writes
+
+    @_threaded
+    def write_batch(self, nodes, pushes, counters, messages, terms=None, caches=None):
+        rows = [self._row(node) for node in nodes]
+        with self._transaction() as db:
+            db.executemany(_INSERT_NODE, rows)
+            db.executemany("INSERT OR REPLACE INTO samples VALUES (?, ?)", self._sample_rows(nodes))
+            db.executemany(_INDEX_XY, [self._xy_row(node.id, node.xy) for node in nodes if node.xy])
+            db.executemany(_PUSH, pushes.items())
+            db.executemany(_SET_TERMS, [(node_id, json.dumps(list(values))) for node_id, values in (terms or {}).items()])
+            totals = self._incr(db, counters)
+            self._publish(db, messages)
+        return totals
@@ -0,0 +1,150 @@
+"""Write-behind buffer for the storage writes of a worker batch.
+
+Inside `async with WriteBuffer(storage)`, node saves, frontier pushes, cache
+entries, usage increments and graph updates are queued and flushed together through
+Storage.write_batch (one MULTI/EXEC on Redis, one transaction on SQLite)
+once write_buffer_max_items are pending, every write_buffer_flush_interval
+seconds, and on exit. Code that may run with or without a batch writes via
+writer(), which falls back to the storage itself.
+
+Given weigh, pushes that carry priority terms are weighed when they are
+flushed rather than when they are queued, so a batch queued before a weight
+change (see orchestrator.weights) lands under the new weights.
+"""
+
+import asyncio
+import weakref
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from backend.config.settings import settings
+from backend.core.logger import get_logger
+from backend.core.schemas import Node
+from backend.db.storage import Storage, get_storage
+
+logger = get_logger(__name__)
+
+_current: ContextVar[Optional["WriteBuffer"]] = ContextVar("write_buffer", default=None)
+
+# Counter values per storage as of this process's last flush, so each batch
+# can report running totals without reading them back
+_totals: "weakref.WeakKeyDictionary[Storage, Dict[str, float]]" = weakref.WeakKeyDictionary()
+
+
+def writer() -> "WriteBuffer | Storage":
+    """The buffer of the enclosing batch, or the storage for immediate writes."""
+    buffer = _current.get()
+    return buffer if buffer is not None else get_storage()
+
+
+class WriteBuffer:
+    """Queues save/push/cache/publish/incr_counters with the same signatures as Storage."""
+
+    def __init__(
+        self,
+        storage: Storage,
+        max_items: int | None = None,
+        flush_interval: float | None = None,
+        weigh: Optional[Callable[[Sequence[float]], float]] = None,
+    ):
+        self.storage = storage
+        self.weigh = weigh
+        self.max_items = settings.write_buffer_max_items if max_items is None else max_items
+        self.flush_interval = settings.write_buffer_flush_interval if flush_interval is None else flush_interval
+        self._nodes: Dict[str, Node] = {}  # a re-saved node only needs its last version
+        self._pushes: Dict[str, float] = {}
+        self._terms: Dict[str, Sequence[float]] = {}
+        self._caches: Dict[str, Tuple[str, Optional[int]]] = {}
+        self._counters: Dict[str, float] = {}
+        self._messages: List[Tuple[str, str]] = []
+        self._totals = _totals.setdefault(storage, {})
+        self._flusher: Optional[asyncio.Task] = None
+        self._token = None
+
+    def __len__(self) -> int:
+        return len(self._nodes) + len(self._pushes) + len(self._caches) + len(self._counters) + len(self._messages)
+
+    async def __aenter__(self) -> "WriteBuffer":
+        self._token = _current.set(self)
+        if self.flush_interval > 0:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        _current.reset(self._token)
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                # The writes stay queued for the next flush
+                logger.error(f"Write buffer flush failed: {e}")
+
+    async def _written(self) -> None:
+        if self.max_items > 0 and len(self) >= self.max_items:
+            await self.flush()
+
+    async def save(self, node: Node) -> None:
+        self._nodes[node.id] = node
+        await self._written()
+
+    async def push(self, node_id: str, priority: float, terms: Optional[Sequence[float]] = None) -> None:
+        self._pushes[node_id] = priority
+        if terms is not None:
+            self._terms[node_id] = terms
+        await self._written()
+
+    async def cache(self, entries: Dict[str, str], ttl: Optional[int] = None) -> None:
+        for key, value in entries.items():
+            self._caches[key] = (value, ttl)
+        await self._written()
+
+    async def publish(self, channel: str, message: str) -> None:
+        self._messages.append((channel, message))
+        await self._written()
+
+    async def incr_counters(self, amounts: Dict[str, float]) -> Dict[str, float]:
+        """Queue counter increments; returns the totals they will flush to."""
+        for name in amounts:
+            if name not in self._totals:
+                total = await self.storage.get_counter(name)
+                self._totals.setdefault(name, total)
+        for name, amount in amounts.items():
+            self._counters[name] = self._counters.get(name, 0.0) + amount
+        totals = {name: self._totals[name] + self._counters.get(name, 0.0) for name in amounts}
+        await self._written()
+        return totals
+
+    async def flush(self) -> None:
+        """Write everything queued so far in one storage transaction."""
+        if not len(self):
+            return
+        # Swap before awaiting so writes queued during the flush go to the next one
+        nodes, pushes, counters, messages = list(self._nodes.values()), self._pushes, self._counters, self._messages
+        terms, caches = self._terms, self._caches
+        self._nodes, self._pushes, self._counters, self._messages, self._terms, self._caches = {}, {}, {}, [], {}, {}
+        try:
+            priorities = pushes
+            if self.weigh is not None:
+                priorities = {node_id: self.weigh(terms[node_id]) if node_id in terms else priority for node_id, priority in pushes.items()}
+            totals = await self.storage.write_batch(nodes, priorities, counters, messages, terms, caches)
+        except BaseException:
+            # Put the writes back ahead of anything queued since
+            self._nodes = {**{node.id: node for node in nodes}, **self._nodes}
+            self._pushes = {**pushes, **self._pushes}
+            self._terms = {**terms, **self._terms}
+            self._caches = {**caches, **self._caches}
+            for name, amount in self._counters.items():
+                counters[name] = counters.get(name, 0.0) + amount
+            self._counters = counters
+            self._messages = messages + self._messages
+            raise
+        self._totals.update(totals)
@@ -3,7 +3,7 @@ from typing import Dict, List, Tuple, Optional, Union
 import openai
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from backend.config.settings import settings
-from backend.db.redis_client import get_redis
+from backend.db.write_buffer import writer
 from backend.core.logger import get_logger
 
 logger = get_logger(__name__)
@@ -85,16 +85,15 @@ def truncate_prompt(messages: List[Dict[str, str]], max_tokens: int = 512) -> Li
 
 
 async def update_usage_counter(cost: float, prompt_tokens: int, completion_tokens: int, model: str, n: int):
-    """Update Redis usage counters."""
-    r = get_redis()
-    
-    # Increment counters
-    r.incrbyfloat("usage:prompt_tokens", prompt_tokens)
-    r.incrbyfloat("usage:completion_tokens", completion_tokens)
-    r.incrbyfloat("usage:total_cost", cost)
-    
-    # Get new total for logging
-    new_total = float(r.get("usage:total_cost") or 0.0)
+    """Update usage counters in the configured storage."""
+    # Increment counters in one round trip (or queue them on the worker batch's
+    # write buffer); the new totals come back
+    totals = await writer().incr_counters({
+        "usage:prompt_tokens": prompt_tokens,
+        "usage:completion_tokens": completion_tokens,
+        "usage:total_cost": cost,
+    })
+    new_total = totals["usage:total_cost"]
     
     # Log in exact format specified
     logger.info(
@@ -0,0 +1,234 @@
+"""Frontier selection policies: which queued nodes a worker expands next.
+
+"greedy" claims the highest priorities, as the scheduler ranks them. The
+other policies read the settings.policy_pool_size highest priority queued
+nodes, re-rank them and claim their picks by id:
+
+- "ucb": UCB1 with one arm per root, so subtrees that keep paying off are
+  expanded more, and rarely tried ones still get their turn.
+- "thompson": samples each node's score from a posterior as wide as the
+  critic evidence behind it: its score_ci if the node keeps one, else a Beta
+  sized by its sample_count. Nodes scored on little evidence are sometimes
+  tried ahead of their priority.
+- "beam": at most settings.beam_width expansions per depth, shallowest depth
+  first; queued nodes at a depth whose beam is used up are dropped from the
+  frontier (they stay in the graph).
+- "mcts": UCT over the tree statistics, valuing a node by its parent's
+  backed-up mean score plus an exploration bonus.
+
+observe() backs the scores of new children up every ancestor of the expanded
+node, resolving the paths of a whole batch together and adding to every
+counter in one call. The statistics and beam counts are storage counters, so
+every worker shares them (a node's statistics are deleted with it);
+concurrent workers may overshoot a beam by up to one batch.
+"""
+
+import math
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from backend.config.settings import settings
+from backend.core.schemas import NodeSummary
+from backend.db.storage import VALUE_PREFIX, VISITS_PREFIX
+
+TOTAL_VISITS = "policy:visits"
+BEAM_PREFIX = "policy:beam:"      # expansions claimed per depth
+
+# Fields a policy reads to weigh critic evidence, when the node kind keeps it
+_EVIDENCE = [name for name in ("sample_count", "score_ci") if name in NodeSummary.model_fields]
+
+
+class SelectionPolicy(ABC):
+    name = ""
+    backs_up = False  # whether observe() keeps tree statistics
+
+    def __init__(self, rng: Optional[np.random.Generator] = None):
+        self.rng = rng or np.random.default_rng()
+
+    async def select(self, storage, count: int) -> List[str]:
+        """Claim up to count nodes to expand."""
+        pool = await storage.frontier_top(settings.policy_pool_size)
+        if not pool:
+            return []
+        return await storage.claim(await self.rank(storage, pool, count))
+
+    @abstractmethod
+    async def rank(self, storage, pool: List[Tuple[str, float]], count: int) -> List[str]:
+        """Up to count ids from the (id, priority) pool, best first."""
+
+    async def observe(self, storage, expansions: Dict[str, Sequence[float]]) -> None:
+        """Record the child scores each expanded node produced."""
+        if not self.backs_up:
+            return
+        expansions = {node_id: scores for node_id, scores in expansions.items() if scores}
+        paths = await storage.ancestor_ids(expansions)
+        amounts: Dict[str, float] = {}
+        for node_id, scores in expansions.items():
+            for ancestor in paths.get(node_id, []):
+                amounts[VISITS_PREFIX + ancestor] = amounts.get(VISITS_PREFIX + ancestor, 0.0) + len(scores)
+                amounts[VALUE_PREFIX + ancestor] = amounts.get(VALUE_PREFIX + ancestor, 0.0) + sum(scores)
+            amounts[TOTAL_VISITS] = amounts.get(TOTAL_VISITS, 0.0) + len(scores)
+        if amounts:
+            await storage.incr_counters(amounts)
+
+    @staticmethod
+    async def tree_stats(storage, node_ids: Sequence[str]) -> Tuple[Dict[str, float], Dict[str, float], float]:
+        """Visits and value sums of node_ids, and the total visits."""
+        ids = list(dict.fromkeys(node_ids))
+        counters = await storage.get_counters(
+            [VISITS_PREFIX + i for i in ids] + [VALUE_PREFIX + i for i in ids] + [TOTAL_VISITS]
+        )
+        visits = {i: counters[VISITS_PREFIX + i] for i in ids}
+        values = {i: counters[VALUE_PREFIX + i] for i in ids}
+        return visits, values, counters[TOTAL_VISITS]
+
+
+def _spread(
+    candidates: List[Tuple[str, float, str, float]],
+    visits: Dict[str, float],
+    values: Dict[str, float],
+    count: int,
+    value: Callable[[float, float, float, int], float],
+) -> List[str]:
+    """Pick (id, priority, group, score) candidates one at a time by
+    value(group visits, group value sum, score, picks so far), ties by
+    priority. Each pick counts as a visit of its group scored with its own
+    score, so one batch spreads over groups instead of taking count nodes
+    from the best one."""
+    remaining = list(candidates)
+    picked: List[str] = []
+    while remaining and len(picked) < count:
+        best = max(remaining, key=lambda c: (value(visits[c[2]], values[c[2]], c[3], len(picked)), c[1]))
+        remaining.remove(best)
+        picked.append(best[0])
+        visits[best[2]] += 1
+        values[best[2]] += best[3]
+    return picked
+
+
+class GreedyPolicy(SelectionPolicy):
+    name = "greedy"
+
+    async def select(self, storage, count):
+        return await storage.claim_batch(count)
+
+    async def rank(self, storage, pool, count):
+        return [node_id for node_id, _ in sorted(pool, key=lambda e: -e[1])[:count]]
+
+
+class UCBPolicy(SelectionPolicy):
+    name = "ucb"
+    backs_up = True
+
+    async def rank(self, storage, pool, count):
+        ids = [node_id for node_id, _ in pool]
+        roots = await storage.roots(ids)
+        scores = {node.id: node.score or 0.0 for node in await storage.get_many(ids, fields=["score"])}
+        candidates = [(i, p, roots[i], scores[i]) for i, p in pool if i in roots and i in scores]
+        visits, values, _ = await self.tree_stats(storage, [c[2] for c in candidates])
+        pulls = sum(visits.values())
+        c = settings.policy_exploration
+
+        def ucb(n, w, score, picked):
+            if n == 0:
+                return math.inf
+            return w / n + c * math.sqrt(math.log(max(pulls + picked, 1.0)) / n)
+
+        return _spread(candidates, visits, values, count, ucb)
+
+
+class ThompsonPolicy(SelectionPolicy):
+    name = "thompson"
+
+    async def rank(self, storage, pool, count):
+        nodes = {node.id: node for node in await storage.get_many([i for i, _ in pool], fields=["score", *_EVIDENCE])}
+        sampled = []
+        for node_id, priority in pool:
+            node = nodes.get(node_id)
+            if node is None:
+                continue
+            ci = getattr(node, "score_ci", None)
+            if node.score is None:
+                score = 0.5
+                theta = self.rng.uniform()
+            elif ci:
+                # A 95% interval spans about four standard errors
+                score = min(max(node.score, 0.0), 1.0)
+                theta = min(max(self.rng.normal(score, (ci[1] - ci[0]) / 4), 0.0), 1.0)
+            else:
+                score = min(max(node.score, 0.0), 1.0)
+                evidence = getattr(node, "sample_count", None) or settings.thompson_critic_samples
+                theta = self.rng.beta(1 + score * evidence, 1 + (1 - score) * evidence)
+            # The priority's score term is swapped for the sampled one
+            sampled.append((priority + theta - score, node_id))
+        sampled.sort(reverse=True)
+        return [node_id for _, node_id in sampled[:count]]
+
+
+class BeamPolicy(SelectionPolicy):
+    name = "beam"
+
+    async def _plan(self, storage, pool, count) -> Tuple[List[str], List[str], Dict[str, int]]:
+        """Picks, nodes past their depth's beam, and the depth of each pooled node."""
+        depths = {node.id: node.depth or 0 for node in await storage.get_many([i for i, _ in pool], fields=["depth"])}
+        used = await storage.get_counters(BEAM_PREFIX + str(d) for d in set(depths.values()))
+        remaining = {d: settings.beam_width - int(used[BEAM_PREFIX + str(d)]) for d in set(depths.values())}
+
+        picked, pruned = [], []
+        for node_id, _ in sorted((e for e in pool if e[0] in depths), key=lambda e: (depths[e[0]], -e[1])):
+            depth = depths[node_id]
+            if remaining[depth] <= 0:
+                pruned.append(node_id)
+            elif len(picked) < count:
+                picked.append(node_id)
+                remaining[depth] -= 1
+        return picked, pruned, depths
+
+    async def rank(self, storage, pool, count):
+        return (await self._plan(storage, pool, count))[0]
+
+    async def select(self, storage, count):
+        pool = await storage.frontier_top(settings.policy_pool_size)
+        if not pool:
+            return []
+        picked, pruned, depths = await self._plan(storage, pool, count)
+        claimed = await storage.claim(picked)
+        if claimed:
+            per_depth: Dict[str, float] = {}
+            for node_id in claimed:
+                key = BEAM_PREFIX + str(depths[node_id])
+                per_depth[key] = per_depth.get(key, 0.0) + 1
+            await storage.incr_counters(per_depth)
+        if pruned:
+            await storage.ack(await storage.claim(pruned))
+        return claimed
+
+
+class MCTSPolicy(SelectionPolicy):
+    name = "mcts"
+    backs_up = True
+
+    async def rank(self, storage, pool, count):
+        nodes = {node.id: node for node in await storage.get_many([i for i, _ in pool], fields=["score", "parent"])}
+        # A root has no parent's subtree to join; it is its own group
+        candidates = [
+            (i, p, nodes[i].parent or i, nodes[i].score or 0.0) for i, p in pool if i in nodes
+        ]
+        visits, values, total = await self.tree_stats(storage, [c[2] for c in candidates])
+        c = settings.policy_exploration
+
+        def uct(n, w, score, picked):
+            return (w + score) / (n + 1) + c * math.sqrt(math.log(total + picked + 1) / (n + 1))
+
+        return _spread(candidates, visits, values, count, uct)
+
+
+POLICIES = {policy.name: policy for policy in (GreedyPolicy, UCBPolicy, ThompsonPolicy, BeamPolicy, MCTSPolicy)}
+
+
+def get_policy(name: Optional[str] = None, rng: Optional[np.random.Generator] = None) -> SelectionPolicy:
+    """The selection policy named by settings.selection_policy (or name)."""
+    name = name or settings.selection_policy
+    if name not in POLICIES:
+        raise ValueError(f"Unknown selection policy: {name}")
+    return POLICIES[name](rng)
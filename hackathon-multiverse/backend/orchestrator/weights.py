@@ -0,0 +1,58 @@
+"""Scheduler weights (the lambda settings) shared live by every process.
+
+PATCH /settings goes through update(): the new values are stored as
+overrides, broadcast on SETTINGS_CHANNEL, and every queued frontier
+priority is recomputed from its stored terms under them in one storage
+call. Workers apply stored overrides at startup and follow the channel, so
+the children they push from then on use the same weights; their write
+buffers weigh pushes at flush time, and on each change they re-score the
+frontier once more for entries flushed while the message was in flight.
+"""
+
+import json
+from typing import Dict
+from backend.config.settings import settings
+from backend.core.logger import get_logger
+from backend.db.storage import get_storage
+from backend.orchestrator.scheduler import priority_weights
+
+logger = get_logger(__name__)
+
+SETTINGS_CHANNEL = "settings_updates"
+TUNABLE = ("lambda_trend", "lambda_sim", "lambda_max_sim", "lambda_density", "lambda_depth")
+
+
+def current() -> Dict[str, float]:
+    return {name: getattr(settings, name) for name in TUNABLE}
+
+
+def _apply(values: Dict[str, float]) -> None:
+    for name, value in values.items():
+        if name in TUNABLE:
+            setattr(settings, name, float(value))
+
+
+async def load() -> Dict[str, float]:
+    """Apply the stored overrides to this process's settings."""
+    _apply(await get_storage().load_settings())
+    return current()
+
+
+async def update(values: Dict[str, float]) -> int:
+    """Set weights everywhere and re-score the frontier; returns how many entries were re-scored."""
+    _apply(values)
+    storage = get_storage()
+    weights = current()
+    await storage.save_settings(weights, SETTINGS_CHANNEL, json.dumps(weights))
+    rescored = await storage.reweigh_frontier(priority_weights())
+    logger.info(f"Scheduler weights now {weights}; re-scored {rescored} frontier entries")
+    return rescored
+
+
+async def follow() -> None:
+    """Apply weight changes broadcast by other processes, until cancelled."""
+    storage = get_storage()
+    async for message in storage.subscribe(SETTINGS_CHANNEL):
+        _apply(json.loads(message))
+        rescored = await storage.reweigh_frontier(priority_weights())
+        logger.info(f"Scheduler weights updated: {current()}; re-scored {rescored} frontier entries")
@@ -1,15 +1,17 @@
 import asyncio
 from backend.db.frontier import pop_max, push, size as frontier_size
-from backend.db.node_store import get, save
+from backend.db.node_store import get, node_count, node_stats, save
 from backend.db.redis_client import get_redis
+from backend.db.storage import get_storage
 from backend.agents.mutator import variants
 from backend.agents.persona import call
 from backend.agents.critic import score
 from backend.core.schemas import Node, GraphUpdate
 from backend.core.utils import uuid_str
 from backend.core.logger import get_logger
-from backend.core.embeddings import embed, to_xy
-from backend.orchestrator.scheduler import calculate_priority, get_top_k_nodes
+from backend.core import layout
+from backend.core.embeddings import embed_async, to_xy_many_async
+from backend.orchestrator.scheduler import get_top_k_nodes, priority_terms, weigh
 from backend.config.settings import settings
 from backend.llm.openai_client import PolicyError
 
@@ -20,29 +22,19 @@ logger = get_logger(__name__)
 
 async def log_worker_heartbeat():
     """Log worker status every 30 seconds with detailed stats."""
-    r = get_redis()
-    
     while True:
         await asyncio.sleep(30)  # More frequent for demo
         
-        # Get current stats
-        total_cost = r.get("usage:total_cost")
-        current_cost = float(total_cost) if total_cost else 0.0
+        # Get current stats; usage counters live in the storage backend
+        current_cost = await get_storage().get_counter("usage:total_cost")
         f_size = frontier_size()
-        node_keys = r.keys("node:*")
-        node_count = len(node_keys)
-        
-        # Calculate depth distribution
-        depth_counts = {}
-        for node_key in node_keys[:20]:  # Sample first 20 for performance
-            node = get(node_key.replace("node:", ""))
-            if node:
-                depth_counts[node.depth] = depth_counts.get(node.depth, 0) + 1
+        stats = node_stats()
         
-        depth_summary = " ".join([f"d{d}:{c}" for d, c in sorted(depth_counts.items())])
+        # Depth distribution from the maintained counters
+        depth_summary = " ".join([f"d{d}:{c}" for d, c in stats["depths"].items()])
         
         logger.info(
-            f"💓 HEARTBEAT: frontier={f_size} nodes={node_count} "
+            f"💓 HEARTBEAT: frontier={f_size} nodes={stats['total']} "
             f"cost=${current_cost:.2f}/${settings.daily_budget_usd:.2f} "
             f"depths=[{depth_summary}]"
         )
@@ -51,8 +43,7 @@ async def log_worker_heartbeat():
 async def process_one_node():
     """Process a single node from the frontier."""
     # Before each expansion, check budget
-    r = get_redis()
-    current_cost = float(r.get("usage:total_cost") or 0.0)
+    current_cost = await get_storage().get_counter("usage:total_cost")
     if current_cost >= settings.daily_budget_usd:
         logger.warning("Budget exhausted – sleeping 60 s")
         await asyncio.sleep(60)
@@ -63,6 +54,9 @@ async def process_one_node():
     if not parent_id:
         return False  # No nodes to process
 
+    # Project this expansion with the latest published layout
+    await layout.sync()
+
     # Get parent node
     parent = get(parent_id)
     if not parent:
@@ -75,7 +69,7 @@ async def process_one_node():
     top_k_nodes = get_top_k_nodes(k=10)
     top_k_embeddings = [n.emb for n in top_k_nodes if n.emb]
     
-    logger.info(f"📊 CONTEXT: frontier_size={frontier_size()} total_nodes={len(r.keys('node:*'))} top_k_nodes={len(top_k_nodes)}")
+    logger.info(f"📊 CONTEXT: frontier_size={frontier_size()} total_nodes={node_count()} top_k_nodes={len(top_k_nodes)}")
 
     # Generate variants
     logger.info(f"🧬 MUTATOR: Generating 3 variants from '{parent.prompt[:30]}{'...' if len(parent.prompt) > 30 else ''}'")
@@ -105,8 +99,8 @@ async def process_one_node():
             continue
 
         # Generate embedding and 2D projection
-        emb = embed(variant_prompt)
-        xy = list(to_xy(emb))  # Convert tuple to list for JSON serialization
+        emb = await embed_async(variant_prompt)
+        xy = list((await to_xy_many_async([emb]))[0])  # Convert tuple to list for JSON serialization
         
         # Calculate total costs
         total_tokens_in = persona_usage['prompt_tokens'] + critic_usage['prompt_tokens']
@@ -140,9 +134,8 @@ async def process_one_node():
 
         # Calculate priority using scheduler
         logger.info(f"    🧮 SCHEDULER: Calculating priority...")
-        priority = calculate_priority(
-            child, parent_score=parent.score, top_k_embeddings=top_k_embeddings
-        )
+        terms = priority_terms(child, parent_score=parent.score, top_k_embeddings=top_k_embeddings)
+        priority = weigh(terms)
         
         # Calculate priority components for detailed logging
         delta_score = s - (parent.score or 0.0) if parent.score else 0.0
@@ -153,7 +146,7 @@ async def process_one_node():
 
         # Save child and push to frontier with calculated priority
         save(child)
-        push(child.id, priority)
+        push(child.id, priority, terms)
         
         logger.info(f"    💾 SAVED: child={child_id[:8]}... xy=({xy[0]:.2f}, {xy[1]:.2f}) priority={priority:.3f}")
 
@@ -167,7 +160,7 @@ async def process_one_node():
 
     # Summary after processing all variants
     final_frontier_size = frontier_size()
-    total_cost = float(r.get("usage:total_cost") or 0.0)
+    total_cost = await get_storage().get_counter("usage:total_cost")
     logger.info(f"✅ COMPLETED: {parent_id[:8]}... → generated {len(variant_list)} children, frontier={final_frontier_size}, total_cost=${total_cost:.2f}")
 
     return True
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Compare frontier selection policies on a simulated search tree.
+
+Each node has a hidden quality: a root's is drawn at random, and a child's
+is its parent's plus a step whose mean depends on the root, so some
+subtrees keep improving while others stall. The critic sees the quality
+plus noise. Every policy gets the same --expansions budget, expanding
+--batch nodes at a time into three children, on a fresh SQLite store, and
+is run over --runs seeded trees. The table shows the best hidden quality
+found after each quarter of the budget (mean over runs), and the mean time
+a select() call took.
+
+    python scripts/bench_policies.py --expansions 400 --runs 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Add parent directory to path so backend module can be found
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--expansions", type=int, default=400)
+parser.add_argument("--batch", type=int, default=4, help="nodes claimed per select()")
+parser.add_argument("--roots", type=int, default=6)
+parser.add_argument("--noise", type=float, default=0.15, help="critic noise (std) per score")
+parser.add_argument("--runs", type=int, default=5)
+parser.add_argument("--policies", default="greedy,ucb,thompson,beam,mcts")
+args = parser.parse_args()
+
+import numpy as np
+from backend.core.schemas import Node
+from backend.core.utils import uuid_str
+from backend.db.sqlite_storage import SQLiteStorage
+from backend.orchestrator.policies import get_policy
+from backend.orchestrator.scheduler import priority_terms, weigh
+
+# Node text field differs between projects; system prompt nodes also record
+# how many critic samples back their score, and its confidence interval
+TEXT_FIELD = "prompt" if "prompt" in Node.model_fields else "system_prompt"
+SAMPLED = "sample_count" in Node.model_fields
+WITH_CI = "score_ci" in Node.model_fields
+CHILDREN = 3
+CHECKPOINTS = (0.25, 0.5, 0.75, 1.0)
+
+
+class Tree:
+    """Hidden qualities and the critic's noisy view of them."""
+
+    def __init__(self, rng: np.random.Generator):
+        self.rng = rng
+        self.quality = {}
+        self.drift = {}  # per root: mean quality step of a child
+        self.root_of = {}
+
+    def node(self, parent: Node | None) -> Node:
+        node_id = uuid_str()
+        if parent is None:
+            quality = float(self.rng.uniform(0.1, 0.4))
+            self.drift[node_id] = float(self.rng.normal(-0.005, 0.015))
+            self.root_of[node_id] = node_id
+        else:
+            self.root_of[node_id] = self.root_of[parent.id]
+            quality = self.quality[parent.id] + self.rng.normal(self.drift[self.root_of[node_id]], 0.02)
+        self.quality[node_id] = quality = float(np.clip(quality, 0.0, 1.0))
+
+        samples = int(self.rng.integers(1, 9)) if SAMPLED else 1
+        error = args.noise / np.sqrt(samples)
+        score = float(np.clip(quality + self.rng.normal(0.0, error), 0.0, 1.0))
+        extra = {"sample_count": samples, "avg_score": score} if SAMPLED else {}
+        if WITH_CI:
+            extra["score_ci"] = [max(0.0, score - 2 * error), min(1.0, score + 2 * error)]
+        return Node(
+            id=node_id,
+            depth=parent.depth + 1 if parent else 0,
+            parent=parent.id if parent else None,
+            score=score,
+            **{TEXT_FIELD: node_id},
+            **extra,
+        )
+
+
+async def run(name: str, seed: int) -> tuple[list[float], float]:
+    tree = Tree(np.random.default_rng(seed))
+    policy = get_policy(name, rng=np.random.default_rng(seed))
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorage(os.path.join(tmp, "bench.db"))
+        for _ in range(args.roots):
+            root = tree.node(None)
+            await storage.save(root)
+            terms = priority_terms(root)
+            await storage.push(root.id, weigh(terms), terms)
+
+        marks = [int(args.expansions * c) for c in CHECKPOINTS]
+        best, curve, select_ms, expanded = 0.0, [], [], 0
+        while expanded < args.expansions:
+            started = time.perf_counter()
+            claimed = await policy.select(storage, min(args.batch, args.expansions - expanded))
+            select_ms.append((time.perf_counter() - started) * 1000)
+            if not claimed:
+                break
+            expansions = {}
+            for parent in await storage.get_many(claimed):
+                children = [tree.node(parent) for _ in range(CHILDREN)]
+                await storage.save_many(children)
+                for child in children:
+                    terms = priority_terms(child, parent.score)
+                    await storage.push(child.id, weigh(terms), terms)
+                    best = max(best, tree.quality[child.id])
+                expansions[parent.id] = [child.score for child in children]
+            await storage.ack(claimed)
+            await policy.observe(storage, expansions)
+            expanded += len(claimed)
+            curve.extend(best for mark in marks[len(curve):] if expanded >= mark)
+        # A policy that ran out of nodes keeps its best for the remaining checkpoints
+        curve.extend([best] * (len(CHECKPOINTS) - len(curve)))
+    return curve, statistics.mean(select_ms)
+
+
+async def main():
+    header = " ".join(f"{int(c * args.expansions):>7}" for c in CHECKPOINTS)
+    print(f"best hidden quality after N expansions (mean of {args.runs} runs)")
+    print(f"{'policy':<9}{header}  select_ms")
+    for name in args.policies.split(","):
+        curves, timings = [], []
+        for seed in range(args.runs):
+            curve, ms = await run(name, seed)
+            curves.append(curve)
+            timings.append(ms)
+        means = np.mean(curves, axis=0)
+        print(f"{name:<9}" + " ".join(f"{m:>7.3f}" for m in means) + f"  {statistics.mean(timings):>9.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Compare per-expansion storage latency between the Redis and SQLite backends.
+
+One expansion is the storage work the parallel worker does per parent:
+claim, load the parent and its path, save three children, push them,
+bump the usage counters, publish three graph updates and ack. With
+--buffered the writes go through a WriteBuffer flushed before the ack.
+
+    python scripts/bench_storage.py --expansions 500
+
+The Redis run flushes --redis-url, so point it at a scratch database.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Add parent directory to path so backend module can be found
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--expansions", type=int, default=500)
+parser.add_argument("--dim", type=int, default=1536, help="embedding size")
+parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+parser.add_argument("--buffered", action="store_true", help="batch the writes like the worker does")
+args = parser.parse_args()
+os.environ["REDIS_URL"] = args.redis_url  # before backend reads Settings
+
+import numpy as np
+from backend.core.schemas import Node
+from backend.core.utils import uuid_str
+from backend.db.redis_client import get_redis
+from backend.db.sqlite_storage import SQLiteStorage
+from backend.db.storage import RedisStorage, Storage
+from backend.db.write_buffer import WriteBuffer
+from backend.orchestrator.scheduler import priority_terms, seed_terms, weigh
+
+# Node text field differs between projects
+TEXT_FIELD = "prompt" if "prompt" in Node.model_fields else "system_prompt"
+CHILDREN = 3
+
+
+# A small pool of embeddings so node construction stays cheap in the timed loop
+EMBEDDINGS = np.random.default_rng(1).standard_normal((16, args.dim)).astype(np.float32).tolist()
+
+
+def make_node(parent: Node | None, rng: np.random.Generator) -> Node:
+    return Node(
+        id=uuid_str(),
+        depth=parent.depth + 1 if parent else 0,
+        parent=parent.id if parent else None,
+        score=float(rng.random()),
+        emb=EMBEDDINGS[rng.integers(len(EMBEDDINGS))],
+        xy=[float(rng.random()), float(rng.random())],
+        **{TEXT_FIELD: "x" * 400},
+    )
+
+
+async def write(target: Storage | WriteBuffer, children: list[Node]) -> None:
+    if isinstance(target, WriteBuffer):
+        for child in children:
+            await target.save(child)
+    for child in children:
+        terms = priority_terms(child)
+        await target.push(child.id, weigh(terms), terms)
+    await target.incr_counters({"usage:prompt_tokens": 100, "usage:completion_tokens": 50, "usage:total_cost": 0.001})
+    for child in children:
+        await target.publish("graph_updates", child.model_dump_json(include={"id", "xy", "score", "parent"}))
+
+
+async def expand(storage: Storage, rng: np.random.Generator) -> bool:
+    claimed = await storage.claim_batch(1)
+    if not claimed:
+        return False
+    parent = await storage.get(claimed[0])
+    await storage.get_path(parent.id, ["parent", TEXT_FIELD])
+    children = [make_node(parent, rng) for _ in range(CHILDREN)]
+    if args.buffered:
+        async with WriteBuffer(storage, flush_interval=0) as buffer:
+            await write(buffer, children)
+    else:
+        await storage.save_many(children)
+        await write(storage, children)
+    await storage.ack(claimed)
+    return True
+
+
+async def bench(name: str, storage: Storage) -> None:
+    rng = np.random.default_rng(0)
+    root = make_node(None, rng)
+    await storage.save(root)
+    await storage.push(root.id, 1.0, seed_terms(1.0))
+
+    timings = []
+    for _ in range(args.expansions):
+        started = time.perf_counter()
+        if not await expand(storage, rng):
+            break
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(
+        f"{name:<7} expansions={len(timings)} mean={statistics.mean(timings):.2f}ms "
+        f"p50={statistics.median(timings):.2f}ms p95={p95:.2f}ms nodes={await storage.node_count()}"
+    )
+
+
+async def main():
+    get_redis().flushdb()
+    await bench("redis", RedisStorage())
+    get_redis().flushdb()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        await bench("sqlite", SQLiteStorage(os.path.join(tmp, "bench.db")))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
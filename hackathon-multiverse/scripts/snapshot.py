@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Export the run in Redis to a snapshot directory, or restore one.
+
+    python scripts/snapshot.py export snapshots/run1
+    python scripts/snapshot.py import snapshots/run1 [--no-frontier]
+
+Analysis tools can then read the snapshot offline:
+
+    table, embeddings = load_snapshot("snapshots/run1")  # embeddings is mmap'd
+"""
+
+import argparse
+import sys
+import os
+import time
+# Add parent directory to path so backend module can be found
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.db.snapshot import export_snapshot, import_snapshot
+from backend.db.node_store import BATCH_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_cmd = sub.add_parser("export", help="stream all nodes from Redis into a snapshot")
+    export_cmd.add_argument("path")
+    import_cmd = sub.add_parser("import", help="bulk-restore a snapshot into Redis")
+    import_cmd.add_argument("path")
+    import_cmd.add_argument("--no-frontier", action="store_true", help="don't restore the frontier")
+    for cmd in (export_cmd, import_cmd):
+        cmd.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "export":
+        manifest = export_snapshot(args.path, args.batch_size)
+        print(
+            f"📦 Exported {manifest['nodes']} nodes, {manifest['embeddings']}x{manifest['embedding_dim']} "
+            f"embeddings and {manifest['frontier']} frontier entries to {args.path}"
+        )
+    else:
+        restored = import_snapshot(args.path, args.batch_size, restore_frontier=not args.no_frontier)
+        print(f"📥 Restored {restored} nodes from {args.path}")
+    print(f"⏱️  {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import pytest
+from backend.db import async_node_store, async_frontier
+from backend.db.node_store import get
+from backend.core.conversation import get_conversation_path_async
+from backend.core.schemas import Node
+
+
+@pytest.mark.asyncio
+async def test_async_store_matches_sync_store():
+    root = Node(id="root", prompt="hi", depth=0, score=0.2, emb=[0.5, 0.25])
+    children = [
+        Node(id=f"c{i}", prompt=f"child {i}", reply="ok", depth=1, parent="root", score=0.3 + i / 10)
+        for i in range(3)
+    ]
+    await async_node_store.save(root)
+    await async_node_store.save_many(children)
+
+    # Written by the async store, readable by the sync one
+    assert get("c1") == children[1]
+    assert await async_node_store.get("root") == root
+    assert [n.id for n in await async_node_store.top_by_score(2)] == ["c2", "c1"]
+    assert sorted(n.id for n in await async_node_store.children_of("root")) == ["c0", "c1", "c2"]
+    assert len(await async_node_store.get_all_nodes()) == 4
+    assert (await async_node_store.node_stats())["depths"] == {0: 1, 1: 3}
+
+    path = await get_conversation_path_async("c2")
+    assert [n.id for n in path] == ["root", "c2"]
+
+
+@pytest.mark.asyncio
+async def test_async_frontier():
+    await async_frontier.push("a", 0.5)
+    await async_frontier.push("b", 0.9)
+    assert await async_frontier.size() == 2
+    assert await async_frontier.pop_batch(5) == ["b", "a"]
+    assert await async_frontier.pop_max() is None
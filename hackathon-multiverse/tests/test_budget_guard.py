@@ -86,3 +86,17 @@ async def test_budget_guard_allows_processing_under_budget():
     assert len(all_nodes) >= 2  # At least root + 1 variant
 
 
+
+
+@pytest.mark.asyncio
+async def test_budget_guard_reads_the_storage_counter(monkeypatch, tmp_path):
+    """The guard sees usage recorded by an embedded backend too."""
+    from backend.db import storage as storage_module
+
+    monkeypatch.setattr(settings, "storage_backend", "sqlite")
+    monkeypatch.setattr(settings, "sqlite_path", str(tmp_path / "budget.db"))
+    monkeypatch.setattr(storage_module, "_storage", {})
+    await storage_module.get_storage().incr_counters({"usage:total_cost": settings.daily_budget_usd + 0.01})
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(process_one_node(), timeout=0.5)
@@ -0,0 +1,80 @@
+import pytest
+
+from backend.config.settings import settings
+from backend.core.conversation import (
+    ANCESTORS_PREFIX,
+    DIALOGUE_PREFIX,
+    cache_conversation_async,
+    get_ancestor_ids,
+    get_ancestor_ids_async,
+    get_conversation_path,
+    get_dialogue_history_async,
+)
+from backend.core.schemas import Node
+from backend.db.node_store import save_many
+from backend.db.redis_client import get_redis
+from backend.db.storage import RedisStorage
+from backend.db.write_buffer import WriteBuffer
+
+
+def _chain(depth: int) -> list[Node]:
+    nodes = [Node(id="n0", prompt="p0", reply="r0", depth=0)]
+    for i in range(1, depth + 1):
+        nodes.append(Node(id=f"n{i}", prompt=f"p{i}", reply=f"r{i}", depth=i, parent=f"n{i - 1}"))
+    save_many(nodes)
+    return nodes
+
+
+def test_ancestor_ids_are_materialized():
+    _chain(3)
+
+    assert get_ancestor_ids("n3") == ["n0", "n1", "n2", "n3"]
+    # Every node on the walk got its path stored, expiring like the dialogues
+    assert get_redis().get(ANCESTORS_PREFIX + "n1") == '["n0", "n1"]'
+    assert 0 < get_redis().ttl(ANCESTORS_PREFIX + "n1") <= settings.dialogue_cache_ttl
+    assert [n.prompt for n in get_conversation_path("n2")] == ["p0", "p1", "p2"]
+    assert get_ancestor_ids("missing") == []
+
+
+def test_cached_path_short_circuits_walk():
+    _chain(2)
+    get_redis().set(ANCESTORS_PREFIX + "n1", '["x", "n1"]')
+
+    assert get_ancestor_ids("n2") == ["x", "n1", "n2"]
+
+
+@pytest.mark.asyncio
+async def test_dialogue_reuses_parent_prefix():
+    _chain(2)
+    assert await get_ancestor_ids_async("n2") == ["n0", "n1", "n2"]
+    assert get_redis().ttl(ANCESTORS_PREFIX + "n2") > 0
+
+    # A cached parent history is extended rather than rebuilt
+    await cache_conversation_async("n1", ["n0", "n1"], [{"role": "user", "content": "cached"}])
+    dialogue = await get_dialogue_history_async("n2")
+    assert dialogue == [
+        {"role": "user", "content": "cached"},
+        {"role": "user", "content": "p2"},
+        {"role": "assistant", "content": "r2"},
+    ]
+    assert get_redis().ttl(DIALOGUE_PREFIX + "n2") > 0
+    assert await get_dialogue_history_async("n2") == dialogue
+
+
+@pytest.mark.asyncio
+async def test_cache_writes_join_the_worker_batch():
+    async with WriteBuffer(RedisStorage(), max_items=0, flush_interval=0):
+        await cache_conversation_async("n1", ["n0", "n1"], [{"role": "user", "content": "p1"}])
+        assert get_redis().get(ANCESTORS_PREFIX + "n1") is None
+    assert get_redis().get(ANCESTORS_PREFIX + "n1") == '["n0", "n1"]'
+    assert get_redis().ttl(ANCESTORS_PREFIX + "n1") > 0
+    assert get_redis().ttl(DIALOGUE_PREFIX + "n1") > 0
+
+
+@pytest.mark.asyncio
+async def test_dialogue_built_from_scratch():
+    _chain(1)
+
+    dialogue = await get_dialogue_history_async("n1")
+    assert [turn["content"] for turn in dialogue] == ["p0", "r0", "p1", "r1"]
+    assert await get_dialogue_history_async("missing") == []
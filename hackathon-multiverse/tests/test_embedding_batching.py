@@ -0,0 +1,54 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from backend.config.settings import settings
+from backend.core.embedding_cache import cache
+from backend.core.embeddings import embed_async, embed_many_async
+
+
+@pytest.fixture
+def embeddings_api(mocker):
+    """Fake embeddings endpoint whose vectors encode each input's length."""
+
+    async def create(model, input):
+        response = Mock()
+        response.data = [Mock(embedding=[float(len(text)), 1.0]) for text in input]
+        return response
+
+    client = Mock()
+    client.embeddings.create = AsyncMock(side_effect=create)
+    mocker.patch("openai.AsyncOpenAI", return_value=client)
+    cache.clear()
+    return client.embeddings.create
+
+
+@pytest.mark.asyncio
+async def test_concurrent_embeds_share_one_request(embeddings_api):
+    texts = ["a", "bb", "ccc", "bb"]
+    results = await asyncio.gather(*(embed_async(text) for text in texts))
+
+    assert results == [[1.0, 1.0], [2.0, 1.0], [3.0, 1.0], [2.0, 1.0]]
+    embeddings_api.assert_awaited_once()
+    assert embeddings_api.await_args.kwargs["input"] == ["a", "bb", "ccc"]
+
+
+@pytest.mark.asyncio
+async def test_embed_many_respects_batch_size(embeddings_api, monkeypatch):
+    monkeypatch.setattr(settings, "embedding_batch_size", 2)
+    results = await embed_many_async(["a", "bb", "ccc", "dddd", "eeeee"])
+
+    assert [emb[0] for emb in results] == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert [call.kwargs["input"] for call in embeddings_api.await_args_list] == [["a", "bb"], ["ccc", "dddd"], ["eeeee"]]
+
+
+@pytest.mark.asyncio
+async def test_cached_texts_are_not_requested(embeddings_api):
+    await embed_many_async(["a", "bb"])
+    cache.clear()  # only the Redis tier is left
+
+    assert await embed_many_async(["bb", "ccc", "a"]) == [[2.0, 1.0], [3.0, 1.0], [1.0, 1.0]]
+    assert embeddings_api.await_args.kwargs["input"] == ["ccc"]
+    assert await embed_many_async(["a", "ccc"]) == [[1.0, 1.0], [3.0, 1.0]]
+    assert embeddings_api.await_count == 2
@@ -0,0 +1,43 @@
+from backend.config.settings import settings
+from backend.core.embedding_cache import EmbeddingCache, cache_key, redis_stats
+from backend.db.redis_client import get_redis
+
+
+def test_two_tier_lookup_and_stats():
+    cache = EmbeddingCache(max_entries=2)
+    assert cache.get_many("m", ["a", "b"]) == [None, None]
+
+    cache.put_many("m", ["a", "b"], [[0.5, 1.0], [0.25, 2.0]])
+    assert cache.get_many("m", ["a", "b"]) == [[0.5, 1.0], [0.25, 2.0]]
+    assert get_redis().ttl(cache_key("m", "a")) > 0
+
+    # A fresh process only has the Redis tier; the model is part of the key
+    other = EmbeddingCache(max_entries=2)
+    assert other.get_many("m", ["b", "c"]) == [[0.25, 2.0], None]
+    assert other.get_many("other-model", ["a"]) == [None]
+    assert other.stats()["redis_hits"] == 1 and other.stats()["misses"] == 2
+
+    assert cache.stats()["local_hits"] == 2
+    # Counts ride along with the next Redis pipeline; other's last miss is still pending
+    cache.put_many("m", ["c"], [[1.0, 1.0]])
+    assert redis_stats() == {"redis_hits": 1, "misses": 3, "local_hits": 2}
+
+
+def test_lru_evicts_least_recently_used():
+    cache = EmbeddingCache(max_entries=2)
+    cache.put_many("m", ["a", "b"], [[1.0], [2.0]])
+    cache.get_many("m", ["a"])
+    cache.put_many("m", ["c"], [[3.0]])
+
+    assert len(cache) == 2
+    get_redis().flushdb()
+    assert cache.get_many("m", ["a", "b", "c"]) == [[1.0], None, [3.0]]
+
+
+def test_embedded_backend_keeps_the_local_tier_only(monkeypatch):
+    monkeypatch.setattr(settings, "storage_backend", "sqlite")
+    cache = EmbeddingCache(max_entries=2)
+    cache.put_many("m", ["a"], [[1.0]])
+
+    assert cache.get_many("m", ["a", "b"]) == [[1.0], None]
+    assert get_redis().keys("embcache:*") == [] and redis_stats() == {}
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from backend.config.settings import settings
+from backend.core.embedding_index import EmbeddingIndex
+from backend.core.schemas import Node
+from backend.db.node_store import NODE_LOG
+from backend.db.redis_client import get_redis
+from backend.db.sqlite_storage import SQLiteStorage
+from backend.db.storage import RedisStorage
+from backend.orchestrator.scheduler import calculate_priority, calculate_similarity, novelty_features
+
+
+def _vectors(n, dim=32, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim))
+
+
+def test_index_matches_brute_force_cosine():
+    vectors = _vectors(1500)  # past the initial capacity
+    index = EmbeddingIndex()
+    assert index.add_many((str(i), list(vec)) for i, vec in enumerate(vectors)) == 1500
+    assert not index.add("0", list(vectors[1])) and not index.add("zero", [0.0] * 32)
+    assert not index.add("narrow", [1.0, 2.0])
+
+    query = _vectors(1, seed=1)[0]
+    expected = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    np.testing.assert_allclose(index.similarities(list(query)), expected, atol=1e-5)
+    assert index.max_similarity(list(query)) == pytest.approx(expected.max(), abs=1e-5)
+    assert index.knn_density(list(query), 5) == pytest.approx(np.sort(expected)[-5:].mean(), abs=1e-5)
+    assert index.max_similarity(list(query), reference=["3", "7", "gone"]) == pytest.approx(expected[[3, 7]].max(), abs=1e-5)
+
+    assert index.retain(str(i) for i in range(0, 1500, 2)) == 750
+    np.testing.assert_allclose(index.similarities(list(query)), expected[::2], atol=1e-5)
+
+
+def test_vectorized_similarity_matches_loop():
+    vec, others = _vectors(1, 8)[0], _vectors(5, 8, seed=2)
+    expected = np.mean([np.dot(vec, o) / (np.linalg.norm(vec) * np.linalg.norm(o)) for o in others])
+    assert calculate_similarity(list(vec), [list(o) for o in others] + [[0.0] * 8]) == pytest.approx(expected, abs=1e-5)
+
+
+def test_novelty_penalizes_crowded_regions(monkeypatch):
+    monkeypatch.setattr(settings, "novelty_k", 3)
+    index = EmbeddingIndex()
+    index.add_many([("a", [1.0, 0.0, 0.0]), ("b", [0.9, 0.1, 0.0]), ("c", [0.0, 0.0, 1.0])])
+
+    crowded = Node(id="x", prompt="x", score=0.5, depth=1, emb=[1.0, 0.05, 0.0])
+    novel = Node(id="y", prompt="y", score=0.5, depth=1, emb=[0.0, 1.0, 0.0])
+    crowded_features = novelty_features(crowded.emb, index)
+    novel_features = novelty_features(novel.emb, index)
+
+    assert crowded_features["max_sim"] > 0.99 and novel_features["max_sim"] < 0.2
+    assert crowded_features["density"] > novel_features["density"]
+    # The penalties are off by default
+    assert calculate_priority(crowded, 0.5, features=crowded_features) == calculate_priority(novel, 0.5, features=novel_features)
+    monkeypatch.setattr(settings, "lambda_max_sim", 0.1)
+    monkeypatch.setattr(settings, "lambda_density", 0.1)
+    assert calculate_priority(crowded, 0.5, features=crowded_features) < calculate_priority(novel, 0.5, features=novel_features)
+    assert novelty_features(crowded.emb, index, reference=["c"])["max_sim"] == pytest.approx(0.0, abs=1e-6)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", ["redis", "sqlite"])
+async def test_index_syncs_with_storage(tmp_path, backend):
+    storage = SQLiteStorage(str(tmp_path / "test.db")) if backend == "sqlite" else RedisStorage()
+    await storage.save_many([
+        Node(id="a", prompt="a", depth=0, emb=[1.0, 0.0]),
+        Node(id="b", prompt="b", depth=1, parent="a", emb=[0.0, 1.0]),
+        Node(id="c", prompt="c", depth=1, parent="a"),
+    ])
+    index = EmbeddingIndex()
+
+    assert await index.sync(storage) == 2
+    assert await index.sync(storage) == 0
+    await storage.save(Node(id="d", prompt="d", depth=2, parent="b", emb=[1.0, 1.0]))
+    assert await index.sync(storage) == 1
+    await storage.delete_many(["a"])
+    assert await index.sync(storage) == 0
+    assert sorted(index.ids) == ["b", "d"]
+
+    # Once the log is trimmed past the index's place in it, sync rescans
+    await storage.save(Node(id="e", prompt="e", depth=3, parent="d", emb=[0.5, 1.0]))
+    if backend == "sqlite":
+        storage.db.execute("DELETE FROM node_log WHERE seq <= (SELECT seq FROM node_log WHERE id = 'e')")
+    await storage.save(Node(id="f", prompt="f", depth=3, parent="d", emb=[1.0, 0.5]))
+    if backend == "redis":
+        get_redis().xtrim(NODE_LOG, 1)
+    assert await index.sync(storage) == 2
+    assert sorted(index.ids) == ["b", "d", "e", "f"]
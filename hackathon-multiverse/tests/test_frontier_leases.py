@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+from backend.db import async_frontier
+from backend.db.frontier import (
+    ack,
+    claim_batch,
+    extend_leases,
+    inflight_size,
+    nack,
+    push,
+    requeue_expired,
+    size,
+)
+
+
+def test_claim_moves_nodes_in_flight():
+    for i, node_id in enumerate(["a", "b", "c"]):
+        push(node_id, float(i))
+
+    assert claim_batch(2) == ["c", "b"]
+    assert size() == 1
+    assert inflight_size() == 2
+
+    assert ack(["c", "b"]) == 2
+    assert inflight_size() == 0
+    assert size() == 1
+
+
+def test_nack_requeues_with_original_priority():
+    push("a", 0.7)
+    push("b", 0.2)
+    claim_batch(1)
+
+    assert nack(["a"]) == 1
+    assert claim_batch(1) == ["a"]
+
+
+def test_only_the_owner_can_release():
+    push("a", 1.0)
+    claim_batch(1, owner="worker-1")
+
+    assert ack(["a"], owner="worker-2") == 0
+    assert nack(["a"], owner="worker-2") == 0
+    assert extend_leases(["a"], owner="worker-2") == 0
+    assert inflight_size() == 1
+    assert ack(["a"], owner="worker-1") == 1
+
+
+def test_expired_leases_are_requeued():
+    push("a", 0.4)
+    push("b", 0.9)
+    claim_batch(2, lease_seconds=0.05)
+    time.sleep(0.1)
+
+    assert sorted(requeue_expired()) == ["a", "b"]
+    assert inflight_size() == 0
+    assert claim_batch(1) == ["b"]
+
+
+def test_claim_reaps_before_popping():
+    push("a", 1.0)
+    claim_batch(1, lease_seconds=0.05, owner="crashed")
+    time.sleep(0.1)
+
+    # The crashed worker's node is picked up by the next claim
+    assert claim_batch(1, owner="worker-2") == ["a"]
+    assert ack(["a"], owner="crashed") == 0
+
+
+def test_extend_keeps_lease_alive():
+    push("a", 1.0)
+    claim_batch(1, lease_seconds=0.05)
+    assert extend_leases(["a"], lease_seconds=60) == 1
+    time.sleep(0.1)
+
+    assert requeue_expired() == []
+    assert inflight_size() == 1
+
+
+@pytest.mark.asyncio
+async def test_async_claim_ack_nack():
+    await async_frontier.push("a", 0.5)
+    await async_frontier.push("b", 0.8)
+
+    assert await async_frontier.claim_batch(5) == ["b", "a"]
+    assert await async_frontier.inflight_size() == 2
+    assert await async_frontier.extend_leases(["a", "b"]) == 2
+    assert await async_frontier.ack(["b"]) == 1
+    assert await async_frontier.nack(["a"]) == 1
+    assert await async_frontier.requeue_expired() == []
+    assert await async_frontier.pop_batch(5) == ["a"]
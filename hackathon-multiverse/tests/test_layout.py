@@ -0,0 +1,99 @@
+import json
+import pickle
+
+import numpy as np
+import pytest
+
+from backend.core import layout
+from backend.core.embeddings import to_xy
+from backend.core.local_embeddings import embed_local
+from backend.core.schemas import Node
+from backend.db.redis_client import get_async_redis
+from backend.db.storage import get_storage
+
+
+@pytest.fixture(autouse=True)
+def fresh_layout(monkeypatch):
+    monkeypatch.setattr(layout, "_reducer", None)
+    monkeypatch.setattr(layout, "_version", 0)
+    monkeypatch.setattr(layout, "_legacy_tried", False)
+
+
+async def _graph(n: int) -> list[Node]:
+    prompts = [f"{topic} question number {i}" for i, topic in enumerate(["peace talks", "trade deals", "energy"] * n)][:n]
+    nodes = [Node(id=f"n{i}", prompt=p, depth=0, emb=emb, xy=[0.0, 0.0]) for i, (p, emb) in enumerate(zip(prompts, embed_local(prompts), strict=True))]
+    await get_storage().save_many(nodes)
+    return nodes
+
+
+@pytest.mark.asyncio
+async def test_refit_publishes_one_versioned_layout():
+    nodes = await _graph(15)
+    pubsub = get_async_redis().pubsub()
+    await pubsub.subscribe("graph_updates")
+    await pubsub.get_message(timeout=1)  # subscribe confirmation
+
+    assert await layout.refit() == 1
+    assert layout.version() == 1
+
+    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=2)
+    assert json.loads(message["data"]) == {"type": "layout_changed", "version": 1, "nodes": 15}
+    assert await pubsub.get_message(ignore_subscribe_messages=True, timeout=0.2) is None
+    await pubsub.aclose()
+
+    # Every node was re-projected in bulk under the new version
+    stored = await get_storage().get_many([n.id for n in nodes], fields=["xy"])
+    expected = sorted(map(tuple, layout.current().embedding_.tolist()))
+    np.testing.assert_allclose(sorted(tuple(n.xy) for n in stored), expected, rtol=1e-5)
+
+
+@pytest.mark.asyncio
+async def test_legacy_reducer_becomes_the_first_layout(tmp_path, monkeypatch):
+    nodes = await _graph(12)
+    legacy = layout.fit_umap([n.emb for n in nodes])
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / layout.LEGACY_REDUCER_FILE).write_bytes(pickle.dumps(legacy))
+
+    assert await layout.sync() == 1
+    assert await get_storage().layout_version() == 1
+    np.testing.assert_allclose(layout.current().embedding_, legacy.embedding_)
+    # The nodes keep the coordinates they already have
+    assert all(n.xy == [0.0, 0.0] for n in await get_storage().get_many([n.id for n in nodes], fields=["xy"]))
+
+    # Once a layout is stored, the file is left alone
+    layout.install(None, 0)
+    assert await layout.sync() == 1
+
+
+@pytest.mark.asyncio
+async def test_other_processes_swap_in_new_version():
+    await _graph(12)
+    await layout.refit()
+    published = layout.current()
+
+    # A process that has not seen the layout yet falls back, then syncs to it
+    layout.install(None, 0)
+    emb = embed_local(["peace talks follow-up"])[0]
+    assert await layout.sync() == 1
+    assert layout.current() is not published  # unpickled from storage
+    assert to_xy(emb) == pytest.approx(tuple(published.transform(np.array([emb]))[0]), abs=1e-3)
+    assert await layout.sync() == 1  # nothing newer
+
+
+@pytest.mark.asyncio
+async def test_refit_if_needed_waits_for_growth(monkeypatch):
+    started = []
+
+    async def fake_refit():
+        started.append(True)
+        return True
+
+    monkeypatch.setattr(layout, "refit_in_background", fake_refit)
+    await _graph(5)
+    assert not await layout.refit_if_needed()  # too small
+
+    await _graph(12)
+    assert await layout.refit_if_needed()
+    await layout.refit()
+    assert not await layout.refit_if_needed()  # nothing added since
+    assert started == [True]
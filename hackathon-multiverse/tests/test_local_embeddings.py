@@ -0,0 +1,48 @@
+from unittest.mock import AsyncMock, Mock
+
+import numpy as np
+import pytest
+
+from backend.config.settings import settings
+from backend.core.embeddings import embed_async, embed_many_async
+from backend.core.local_embeddings import DIM, embed_local
+
+
+def _cos(a, b):
+    return float(np.dot(a, b))  # vectors are unit length
+
+
+def test_local_embeddings_shape_and_determinism():
+    texts = ["Let's discuss the peace talks", "", "Let's discuss the peace talks"]
+    a, empty, b = embed_local(texts)
+
+    assert len(a) == DIM and len(empty) == DIM
+    assert np.linalg.norm(a) == pytest.approx(1.0, abs=1e-5)
+    assert a == b
+    assert a == embed_local(["Let's discuss the peace talks"])[0]
+
+
+def test_local_embeddings_keep_wording_similarity():
+    base, close, unrelated = embed_local([
+        "How can we negotiate a ceasefire in Ukraine?",
+        "How could we negotiate a ceasefire for Ukraine?",
+        "My favourite recipe uses garlic and basil.",
+    ])
+    assert _cos(base, close) > 0.4
+    assert _cos(base, close) > _cos(base, unrelated) + 0.3
+
+
+@pytest.mark.asyncio
+async def test_local_provider_makes_no_api_calls(mocker, monkeypatch):
+    client = Mock()
+    client.embeddings.create = AsyncMock()
+    mocker.patch("openai.AsyncOpenAI", return_value=client)
+    monkeypatch.setattr(settings, "embedding_provider", "local")
+
+    assert await embed_async("hello there") == embed_local(["hello there"])[0]
+    assert await embed_many_async(["a", "b"]) == embed_local(["a", "b"])
+    client.embeddings.create.assert_not_awaited()
+
+    monkeypatch.setattr(settings, "embedding_provider", "nope")
+    with pytest.raises(ValueError):
+        await embed_many_async(["a"])
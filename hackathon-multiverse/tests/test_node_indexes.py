@@ -0,0 +1,62 @@
+from backend.db.node_store import (
+    save,
+    save_many,
+    top_by_score,
+    nodes_at_depth,
+    children_of,
+    rebuild_indexes,
+    clear_indexes,
+    delete_many,
+    node_stats,
+    r,
+    ROOTS_INDEX,
+)
+from backend.core.schemas import Node
+
+
+def _tree():
+    root = Node(id="root", prompt="root", depth=0, score=0.5)
+    children = [
+        Node(id=f"c{i}", prompt=f"child {i}", depth=1, parent="root", score=0.1 * i)
+        for i in range(5)
+    ]
+    unscored = Node(id="u", prompt="pending", depth=2, parent="c4")
+    return [root, *children, unscored]
+
+
+def test_indexes_maintained_on_save():
+    save_many(_tree())
+
+    assert [n.id for n in top_by_score(3)] == ["root", "c4", "c3"]
+    assert sorted(n.id for n in nodes_at_depth(1)) == [f"c{i}" for i in range(5)]
+    assert sorted(n.id for n in children_of("root")) == [f"c{i}" for i in range(5)]
+    assert [n.id for n in children_of("c4")] == ["u"]
+
+    # Rescoring moves the node in the score index
+    save(Node(id="u", prompt="pending", depth=2, parent="c4", score=0.9))
+    assert top_by_score(1)[0].id == "u"
+
+
+def test_rebuild_indexes():
+    save_many(_tree())
+    clear_indexes()
+    assert top_by_score(5) == []
+
+    assert rebuild_indexes() == 7
+    assert [n.id for n in top_by_score(2)] == ["root", "c4"]
+    assert [n.id for n in nodes_at_depth(2)] == ["u"]
+    assert r.hget(ROOTS_INDEX, "u") == "root"
+
+
+def test_delete_many_updates_indexes():
+    save_many(_tree())
+    assert r.hget(ROOTS_INDEX, "u") == "root"
+
+    assert delete_many(["u", "c0", "missing"]) == 2
+    assert delete_many(["u"]) == 0
+    assert [n.id for n in children_of("c4")] == []
+    assert sorted(n.id for n in children_of("root")) == [f"c{i}" for i in range(1, 5)]
+    assert nodes_at_depth(2) == []
+    assert [n.id for n in top_by_score(10)][-1] == "c1"
+    assert r.hget(ROOTS_INDEX, "u") is None
+    assert node_stats()["total"] == 5
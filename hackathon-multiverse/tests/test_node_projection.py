@@ -0,0 +1,52 @@
+import pytest
+from backend.db.node_store import save, get, get_many, top_by_score
+from backend.db import async_node_store
+from backend.core.schemas import Node, NodeSummary
+
+
+def _node(node_id, score):
+    return Node(
+        id=node_id,
+        prompt="hello",
+        reply="hi",
+        depth=1,
+        parent="root",
+        score=score,
+        emb=[0.5] * 8,
+        xy=[1.0, 2.0],
+    )
+
+
+def test_projected_get_only_loads_requested_fields():
+    save(_node("a", 0.4))
+
+    summary = get("a", fields=["xy", "depth"])
+    assert isinstance(summary, NodeSummary)
+    assert summary.id == "a"
+    assert summary.xy == [1.0, 2.0]
+    assert summary.depth == 1
+    assert summary.emb is None and summary.prompt is None
+
+    assert get("missing", fields=["xy"]) is None
+    with pytest.raises(ValueError):
+        get("a", fields=["not_a_field"])
+
+
+def test_projected_get_many_and_indexes():
+    save(_node("a", 0.4))
+    save(_node("b", 0.9))
+
+    summaries = get_many(["b", "missing", "a"], fields=["score", "emb"])
+    assert [s.id for s in summaries] == ["b", "a"]
+    assert list(summaries[0].emb) == [0.5] * 8
+
+    best = top_by_score(1, fields=["score"])
+    assert best[0].id == "b" and best[0].score == 0.9 and best[0].reply is None
+
+
+@pytest.mark.asyncio
+async def test_async_projection():
+    save(_node("a", 0.4))
+    summary = await async_node_store.get("a", fields=["parent", "prompt", "reply"])
+    assert (summary.parent, summary.prompt, summary.reply) == ("root", "hello", "hi")
+    assert summary.score is None
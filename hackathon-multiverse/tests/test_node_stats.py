@@ -0,0 +1,34 @@
+from backend.db.node_store import save, save_many, node_count, node_stats, rebuild_indexes
+from backend.core.schemas import Node
+
+
+def test_stats_count_new_nodes_once():
+    root = Node(id="root", prompt="root", depth=0, agent_cost=0.5)
+    save(root)
+    save_many(
+        Node(id=f"c{i}", prompt="child", depth=1, parent="root", agent_cost=0.25)
+        for i in range(3)
+    )
+
+    # Re-saving (e.g. after scoring) must not double count
+    root.score = 0.8
+    save(root)
+
+    stats = node_stats()
+    assert node_count() == 4
+    assert stats["depths"] == {0: 1, 1: 3}
+    assert abs(stats["cost"] - 1.25) < 1e-9
+
+    # A changed cost only adds the difference
+    root.agent_cost = 1.0
+    save(root)
+    assert abs(node_stats()["cost"] - 1.75) < 1e-9
+
+
+def test_rebuild_recomputes_stats():
+    save_many(Node(id=f"n{i}", prompt="x", depth=i % 2, agent_cost=0.1) for i in range(5))
+    assert rebuild_indexes() == 5
+    stats = node_stats()
+    assert stats["total"] == 5
+    assert stats["depths"] == {0: 3, 1: 2}
+    assert abs(stats["cost"] - 0.5) < 1e-9
@@ -0,0 +1,43 @@
+from backend.db.node_store import save, get, r
+from backend.core.packed_embedding import PackedEmbedding
+from backend.core.schemas import Node
+from backend.config.settings import settings
+import numpy as np
+import uuid
+
+
+def _emb(dims=1536):
+    return np.random.default_rng(0).normal(size=dims).astype(np.float32).tolist()
+
+
+def test_float32_roundtrip_is_lossless_and_lazy():
+    node = Node(id=str(uuid.uuid4()), prompt="hello", depth=0, emb=_emb())
+    save(node)
+
+    # Stored as 4 bytes per dimension instead of a JSON float list
+    assert r.hget("node:" + node.id, "emb_dtype") == "f4"
+    assert r.hstrlen("node:" + node.id, "emb") == 1536 * 4
+
+    loaded = get(node.id)
+    assert isinstance(loaded.emb, PackedEmbedding)
+    assert loaded.emb._array is None  # not decoded until used
+    assert len(loaded.emb) == 1536
+    assert loaded == node
+    assert loaded.model_dump()["emb"] == node.emb
+
+
+def test_quantized_dtypes_are_close(monkeypatch):
+    emb = _emb()
+    for dtype, tolerance in (("f2", 1e-2), ("i8", 5e-2)):
+        monkeypatch.setattr(settings, "emb_storage_dtype", dtype)
+        node = Node(id=str(uuid.uuid4()), prompt="hello", depth=0, emb=emb)
+        save(node)
+        loaded = get(node.id)
+        assert loaded.emb.dtype == dtype
+        assert np.allclose(np.asarray(loaded.emb), emb, atol=tolerance)
+
+
+def test_legacy_json_embedding_still_loads():
+    node_id = str(uuid.uuid4())
+    r.hset("node:" + node_id, mapping={"id": node_id, "prompt": "old", "depth": 0, "emb": "[0.5, -1.0]"})
+    assert get(node_id).emb == [0.5, -1.0]
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from backend.config.settings import settings
+from backend.core.schemas import Node
+from backend.db.sqlite_storage import SQLiteStorage
+from backend.orchestrator.policies import TOTAL_VISITS, VALUE_PREFIX, VISITS_PREFIX, get_policy
+
+
+async def _store(tmp_path, nodes, priorities):
+    storage = SQLiteStorage(str(tmp_path / "test.db"))
+    await storage.save_many(nodes)
+    for node_id, priority in priorities.items():
+        await storage.push(node_id, priority)
+    return storage
+
+
+def _node(node_id, parent=None, depth=0, score=0.5):
+    return Node(id=node_id, prompt=node_id, parent=parent, depth=depth, score=score)
+
+
+def test_unknown_policy():
+    assert get_policy("mcts").name == "mcts"
+    with pytest.raises(ValueError):
+        get_policy("random")
+
+
+@pytest.mark.asyncio
+async def test_observe_backs_scores_up_the_path(tmp_path):
+    storage = await _store(tmp_path, [_node("r"), _node("a", "r", 1), _node("b", "a", 2)], {})
+    await get_policy("mcts").observe(storage, {"b": [0.5, 0.7], "a": []})
+
+    counters = await storage.get_counters([VISITS_PREFIX + "r", VISITS_PREFIX + "b", VALUE_PREFIX + "a", TOTAL_VISITS])
+    assert counters == pytest.approx({VISITS_PREFIX + "r": 2, VISITS_PREFIX + "b": 2, VALUE_PREFIX + "a": 1.2, TOTAL_VISITS: 2})
+    await get_policy("thompson").observe(storage, {"b": [1.0]})  # keeps no statistics
+    assert await storage.get_counter(TOTAL_VISITS) == 2
+
+
+@pytest.mark.asyncio
+async def test_ucb_tries_unvisited_subtrees(tmp_path):
+    nodes = [_node("r1"), _node("r2"), _node("a", "r1", 1), _node("b", "r1", 1), _node("c", "r2", 1)]
+    storage = await _store(tmp_path, nodes, {"a": 0.9, "b": 0.8, "c": 0.1})
+    await storage.incr_counters({VISITS_PREFIX + "r1": 10, VALUE_PREFIX + "r1": 9})
+
+    # r2 was never expanded, so its only node goes first despite its priority
+    assert await get_policy("ucb").select(storage, 2) == ["c", "a"]
+
+
+@pytest.mark.asyncio
+async def test_thompson_follows_priority_with_certain_scores(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "thompson_critic_samples", 1e7)
+    nodes = [_node(str(i), score=s) for i, s in enumerate([0.2, 0.9, 0.5, 0.7])]
+    storage = await _store(tmp_path, nodes, {n.id: n.score for n in nodes})
+
+    policy = get_policy("thompson", rng=np.random.default_rng(0))
+    assert await policy.select(storage, 3) == ["1", "3", "2"]
+
+
+@pytest.mark.asyncio
+async def test_beam_expands_width_per_depth(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "beam_width", 2)
+    nodes = [_node("r")] + [_node(f"c{i}", "r", 1) for i in range(4)]
+    storage = await _store(tmp_path, nodes, {"r": 0.1, "c0": 0.4, "c1": 0.9, "c2": 0.2, "c3": 0.6})
+    policy = get_policy("beam")
+
+    # Shallowest first, then the best of depth 1
+    assert await policy.select(storage, 2) == ["r", "c1"]
+    assert await policy.select(storage, 5) == ["c3"]
+    # Depth 1's beam is used up: the rest leave the frontier
+    assert await policy.select(storage, 5) == []
+    assert await storage.frontier_size() == 0
+    assert await storage.node_count() == 5
+
+
+@pytest.mark.asyncio
+async def test_mcts_spreads_over_parents(tmp_path):
+    nodes = [_node("r"), _node("p1", "r", 1), _node("p2", "r", 1)]
+    nodes += [_node(f"{p}-{i}", p, 2, score=0.5) for p in ("p1", "p2") for i in range(2)]
+    storage = await _store(tmp_path, nodes, {"p1-0": 0.5, "p1-1": 0.5, "p2-0": 0.4, "p2-1": 0.4})
+    await storage.incr_counters({VISITS_PREFIX + "p1": 10, VALUE_PREFIX + "p1": 5, VISITS_PREFIX + "p2": 1, VALUE_PREFIX + "p2": 0.5, TOTAL_VISITS: 11})
+
+    # The barely explored p2 wins on its bonus, still after one virtual visit
+    assert sorted(await get_policy("mcts").select(storage, 2)) == ["p2-0", "p2-1"]
+    assert await storage.inflight_size() == 2
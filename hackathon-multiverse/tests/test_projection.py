@@ -0,0 +1,93 @@
+import threading
+
+import numpy as np
+import pytest
+
+from backend.config.settings import settings
+from backend.core import embeddings, layout
+from backend.core.projection import IncrementalProjector
+
+
+def _data(n, dim=64, seed=0):
+    # Two strong directions plus noise, offset from the origin
+    rng = np.random.default_rng(seed)
+    axes = np.linalg.qr(rng.standard_normal((dim, 2)))[0].T
+    return 3.0 + rng.standard_normal((n, 2)) * [0.3, 0.2] @ axes + rng.standard_normal((n, dim)) * 0.01, axes
+
+
+def test_incremental_projector_matches_batch_pca():
+    data, axes = _data(400)
+    projector = IncrementalProjector(batch_size=25)
+    for vec in data:
+        projector.observe(vec)
+
+    assert projector.n_seen == 400
+    np.testing.assert_allclose(projector.mean, data.mean(axis=0), atol=1e-9)
+    # Same plane as the true axes
+    assert np.linalg.svd(axes @ projector.basis.T)[1].min() > 0.99
+
+
+def test_incremental_projector_keeps_existing_points_in_place():
+    data, _ = _data(600)
+    projector = IncrementalProjector(batch_size=50)
+    projector.partial_fit(data[:300])
+    before = projector.transform(data[:50])
+
+    for vec in data[300:]:
+        projector.observe(vec)
+    after = projector.transform(data[:50])
+
+    # Axis signs and in-plane rotation are pinned, so more data barely moves old points
+    assert np.abs(after - before).max() < 0.1 * np.abs(before).max()
+
+
+@pytest.mark.asyncio
+async def test_to_xy_uses_incremental_engine(monkeypatch):
+    monkeypatch.setattr(settings, "projection_engine", "incremental")
+    monkeypatch.setattr(settings, "projection_batch_size", 10)
+    monkeypatch.setattr(embeddings, "_projector", None)
+    monkeypatch.setattr(embeddings, "_projector_version", 0)
+    monkeypatch.setattr(embeddings, "_projector_update", None)
+
+    data, _ = _data(30)
+    coords = [embeddings.to_xy(list(vec)) for vec in data]
+
+    projector = embeddings._load_projector()
+    assert projector.fitted and projector.n_seen == 30
+    # Points after the first batch are projected by the fitted axes
+    assert coords[-1] == pytest.approx(projector.project(data[-1]), abs=1.0)
+
+    # Published as the first shared version; another process picks it up
+    await embeddings.to_xy_many_async([list(data[0])])
+    monkeypatch.setattr(embeddings, "_projector", None)
+    monkeypatch.setattr(embeddings, "_projector_version", 0)
+    assert await embeddings.sync_projector() == 1
+    assert embeddings._load_projector().n_seen == 30
+
+    monkeypatch.setattr(settings, "projection_engine", "nope")
+    with pytest.raises(ValueError):
+        embeddings.to_xy(list(data[0]))
+
+
+@pytest.mark.asyncio
+async def test_to_xy_many_projects_batches_off_the_event_loop(monkeypatch):
+    monkeypatch.setattr(settings, "projection_engine", "umap")
+    monkeypatch.setattr(layout, "_reducer", None)
+    data, _ = _data(40)
+    layout.install(layout.fit_umap(data))
+
+    before = embeddings.projection_stats()
+    batch = embeddings.to_xy_many([list(vec) for vec in data[:8]])
+    singles = [embeddings.to_xy(list(vec)) for vec in data[:8]]
+    after = embeddings.projection_stats()
+    for one, many in zip(singles, batch, strict=True):
+        assert one == pytest.approx(many, abs=0.5)
+    assert after["calls"] - before["calls"] == 9
+    assert after["points"] - before["points"] == 16
+
+    threads = []
+    project = embeddings._project
+    monkeypatch.setattr(embeddings, "_project", lambda vectors: threads.append(threading.current_thread()) or project(vectors))
+    coords = await embeddings.to_xy_many_async([list(vec) for vec in data[:8]])
+    assert coords == pytest.approx(batch, abs=0.5)
+    assert threads and threads[0] is not threading.current_thread()
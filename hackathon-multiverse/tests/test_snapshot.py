@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from backend.core.schemas import Node
+from backend.db.frontier import push, size
+from backend.db.node_store import get, get_all_nodes, node_stats, save_many
+from backend.db.redis_client import get_redis
+from backend.db.snapshot import export_snapshot, import_snapshot, load_snapshot
+
+
+def test_snapshot_roundtrip(tmp_path):
+    nodes = [
+        Node(id="root", prompt="hi", depth=0, score=0.5, emb=[0.5, 0.25, 1.0], xy=[1.0, 2.0]),
+        Node(id="a", prompt="p", reply="r", depth=1, parent="root", score=0.75, emb=[-0.5, 0.0, 2.0], agent_cost=0.01),
+        Node(id="b", prompt="no emb", depth=1, parent="root"),
+    ]
+    save_many(nodes)
+    push("a", 0.9)
+
+    manifest = export_snapshot(str(tmp_path), batch_size=2)
+    assert manifest["nodes"] == 3
+    assert (manifest["embeddings"], manifest["embedding_dim"]) == (2, 3)
+
+    table, embeddings = load_snapshot(str(tmp_path))
+    assert isinstance(embeddings, np.memmap)
+    rows = {row["id"]: row for row in table.to_pylist()}
+    assert rows["b"]["emb_row"] == -1
+    assert embeddings[rows["a"]["emb_row"]].tolist() == [-0.5, 0.0, 2.0]
+
+    get_redis().flushdb()
+    assert import_snapshot(str(tmp_path), batch_size=2) == 3
+
+    assert sorted(get_all_nodes(), key=lambda n: n.id) == sorted(nodes, key=lambda n: n.id)
+    assert get("a").emb == [-0.5, 0.0, 2.0]
+    assert node_stats()["depths"] == {0: 1, 1: 2}
+    assert size() == 1
@@ -0,0 +1,22 @@
+import numpy as np
+
+from backend.core.spatial import CELL, cell_of, cell_ranges, points_in_polygon
+
+
+def test_points_in_polygon_vectorized():
+    # Concave "L" shape
+    polygon = [[0, 0], [4, 0], [4, 1], [1, 1], [1, 4], [0, 4]]
+    points = np.array([[0.5, 0.5], [3, 0.5], [0.5, 3], [3, 3], [-1, 0.5], [2, 2], [0.5, 5]])
+    assert points_in_polygon(points, polygon).tolist() == [True, True, True, False, False, False, False]
+    assert points_in_polygon(np.empty((0, 2)), polygon).tolist() == []
+
+
+def test_grid_ranges_cover_the_bounding_box():
+    polygon = [[-1.1, -0.3], [0.6, -0.3], [0.6, 0.9]]
+    ranges = cell_ranges(polygon)
+    assert len(ranges) == len(np.arange(np.floor(-0.3 / CELL), np.floor(0.9 / CELL) + 1))
+    rng = np.random.default_rng(0)
+    for x, y in rng.uniform([-1.1, -0.3], [0.6, 0.9], size=(200, 2)):
+        cell = cell_of((x, y))
+        assert any(first <= cell <= last for first, last in ranges)
+    assert not any(first <= cell_of((0.9, 0.0)) <= last for first, last in ranges)
@@ -0,0 +1,322 @@
+import asyncio
+import gzip
+
+import pytest
+
+from backend.config.settings import settings
+from backend.core.schemas import Node
+from backend.db import async_frontier, sqlite_storage
+from backend.db import storage as storage_module
+from backend.db.sqlite_storage import SQLiteStorage
+from backend.db.storage import VISITS_PREFIX, RedisStorage
+
+
+@pytest.fixture(params=["redis", "sqlite"])
+def storage(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteStorage(str(tmp_path / "test.db"))
+    return RedisStorage()
+
+
+def _tree() -> list[Node]:
+    return [
+        Node(id="root", prompt="hi", depth=0, score=0.2, emb=[0.5, 0.25], agent_cost=0.5),
+        Node(id="a", prompt="a", reply="ra", depth=1, parent="root", score=0.9, agent_cost=0.25),
+        Node(id="b", prompt="b", reply="rb", depth=2, parent="a", score=0.4),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_nodes(storage):
+    nodes = _tree()
+    await storage.save_many(nodes)
+
+    assert await storage.get("root") == nodes[0]
+    assert (await storage.get("root", fields=["emb"])).emb == [0.5, 0.25]
+    assert await storage.get("missing") is None
+    assert [n.id for n in await storage.get_many(["b", "missing", "a"])] == ["b", "a"]
+    assert [n.id for n in await storage.top_by_score(2)] == ["a", "b"]
+    assert [n.prompt for n in await storage.get_path("b", ["prompt"])] == ["hi", "a", "b"]
+    assert sorted([n.id async for n in storage.iter_nodes(fields=["score"])]) == ["a", "b", "root"]
+    assert await storage.node_count() == 3
+    stats = await storage.node_stats()
+    assert stats["depths"] == {0: 1, 1: 1, 2: 1}
+    assert stats["cost"] == pytest.approx(0.75)
+
+
+@pytest.mark.asyncio
+async def test_frontier_leases(storage):
+    for node_id, priority in [("a", 0.1), ("b", 0.5), ("c", 0.9)]:
+        await storage.push(node_id, priority)
+
+    assert await storage.claim_batch(2) == ["c", "b"]
+    assert (await storage.frontier_size(), await storage.inflight_size()) == (1, 2)
+    assert await storage.extend_leases(["c"]) == 1
+    assert await storage.ack(["c"]) == 1
+    assert await storage.nack(["b"]) == 1
+    assert await storage.claim_batch(1) == ["b"]
+
+    await storage.claim_batch(1, lease_seconds=0.05)
+    await asyncio.sleep(0.1)
+    assert await storage.requeue_expired() == ["a"]
+    assert await storage.frontier_size() == 1
+
+
+@pytest.mark.asyncio
+async def test_failures_are_dead_lettered(storage, monkeypatch):
+    monkeypatch.setattr(settings, "frontier_max_attempts", 2)
+    await storage.push("a", 0.9, [0.9])
+    await storage.push("b", 0.5)
+
+    assert await storage.claim_batch(2) == ["a", "b"]
+    assert await storage.fail(["a"]) == []
+    assert await storage.fail(["b"], retry=False) == ["b"]
+    assert await storage.claim_batch(2) == ["a"]
+    assert await storage.fail(["a"]) == ["a"]
+    assert await storage.dead_letters() == ["a", "b"]
+    assert (await storage.frontier_size(), await storage.inflight_size()) == (0, 0)
+    assert await storage.reweigh_frontier([1.0]) == 0
+
+
+@pytest.mark.asyncio
+async def test_counters(storage):
+    assert await storage.get_counter("usage:total_cost") == 0.0
+    await storage.incr_counters({"usage:total_cost": 0.5, "usage:prompt_tokens": 10})
+    totals = await storage.incr_counters({"usage:total_cost": 0.25})
+    assert totals == {"usage:total_cost": 0.75}
+    assert await storage.get_counter("usage:prompt_tokens") == 10
+    assert await storage.get_counters(["usage:prompt_tokens", "missing"]) == {"usage:prompt_tokens": 10.0, "missing": 0.0}
+
+
+@pytest.mark.asyncio
+async def test_ancestors_and_node_counters(storage):
+    await storage.save_many(_tree())
+    paths = await storage.ancestor_ids(["b", "a", "missing"])
+    assert paths == {"b": ["root", "a", "b"], "a": ["root", "a"]}
+
+    await storage.incr_counters({VISITS_PREFIX + "b": 2, VISITS_PREFIX + "a": 2})
+    assert await storage.delete_many(["b"]) == 1
+    assert await storage.get_counters([VISITS_PREFIX + "b", VISITS_PREFIX + "a"]) == {VISITS_PREFIX + "b": 0.0, VISITS_PREFIX + "a": 2.0}
+
+
+@pytest.mark.asyncio
+async def test_versioned_state(storage):
+    assert await storage.load_state("projector") == (0, None)
+    assert await storage.save_state("projector", 1, b"one")
+    assert not await storage.save_state("projector", 1, b"stale")  # someone else's version 1 won
+    assert await storage.save_state("projector", 2, b"two")
+    assert await storage.state_version("projector") == 2
+    assert await storage.load_state("projector") == (2, b"two")
+
+
+@pytest.mark.asyncio
+async def test_claim_by_id(storage):
+    await storage.save_many(_tree())
+    for node_id, priority in [("a", 0.1), ("b", 0.5), ("c", 0.9)]:
+        await storage.push(node_id, priority)
+
+    assert await storage.frontier_top(2) == [("c", 0.9), ("b", 0.5)]
+    assert await storage.claim(["a", "c", "missing"]) == ["a", "c"]
+    assert await storage.claim(["a"]) == []  # already leased
+    assert await storage.frontier_top(5) == [("b", 0.5)]
+    assert await storage.nack(["a"]) == 1
+    assert await storage.claim_batch(1) == ["b"]
+    assert await storage.roots(["b", "root", "missing"]) == {"b": "root", "root": "root"}
+
+
+@pytest.mark.asyncio
+async def test_pubsub(storage):
+    messages = storage.subscribe("graph_updates")
+    receiver = asyncio.ensure_future(messages.__anext__())
+    await asyncio.sleep(0.2)  # let the subscription start
+
+    await storage.publish("other", "ignored")
+    await storage.publish("graph_updates", "hello")
+    assert await asyncio.wait_for(receiver, timeout=2) == "hello"
+    await messages.aclose()
+
+
+@pytest.mark.asyncio
+async def test_prune_frontier(storage, tmp_path, monkeypatch):
+    archive = tmp_path / "pruned.jsonl.gz"
+    monkeypatch.setattr(settings, "frontier_max_size", 1)
+    monkeypatch.setattr(settings, "frontier_depth_quota", 1)
+    monkeypatch.setattr(settings, "frontier_prune_action", "archive")
+    monkeypatch.setattr(settings, "frontier_archive_path", str(archive))
+    await storage.save_many(
+        _tree()
+        + [
+            Node(id="c", prompt="c", depth=1, parent="root", score=0.3),
+            Node(id="d", prompt="d", depth=2, parent="a", score=0.1),
+        ]
+    )
+    for node_id, priority in [("a", 0.9), ("c", 0.8), ("b", 0.7), ("d", 0.6), ("root", 0.1)]:
+        await storage.push(node_id, priority)
+
+    # Quotas drop c and d, the cap then drops b and root; root has children so it stays
+    assert await storage.prune_frontier() == {"evicted": 4, "removed": 3}
+    assert await storage.claim_batch(5) == ["a"]
+    assert sorted([n.id async for n in storage.iter_nodes(fields=["id"])]) == ["a", "root"]
+    assert (await storage.node_stats())["total"] == 2
+    with gzip.open(archive, "rt") as f:
+        assert sorted(Node.model_validate_json(line).id for line in f) == ["b", "c", "d"]
+
+
+@pytest.mark.asyncio
+async def test_root_quota(storage):
+    await storage.save_many(
+        [Node(id=f"r{i}", prompt="r", depth=0) for i in range(2)]
+        + [Node(id=f"r{i}-{j}", prompt="c", depth=1, parent=f"r{i}") for i in range(2) for j in range(3)]
+    )
+    for i in range(2):
+        for j in range(3):
+            await storage.push(f"r{i}-{j}", i + j / 10)
+
+    assert sorted(await storage.enforce_quotas(depth_quota=0, root_quota=2)) == ["r0-0", "r1-0"]
+    assert await storage.frontier_size() == 4
+
+
+@pytest.mark.asyncio
+async def test_depth_quota_across_pages(storage, monkeypatch):
+    monkeypatch.setattr(async_frontier, "BATCH_SIZE", 2)  # Redis walks the frontier two ids at a time
+    await storage.save_many([Node(id=f"n{i}", prompt="p", depth=i % 2) for i in range(6)])
+    for i in range(6):
+        await storage.push(f"n{i}", float(i))
+
+    assert sorted(await storage.enforce_quotas(depth_quota=2, root_quota=0)) == ["n0", "n1"]
+    assert await storage.claim_batch(6) == ["n5", "n4", "n3", "n2"]
+
+
+@pytest.mark.asyncio
+async def test_write_batch(storage):
+    await storage.incr_counters({"usage:total_cost": 1.0})
+    messages = storage.subscribe("graph_updates")
+    receiver = asyncio.ensure_future(messages.__anext__())
+    await asyncio.sleep(0.2)
+
+    totals = await storage.write_batch(
+        _tree(), {"a": 0.9, "b": 0.4}, {"usage:total_cost": 0.5, "usage:prompt_tokens": 7}, [("graph_updates", "a")]
+    )
+    assert totals == {"usage:total_cost": 1.5, "usage:prompt_tokens": 7}
+    assert await asyncio.wait_for(receiver, timeout=2) == "a"
+    await messages.aclose()
+    assert await storage.node_count() == 3
+    assert await storage.claim_batch(2) == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_layouts(storage):
+    await storage.save_many(_tree())
+    await storage.delete_many(["b"])
+    messages = storage.subscribe("graph_updates")
+    receiver = asyncio.ensure_future(messages.__anext__())
+    await asyncio.sleep(0.2)
+
+    assert await storage.load_layout() == (0, None)
+    assert not await storage.save_layout(2, b"v2", {}, "graph_updates", "skipped")
+    xy = {"root": [1.0, 2.0], "a": [3.0, 4.0], "b": [5.0, 6.0]}
+    assert await storage.save_layout(1, b"v1", xy, "graph_updates", "layout")
+
+    assert await asyncio.wait_for(receiver, timeout=2) == "layout"
+    await messages.aclose()
+    assert await storage.layout_version() == 1
+    assert await storage.load_layout() == (1, b"v1")
+    assert [n.xy for n in await storage.get_many(["root", "a"], fields=["xy"])] == [[1.0, 2.0], [3.0, 4.0]]
+    # A node deleted before the layout landed stays deleted
+    assert await storage.get("b") is None
+    assert not await storage.save_layout(1, b"again", {}, "graph_updates", "stale")
+
+
+@pytest.mark.asyncio
+async def test_locks(storage):
+    assert await storage.try_lock("refit", 0.1)
+    assert not await storage.try_lock("refit", 0.1)
+    await asyncio.sleep(0.15)
+    assert await storage.try_lock("refit", 10)
+    assert await storage.unlock("refit")
+    assert await storage.try_lock("refit", 10)
+
+
+@pytest.mark.asyncio
+async def test_unlock_checks_the_owner(storage, monkeypatch):
+    assert await storage.try_lock("refit", 0.05)
+    await asyncio.sleep(0.1)
+    # Another process takes the expired lock; the first holder cannot release it
+    with monkeypatch.context() as other:
+        other.setattr(sqlite_storage, "CONSUMER_ID", "other-host:1")
+        other.setattr(storage_module, "CONSUMER_ID", "other-host:1")
+        assert await storage.try_lock("refit", 10)
+    assert not await storage.unlock("refit")
+    assert not await storage.try_lock("refit", 10)
+
+
+@pytest.mark.asyncio
+async def test_focus_zone_queries(storage):
+    nodes = [
+        Node(id="in", prompt="in", depth=0, xy=[0.5, 0.5]),
+        Node(id="corner", prompt="corner", depth=0, xy=[1.9, 1.9]),  # in the box, outside the triangle
+        Node(id="far", prompt="far", depth=0, xy=[40.0, -3.0]),
+        Node(id="moved", prompt="moved", depth=0, xy=[9.0, 9.0]),
+        Node(id="none", prompt="none", depth=0),
+    ]
+    await storage.save_many(nodes)
+    triangle = [[0.0, 0.0], [2.0, 0.0], [0.0, 2.0]]
+    assert await storage.nodes_in_polygon(triangle) == ["in"]
+
+    # Re-projection moves nodes in the index; deleted nodes leave it
+    await storage.save_layout(1, b"v1", {"moved": [0.2, 0.3], "far": [0.1, 0.1]}, "graph_updates", "layout")
+    await storage.delete_many(["far"])
+    assert sorted(await storage.nodes_in_polygon(triangle)) == ["in", "moved"]
+
+    await storage.push("in", 1.0)
+    await storage.push("moved", 0.25)
+    await storage.push("corner", 0.5)
+    assert await storage.claim_batch(1) == ["in"]
+    # Only queued nodes are boosted; the claimed one keeps its priority
+    assert await storage.boost(["in", "moved", "far"], 4.0) == 1
+    assert await storage.claim_batch(2) == ["moved", "corner"]
+
+
+@pytest.mark.asyncio
+async def test_reweigh_frontier(storage):
+    await storage.push("a", 1.0, [1.0, 0.5, 0.0])
+    await storage.push("b", 2.0, [2.0, 0.0, 1.0])
+    await storage.push("seed", 0.7)  # no terms: keeps its priority
+    await storage.push("gone", 0.1, [0.1, 0.0, 0.0])
+    assert await storage.claim_batch(1) == ["b"]
+    await storage.ack(["b"])
+    await storage.push("b2", 3.0, [3.0, 0.0, 0.0])
+    assert await storage.claim_batch(1) == ["b2"]
+    assert await storage.boost(["a"], 2.0) == 1
+    assert await storage.trim_frontier(2) == ["gone"]
+
+    # Finished and evicted nodes are skipped; the claimed b2 is re-scored in its lease
+    assert await storage.reweigh_frontier([1.0, -2.0, 0.0]) == 2
+    assert await storage.nack(["b2"]) == 1
+    # a keeps its boost: 2 * (1 - 2 * 0.5) = 0
+    assert await storage.claim_batch(3) == ["b2", "seed", "a"]
+
+
+@pytest.mark.asyncio
+async def test_reweigh_mixed_term_lengths(storage):
+    # Terms stored before a term was added or dropped: missing ones count as 0
+    await storage.push("short", 1.0, [1.0])
+    await storage.push("long", 1.0, [0.5, 1.0, 1.0, 1.0])
+    assert await storage.reweigh_frontier([1.0, 2.0]) == 2
+    assert await storage.claim_batch(2) == ["long", "short"]
+    assert await storage.reweigh_frontier([1.0, 2.0, 4.0]) == 2
+    await storage.nack(["long", "short"])
+    assert await storage.frontier_top(2) == [("long", 6.5), ("short", 1.0)]
+
+
+@pytest.mark.asyncio
+async def test_settings_overrides(storage):
+    messages = storage.subscribe("settings_updates")
+    receiver = asyncio.ensure_future(messages.__anext__())
+    await asyncio.sleep(0.2)
+
+    assert await storage.load_settings() == {}
+    await storage.save_settings({"lambda_sim": 0.5, "lambda_depth": 0.0}, "settings_updates", "new weights")
+    assert await asyncio.wait_for(receiver, timeout=2) == "new weights"
+    await messages.aclose()
+    assert await storage.load_settings() == {"lambda_sim": 0.5, "lambda_depth": 0.0}
@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+import pytest
+
+from backend.config.settings import settings
+from backend.core.schemas import Node
+from backend.db import frontier
+from backend.db.frontier import TERMS_KEY
+from backend.db.redis_client import get_redis
+from backend.db.storage import get_storage
+from backend.db.write_buffer import WriteBuffer, writer
+from backend.orchestrator import weights
+from backend.orchestrator.scheduler import calculate_priority, priority_terms, priority_weights, seed_terms, weigh
+
+
+@pytest.fixture(autouse=True)
+def restore_weights(monkeypatch):
+    for name, value in weights.current().items():
+        monkeypatch.setattr(settings, name, value)
+
+
+def test_priority_is_weighted_terms():
+    node = Node(id="n", prompt="p", score=0.8, depth=3, emb=[1.0, 0.0])
+    terms = priority_terms(node, 0.5, [[1.0, 0.0]], {"max_sim": 0.9, "density": 0.4})
+    assert terms == pytest.approx([0.8, 0.3, 1.0, 0.9, 0.4, 3.0])
+    assert calculate_priority(node, 0.5, [[1.0, 0.0]], {"max_sim": 0.9, "density": 0.4}) == pytest.approx(
+        sum(t * w for t, w in zip(terms, priority_weights(), strict=True))
+    )
+
+
+@pytest.mark.asyncio
+async def test_update_rescores_frontier_and_reaches_followers():
+    storage = get_storage()
+    deep = [0.5, 0.0, 0.0, 0.0, 0.0, 6.0]  # ranked below shallow by the default lambda_depth
+    shallow = [0.3, 0.0, 0.0, 0.0, 0.0, 0.0]
+    await storage.push("deep", weigh(deep), deep)
+    await storage.push("shallow", weigh(shallow), shallow)
+
+    await weights.update({"lambda_depth": 0.0})
+    assert await storage.claim_batch(1) == ["deep"]
+
+    follower = asyncio.create_task(weights.follow())
+    await asyncio.sleep(0.2)
+    await storage.save_settings({"lambda_depth": 0.5}, weights.SETTINGS_CHANNEL, json.dumps({"lambda_depth": 0.5}))
+    await asyncio.sleep(0.2)
+    follower.cancel()
+    assert settings.lambda_depth == 0.5
+
+    settings.lambda_depth = 0.05
+    assert (await weights.load())["lambda_depth"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_every_push_path_is_reweighed():
+    storage = get_storage()
+    deep = [0.5, 0.0, 0.0, 0.0, 0.0, 6.0]
+    frontier.push("seed", 0.4, seed_terms(0.4))
+    frontier.push("sync", weigh(deep), deep)
+    async with WriteBuffer(storage, max_items=0, flush_interval=0, weigh=weigh):
+        await writer().push("buffered", weigh(deep), deep)
+        # Queued under the old weights, flushed under the new ones
+        assert await weights.update({"lambda_depth": 0.0}) == 2
+    assert dict(await storage.frontier_top(3)) == pytest.approx({"buffered": 0.5, "sync": 0.5, "seed": 0.4})
+
+
+@pytest.mark.asyncio
+async def test_terms_follow_the_frontier():
+    storage = get_storage()
+    r = get_redis()
+    for i in range(5):
+        await storage.push(f"n{i}", weigh([0.1 * i, 0.0, 0.0, 0.0, 0.0, 0.0]), [0.1 * i, 0.0, 0.0, 0.0, 0.0, 0.0])
+    await storage.ack(await storage.claim_batch(3))
+    assert await storage.trim_frontier(1) == ["n0"]
+    assert await storage.frontier_size() == 1 and r.hlen(TERMS_KEY) == 1
+
+    await storage.push("n0", 0.1, [0.1, 0.0, 0.0, 0.0, 0.0, 0.0])
+    await storage.enforce_quotas(depth_quota=1)
+    assert await storage.frontier_size() == r.hlen(TERMS_KEY) == 1
+
+    await storage.save(Node(id="n1", prompt="p", depth=0))
+    await storage.delete_many(["n1"])
+    assert r.hlen(TERMS_KEY) == 0
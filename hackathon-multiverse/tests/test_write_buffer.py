@@ -0,0 +1,33 @@
+import pytest
+
+from backend.core.schemas import Node
+from backend.db.storage import RedisStorage, get_storage
+from backend.db.write_buffer import WriteBuffer, writer
+
+
+@pytest.mark.asyncio
+async def test_writes_are_deferred_until_flush():
+    storage = RedisStorage()
+    async with WriteBuffer(storage, max_items=0, flush_interval=0) as buffer:
+        assert writer() is buffer
+        await writer().save(Node(id="a", prompt="p", depth=0, score=0.5))
+        await writer().push("a", 0.5)
+        assert await writer().incr_counters({"usage:total_cost": 0.25}) == {"usage:total_cost": 0.25}
+        assert await storage.node_count() == 0
+        assert await storage.frontier_size() == 0
+
+    assert writer() is get_storage()
+    assert (await storage.get("a")).score == 0.5
+    assert await storage.claim_batch(1) == ["a"]
+    assert await storage.get_counter("usage:total_cost") == 0.25
+
+
+@pytest.mark.asyncio
+async def test_flushes_at_max_items():
+    storage = RedisStorage()
+    async with WriteBuffer(storage, max_items=2, flush_interval=0) as buffer:
+        await buffer.push("a", 0.1)
+        assert await storage.frontier_size() == 0
+        await buffer.push("b", 0.2)
+        assert await storage.frontier_size() == 2
+        assert len(buffer) == 0
@@ -1,20 +1,24 @@
 from fastapi import APIRouter, HTTPException, Body
 from typing import List
 from backend.core.schemas import FocusZone, SettingsUpdate, Node
-from backend.orchestrator.scheduler import boost_or_seed
+from backend.orchestrator import weights
+from backend.orchestrator.scheduler import boost_or_seed, seed_terms
 from backend.config.settings import settings
 from backend.core.logger import get_logger
-from backend.db.redis_client import get_redis
-from backend.db.node_store import get, save
-from backend.db.frontier import push
+from backend.db.storage import get_storage
 from backend.core.utils import uuid_str
-from backend.core.embeddings import embed, to_xy, fit_reducer
+from backend.core import layout
+from backend.core.embeddings import embed_async, embed_many_async, to_xy_many_async, fit_reducer
 from backend.agents.system_prompt_mutator import generate_initial_system_prompts
 from backend.core.evaluation import comprehensive_system_prompt_evaluation, compare_system_prompts, analyze_system_prompt_evolution
 
 logger = get_logger(__name__)
 router = APIRouter()
 
+# Projections for the list endpoints; conversation_samples and emb stay in Redis
+GRAPH_FIELDS = ["xy", "score", "avg_score", "sample_count", "parent", "depth", "system_prompt"]
+BEST_PROMPT_FIELDS = ["system_prompt", "score", "avg_score", "sample_count", "depth"]
+
 
 @router.post("/focus_zone")
 async def focus_zone(payload: FocusZone):
@@ -32,22 +36,17 @@ async def focus_zone(payload: FocusZone):
 @router.patch("/settings")
 async def update_settings(updates: SettingsUpdate):
     """
-    Update lambda values at runtime.
+    Update lambda values at runtime, in every worker, and re-score the frontier.
     """
     try:
         # Update only provided values
-        if updates.lambda_trend is not None:
-            settings.lambda_trend = updates.lambda_trend
-        if updates.lambda_sim is not None:
-            settings.lambda_sim = updates.lambda_sim
-        if updates.lambda_depth is not None:
-            settings.lambda_depth = updates.lambda_depth
+        values = updates.model_dump(exclude_none=True)
+        if values:
+            await weights.update(values)
 
         # Return full settings
         return {
-            "lambda_trend": settings.lambda_trend,
-            "lambda_sim": settings.lambda_sim,
-            "lambda_depth": settings.lambda_depth,
+            **weights.current(),
             "redis_url": settings.redis_url,
             "log_level": settings.log_level,
         }
@@ -62,9 +61,7 @@ async def get_settings():
     Get current settings.
     """
     return {
-        "lambda_trend": settings.lambda_trend,
-        "lambda_sim": settings.lambda_sim,
-        "lambda_depth": settings.lambda_depth,
+        **await weights.load(),
         "redis_url": settings.redis_url,
         "log_level": settings.log_level,
     }
@@ -75,27 +72,23 @@ async def get_graph():
     """
     Dump all system prompt nodes (id, xy, score, parent, system_prompt preview) – UI calls once on load.
     """
-    r = get_redis()
     nodes = []
-    for key in r.keys("node:*"):
-        node_id = key.decode('utf-8').replace("node:", "") if isinstance(key, bytes) else key.replace("node:", "")
-        node = get(node_id)
-        if node:
-            # Include system prompt preview for visualization
-            system_prompt_preview = node.system_prompt[:100] + "..." if len(node.system_prompt) > 100 else node.system_prompt
-            
-            nodes.append(
-                {
-                    "id": node.id,
-                    "xy": node.xy,
-                    "score": node.score,
-                    "avg_score": getattr(node, 'avg_score', node.score),
-                    "sample_count": getattr(node, 'sample_count', 0),
-                    "parent": node.parent,
-                    "depth": node.depth,
-                    "system_prompt_preview": system_prompt_preview,
-                }
-            )
+    async for node in get_storage().iter_nodes(fields=GRAPH_FIELDS):
+        # Include system prompt preview for visualization
+        system_prompt_preview = node.system_prompt[:100] + "..." if len(node.system_prompt) > 100 else node.system_prompt
+        
+        nodes.append(
+            {
+                "id": node.id,
+                "xy": node.xy,
+                "score": node.score,
+                "avg_score": getattr(node, 'avg_score', node.score),
+                "sample_count": getattr(node, 'sample_count', 0),
+                "parent": node.parent,
+                "depth": node.depth,
+                "system_prompt_preview": system_prompt_preview,
+            }
+        )
     return nodes
 
 
@@ -106,8 +99,9 @@ async def get_system_prompt_details(node_id: str):
     Returns the system prompt, conversation samples, and evaluation metrics.
     """
     try:
-        # Get the target node
-        target_node = get(node_id)
+        # Get the target node, conversation samples included
+        nodes = await get_storage().load_full([node_id])
+        target_node = nodes[0] if nodes else None
         
         if not target_node:
             return {"error": "System prompt node not found"}
@@ -134,8 +128,9 @@ async def get_conversation_samples(node_id: str):
     Returns the test conversations used to evaluate this system prompt.
     """
     try:
-        # Get the target node
-        target_node = get(node_id)
+        # Get the target node, conversation samples included
+        nodes = await get_storage().load_full([node_id])
+        target_node = nodes[0] if nodes else None
         
         if not target_node:
             return {"error": "System prompt node not found"}
@@ -170,6 +165,9 @@ async def seed(system_prompt: str = Body(..., embed=True)):
             )
         
         # Create system prompt node
+        emb = await embed_async(system_prompt)
+        await layout.sync()
+        xy = (await to_xy_many_async([emb]))[0]
         node = Node(
             id=uuid_str(),
             system_prompt=system_prompt,
@@ -178,12 +176,13 @@ async def seed(system_prompt: str = Body(..., embed=True)):
             avg_score=0.5,
             sample_count=0,
             depth=0,
-            emb=embed(system_prompt),
-            xy=list(to_xy(embed(system_prompt))),
+            emb=emb,
+            xy=list(xy),
         )
         
-        save(node)
-        push(node.id, 1.0)  # High priority for initial exploration
+        storage = get_storage()
+        await storage.save(node)
+        await storage.push(node.id, 1.0, seed_terms(1.0))  # High priority for initial exploration
         
         logger.info(f"Seeded system prompt optimization with node {node.id[:8]}...")
         
@@ -207,8 +206,13 @@ async def seed_multiple(num_seeds: int = Body(3, embed=True)):
         # Generate diverse initial system prompts
         initial_prompts = await generate_initial_system_prompts(k=num_seeds)
         
-        seed_ids = []
-        for i, system_prompt in enumerate(initial_prompts):
+        # One embeddings request for every seed
+        embeddings = await embed_many_async(initial_prompts)
+        await layout.sync()
+        coords = await to_xy_many_async(embeddings)
+        
+        nodes = []
+        for system_prompt, emb, xy in zip(initial_prompts, embeddings, coords, strict=True):
             node = Node(
                 id=uuid_str(),
                 system_prompt=system_prompt,
@@ -217,12 +221,17 @@ async def seed_multiple(num_seeds: int = Body(3, embed=True)):
                 avg_score=0.5,
                 sample_count=0,
                 depth=0,
-                emb=embed(system_prompt),
-                xy=list(to_xy(embed(system_prompt))),
+                emb=emb,
+                xy=list(xy),
             )
-            
-            save(node)
-            push(node.id, 1.0 - (i * 0.1))  # Slightly different priorities
+            nodes.append(node)
+        
+        storage = get_storage()
+        await storage.save_many(nodes)
+        seed_ids = []
+        for i, node in enumerate(nodes):
+            priority = 1.0 - (i * 0.1)  # Slightly different priorities
+            await storage.push(node.id, priority, seed_terms(priority))
             seed_ids.append(node.id)
         
         logger.info(f"Seeded {len(seed_ids)} diverse system prompts for optimization")
@@ -314,18 +323,8 @@ async def get_best_system_prompts(limit: int = 10):
     Get the best performing system prompts from the current exploration.
     """
     try:
-        r = get_redis()
-        all_nodes = []
-        
-        # Get all nodes and their scores
-        for key in r.keys("node:*"):
-            node_id = key.decode('utf-8').replace("node:", "") if isinstance(key, bytes) else key.replace("node:", "")
-            node = get(node_id)
-            if node and hasattr(node, 'score') and node.score is not None:
-                all_nodes.append(node)
-        
-        # Sort by score (descending) and take top performers
-        best_nodes = sorted(all_nodes, key=lambda x: x.score or 0, reverse=True)[:limit]
+        # Top performers straight from the score index
+        best_nodes = await get_storage().top_by_score(limit, fields=BEST_PROMPT_FIELDS)
         
         best_prompts = []
         for node in best_nodes:
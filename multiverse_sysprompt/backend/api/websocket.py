@@ -1,20 +1,17 @@
 import asyncio
 from typing import Set
 from fastapi import WebSocket, WebSocketDisconnect
-import redis.asyncio as redis
-from backend.config.settings import settings
+from backend.db.storage import get_storage
 from backend.core.logger import get_logger
 
 logger = get_logger(__name__)
 
 
 class ConnectionManager:
-    """Manages WebSocket connections and Redis pub/sub."""
+    """Manages WebSocket connections and the graph updates subscription."""
 
     def __init__(self):
         self.active_connections: Set[WebSocket] = set()
-        self.redis_client = None
-        self.pubsub = None
         self.listener_task = None
 
     async def connect(self, websocket: WebSocket):
@@ -22,9 +19,9 @@ class ConnectionManager:
         await websocket.accept()
         self.active_connections.add(websocket)
 
-        # Start Redis listener if this is the first connection
+        # Start the pub/sub listener if this is the first connection
         if len(self.active_connections) == 1:
-            await self._start_redis_listener()
+            await self._start_listener()
 
         logger.info(
             f"WebSocket connected. Total connections: {len(self.active_connections)}"
@@ -37,7 +34,7 @@ class ConnectionManager:
             f"WebSocket disconnected. Total connections: {len(self.active_connections)}"
         )
 
-        # Stop Redis listener if no more connections
+        # Stop the pub/sub listener if no more connections
         if len(self.active_connections) == 0 and self.listener_task:
             self.listener_task.cancel()
             self.listener_task = None
@@ -70,29 +67,20 @@ class ConnectionManager:
             logger.debug(f"WebSocket send error: {e}")
             disconnected.add(websocket)
 
-    async def _start_redis_listener(self):
-        """Start listening to Redis pub/sub channel."""
-        self.redis_client = redis.Redis.from_url(
-            settings.redis_url, decode_responses=True
-        )
-        self.pubsub = self.redis_client.pubsub()
-        await self.pubsub.subscribe("graph_updates")
-
-        self.listener_task = asyncio.create_task(self._listen_redis())
-        logger.info("Started Redis pub/sub listener")
+    async def _start_listener(self):
+        """Start listening to the graph updates channel."""
+        self.listener_task = asyncio.create_task(self._listen())
+        logger.info("Started pub/sub listener")
 
-    async def _listen_redis(self):
-        """Listen for Redis messages and broadcast to WebSockets."""
+    async def _listen(self):
+        """Listen for published graph updates and broadcast to WebSockets."""
         try:
-            async for message in self.pubsub.listen():
-                if message["type"] == "message":
-                    await self.broadcast(message["data"])
+            async for message in get_storage().subscribe("graph_updates"):
+                await self.broadcast(message)
         except asyncio.CancelledError:
-            logger.info("Redis listener cancelled")
-            await self.pubsub.unsubscribe("graph_updates")
-            await self.redis_client.close()
+            logger.info("Pub/sub listener cancelled")
         except Exception as e:
-            logger.error(f"Redis listener error: {e}")
+            logger.error(f"Pub/sub listener error: {e}")
 
 
 # Global connection manager instance
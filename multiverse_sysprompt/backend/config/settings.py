@@ -5,6 +5,10 @@ class Settings(BaseSettings):
     redis_url: str = "redis://localhost:6379/0"
     log_level: str = "INFO"
 
+    # Storage engine for worker data: "redis", or "sqlite" for single-host runs
+    storage_backend: str = "redis"
+    sqlite_path: str = "multiverse.db"
+
     # Worker budget
     daily_budget_usd: float = 5.0      # crank up for demo day
 
@@ -17,6 +21,25 @@ class Settings(BaseSettings):
     lambda_trend: float = 0.3
     lambda_sim: float = 0.2
     lambda_depth: float = 0.05
+    # Novelty penalties from the worker's embedding index: similarity to the
+    # nearest node and mean similarity to the novelty_k nearest, measured
+    # against the "graph" (every node) or the "top_k" scoring nodes. Off by
+    # default so priorities match the original formula until tuned
+    lambda_max_sim: float = 0.0
+    lambda_density: float = 0.0
+    novelty_k: int = 10
+    novelty_reference: str = "graph"
+
+    # Frontier selection policy: "greedy" (highest priority first), "ucb"
+    # (UCB1 over root subtrees), "thompson" (samples scores by how many critic
+    # samples back them), "beam" (beam_width expansions per depth) or "mcts"
+    # (UCT over backed-up child scores). All but greedy re-rank the
+    # policy_pool_size highest priority queued nodes; see orchestrator.policies
+    selection_policy: str = "greedy"
+    policy_pool_size: int = 200
+    policy_exploration: float = 1.4
+    beam_width: int = 5
+    thompson_critic_samples: float = 4.0
     
     # OpenAI/OpenRouter settings
     openai_api_key: str = ""
@@ -28,6 +51,71 @@ class Settings(BaseSettings):
     ui_embed_dims: int = 2             # what to send downstream
     ui_ws_channel: str = "graph_updates"
 
+    # Embedding storage in Redis: "f4" (float32), "f2" (float16) or "i8" (int8-quantized)
+    emb_storage_dtype: str = "f4"
+
+    # 2-D layout engine: "umap" (refit in the background), or "incremental"
+    # (streaming PCA updated every projection_batch_size embeddings, stable axes)
+    projection_engine: str = "umap"
+    projection_batch_size: int = 32
+    # UMAP layouts: refit once this many nodes were added since the last fit,
+    # and seconds a refit may hold the refit lock
+    layout_refit_every: int = 50
+    layout_refit_timeout: float = 600.0
+
+    # Embedding provider: "openai", or "local" (hashed n-grams, offline and instant)
+    embedding_provider: str = "openai"
+    # Embedding requests: texts per API call, and seconds embed_async waits to
+    # coalesce concurrent calls into one request
+    embedding_batch_size: int = 2048
+    embedding_batch_window: float = 0.005
+    # Embedding cache: vectors kept in-process (LRU) and seconds each stays in Redis
+    embedding_cache_size: int = 10000
+    embedding_cache_ttl: int = 7 * 24 * 3600
+
+    # Seconds a worker may hold a claimed frontier node before it is re-queued
+    frontier_lease_seconds: float = 300.0
+    # Failed expansions of a node (on transient errors) before it is dead-lettered
+    frontier_max_attempts: int = 3
+
+    # Frontier bounds, enforced from the worker heartbeat (0 disables each):
+    # total queued nodes, queued nodes per depth and per root
+    frontier_max_size: int = 50000
+    frontier_depth_quota: int = 0
+    frontier_root_quota: int = 0
+    # Pruned leaves are "keep"-ed, "delete"-d, or "archive"-d to a gzipped JSONL file
+    frontier_prune_action: str = "keep"
+    frontier_archive_path: str = "archive/pruned_nodes.jsonl.gz"
+
+    # Worker write-behind buffer: flush once this many writes are queued,
+    # and at least this often in seconds (0 disables either trigger)
+    write_buffer_max_items: int = 200
+    write_buffer_flush_interval: float = 1.0
+
+    # Conversation samples kept per node, best scoring first (0 keeps all)
+    samples_retention: int = 5
+
+    # Staged evaluation of sibling variants (successive halving): all run a
+    # first rung of eval_first_rung_scenarios scenarios capped at
+    # eval_first_rung_turns turns; the best 1/eval_halving_eta move on to a
+    # rung eta times larger, up to the full evaluation. Off, every variant
+    # gets the full evaluation.
+    staged_evaluation: bool = False
+    eval_first_rung_scenarios: int = 1
+    eval_first_rung_turns: int = 4
+    eval_halving_eta: int = 3
+
+    # Adaptive sampling: an evaluation runs every scenario once, then adds
+    # eval_sample_wave conversations at a time (concurrently) until the
+    # eval_ci_level confidence interval on the mean score is narrower than
+    # eval_ci_epsilon, or eval_max_samples conversations were scored.
+    # Comprehensive evaluations run eval_round_wave rounds at a time.
+    eval_ci_epsilon: float = 0.2
+    eval_ci_level: float = 0.95
+    eval_max_samples: int = 9
+    eval_sample_wave: int = 3
+    eval_round_wave: int = 2
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
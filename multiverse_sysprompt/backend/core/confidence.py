@@ -0,0 +1,49 @@
+"""Confidence intervals on mean conversation scores, for adaptive sampling.
+
+Evaluations keep scoring conversations until the Student t interval on the
+mean score is narrower than settings.eval_ci_epsilon. The t quantile comes
+from the Cornish-Fisher expansion around the normal one, which is within
+1% of the exact value from 2 degrees of freedom on.
+"""
+
+from statistics import NormalDist, mean, stdev
+from typing import List, Optional, Sequence, Tuple
+from backend.config.settings import settings
+
+
+def t_quantile(p: float, dof: int) -> float:
+    """Approximate p-quantile of Student's t with dof degrees of freedom."""
+    z = NormalDist().inv_cdf(p)
+    v = float(dof)
+    return (
+        z
+        + (z**3 + z) / (4 * v)
+        + (5 * z**5 + 16 * z**3 + 3 * z) / (96 * v**2)
+        + (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / (384 * v**3)
+        + (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3 - 945 * z) / (92160 * v**4)
+    )
+
+
+def mean_ci(scores: Sequence[float], level: Optional[float] = None) -> Tuple[float, float]:
+    """(low, high) interval on the mean of scores in [0, 1] at settings.eval_ci_level
+    (or level); with fewer than two scores nothing is known, so it is (0, 1)."""
+    if len(scores) < 2:
+        return 0.0, 1.0
+    level = settings.eval_ci_level if level is None else level
+    half = t_quantile(0.5 + level / 2, len(scores) - 1) * stdev(scores) / len(scores) ** 0.5
+    center = mean(scores)
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def settled(scores: Sequence[float], max_samples: Optional[int] = None) -> bool:
+    """Whether sampling can stop: the interval is narrower than settings.eval_ci_epsilon,
+    or max_samples scores were taken."""
+    if max_samples is not None and len(scores) >= max_samples:
+        return True
+    low, high = mean_ci(scores)
+    return high - low < settings.eval_ci_epsilon
+
+
+def shifted(ci: Tuple[float, float], offset: float) -> List[float]:
+    """The interval moved by offset (e.g. an efficiency bonus), within [0, 1]."""
+    return [min(1.0, max(0.0, ci[0] + offset)), min(1.0, max(0.0, ci[1] + offset))]
@@ -1,12 +1,34 @@
 import asyncio
-from typing import List, Dict, Tuple
+import math
+from typing import List, Dict, Optional, Tuple
 from backend.agents.mutator import variants
 from backend.agents.persona import call as persona_call
 from backend.agents.critic import score as critic_score
+from backend.config.settings import settings
+from backend.core.confidence import mean_ci, settled, shifted
 from backend.core.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Predefined test scenarios for consistent evaluation
+TEST_SCENARIOS = [
+    {
+        "scenario_type": "cold_outreach",
+        "mood": "skeptical_but_listening", 
+        "max_turns": 8
+    },
+    {
+        "scenario_type": "portfolio_diversification",
+        "mood": "economically_pragmatic",
+        "max_turns": 6  
+    },
+    {
+        "scenario_type": "post_rugpull_trauma",
+        "mood": "security_focused",
+        "max_turns": 10
+    }
+]
+
 
 async def should_stop_conversation(scores: List[float], min_turns: int = 3) -> Tuple[bool, float]:
     """
@@ -159,34 +181,26 @@ async def variants_with_system_prompt(system_prompt: str, conversation_history:
         return []
 
 
-async def generate_test_conversations(system_prompt: str) -> List[Tuple[List[Dict], float]]:
+def _capped(scenarios: List[Dict], max_turns: Optional[int]) -> List[Dict]:
+    """Scenarios with their turn limit lowered to max_turns, if given."""
+    if max_turns is None:
+        return scenarios
+    return [dict(scenario, max_turns=min(scenario["max_turns"], max_turns)) for scenario in scenarios]
+
+
+async def generate_test_conversations(system_prompt: str, scenarios: Optional[List[Dict]] = None, max_turns: Optional[int] = None) -> List[Tuple[List[Dict], float]]:
     """
     Generate multiple test conversations to evaluate a system prompt.
     
     Args:
         system_prompt: Instructions for the mutator agent
+        scenarios: Scenarios to run (default: all TEST_SCENARIOS)
+        max_turns: Optional cap on every scenario's turn limit
     
     Returns:
         List of (conversation, score) tuples
     """
-    # Predefined test scenarios for consistent evaluation
-    test_scenarios = [
-        {
-            "scenario_type": "cold_outreach",
-            "mood": "skeptical_but_listening", 
-            "max_turns": 8
-        },
-        {
-            "scenario_type": "portfolio_diversification",
-            "mood": "economically_pragmatic",
-            "max_turns": 6  
-        },
-        {
-            "scenario_type": "post_rugpull_trauma",
-            "mood": "security_focused",
-            "max_turns": 10
-        }
-    ]
+    test_scenarios = _capped(TEST_SCENARIOS if scenarios is None else scenarios, max_turns)
     
     logger.info(f"Testing system prompt across {len(test_scenarios)} scenarios")
     
@@ -211,19 +225,55 @@ async def generate_test_conversations(system_prompt: str) -> List[Tuple[List[Dic
     return successful_results
 
 
-async def evaluate_system_prompt(system_prompt: str) -> Dict:
+def evaluation_budget(scenarios: List[Dict], max_turns: Optional[int] = None) -> float:
+    """Share of the full evaluation's turns (every scenario to its limit) a run covers."""
+    full = sum(scenario["max_turns"] for scenario in TEST_SCENARIOS)
+    return sum(scenario["max_turns"] for scenario in _capped(scenarios, max_turns)) / full
+
+
+async def sample_until_settled(system_prompt: str, scenarios: List[Dict], max_turns: Optional[int] = None, max_samples: Optional[int] = None) -> List[Tuple[List[Dict], float]]:
+    """
+    Run every scenario once, then keep adding conversations (cycling through
+    the scenarios, settings.eval_sample_wave at a time, concurrently) until
+    the confidence interval on the mean score is narrower than
+    settings.eval_ci_epsilon or max_samples (default settings.eval_max_samples)
+    conversations were scored.
+    """
+    max_samples = settings.eval_max_samples if max_samples is None else max_samples
+    results = await generate_test_conversations(system_prompt, scenarios, max_turns)
+    next_scenario = len(scenarios)
+    while results and not settled([score for _, score in results], max_samples):
+        count = min(max(1, settings.eval_sample_wave), max_samples - len(results))
+        wave = [scenarios[(next_scenario + i) % len(scenarios)] for i in range(count)]
+        next_scenario += count
+        more = await generate_test_conversations(system_prompt, wave, max_turns)
+        if not more:
+            break
+        results.extend(more)
+    return results
+
+
+async def evaluate_system_prompt(system_prompt: str, scenarios: Optional[List[Dict]] = None, max_turns: Optional[int] = None, max_samples: Optional[int] = None) -> Dict:
     """
     Comprehensively evaluate a system prompt by generating test conversations.
     
     Args:
         system_prompt: Instructions for the mutator agent
+        scenarios: Scenarios to run (default: all TEST_SCENARIOS)
+        max_turns: Optional cap on every scenario's turn limit
+        max_samples: Conversations to stop at if the score's confidence
+            interval is still wide (default settings.eval_max_samples; pass
+            len(scenarios) for a fixed sample)
     
     Returns:
-        Dict with avg_score, conversation_samples, sample_count, etc.
+        Dict with avg_score, conversation_samples, sample_count, etc.,
+        score_ci: the confidence interval on avg_score, and eval_confidence:
+        the share of the full evaluation the score rests on
     """
+    scenarios = TEST_SCENARIOS if scenarios is None else scenarios
     try:
-        # Generate test conversations
-        conversation_results = await generate_test_conversations(system_prompt)
+        # Generate test conversations until the score is known well enough
+        conversation_results = await sample_until_settled(system_prompt, scenarios, max_turns, max_samples)
         
         if not conversation_results:
             logger.warning("No successful conversations generated")
@@ -257,7 +307,9 @@ async def evaluate_system_prompt(system_prompt: str) -> Dict:
         
         final_score = min(1.0, avg_score + efficiency_bonus)
         
-        logger.info(f"System prompt evaluation: avg_score={avg_score:.3f}, efficiency_bonus={efficiency_bonus:.3f}, final={final_score:.3f}")
+        score_ci = shifted(mean_ci(scores), efficiency_bonus)
+        
+        logger.info(f"System prompt evaluation: avg_score={avg_score:.3f}, efficiency_bonus={efficiency_bonus:.3f}, final={final_score:.3f}, ci=[{score_ci[0]:.3f}, {score_ci[1]:.3f}] from {sample_count} samples")
         
         return {
             'avg_score': final_score,
@@ -266,7 +318,9 @@ async def evaluate_system_prompt(system_prompt: str) -> Dict:
             'success_rate': success_rate,
             'avg_conversation_length': avg_length,
             'base_score': avg_score,
-            'efficiency_bonus': efficiency_bonus
+            'efficiency_bonus': efficiency_bonus,
+            'score_ci': score_ci,
+            'eval_confidence': evaluation_budget(scenarios, max_turns)
         }
         
     except Exception as e:
@@ -277,4 +331,62 @@ async def evaluate_system_prompt(system_prompt: str) -> Dict:
             'sample_count': 0,
             'success_rate': 0.0,
             'avg_conversation_length': 0.0
-        }
\ No newline at end of file
+        }
+
+def evaluation_rungs() -> List[Tuple[List[Dict], Optional[int]]]:
+    """
+    (scenarios, turn cap) of each successive-halving rung.
+    
+    The first rung runs settings.eval_first_rung_scenarios scenarios capped
+    at settings.eval_first_rung_turns turns; each later one multiplies both
+    by settings.eval_halving_eta, and the last is the full evaluation.
+    """
+    eta = max(2, settings.eval_halving_eta)
+    longest = max(scenario["max_turns"] for scenario in TEST_SCENARIOS)
+    count, turns = max(1, settings.eval_first_rung_scenarios), max(1, settings.eval_first_rung_turns)
+    rungs = []
+    while True:
+        cap = turns if turns < longest else None
+        rungs.append((TEST_SCENARIOS[:count], cap))
+        if count >= len(TEST_SCENARIOS) and cap is None:
+            return rungs
+        count, turns = count * eta, turns * eta
+
+
+async def evaluate_system_prompts_staged(system_prompts: List[str]) -> List[Dict]:
+    """
+    Evaluate sibling system prompts by successive halving.
+    
+    Every prompt runs the first (cheap) rung of evaluation_rungs(); after each
+    rung only the best 1/eta of the prompts still in are promoted to the next
+    one, so the full evaluation is spent on the most promising siblings. A
+    rung's evaluation replaces the previous one, so each result is the one
+    from the highest rung its prompt reached, with eval_rung set to that rung
+    and eval_confidence to the share of the full evaluation it covers.
+    
+    Returns:
+        One evaluate_system_prompt result per prompt, in order
+    """
+    rungs = evaluation_rungs()
+    eta = max(2, settings.eval_halving_eta)
+    results: List[Optional[Dict]] = [None] * len(system_prompts)
+    alive = list(range(len(system_prompts)))
+    
+    for rung, (scenarios, max_turns) in enumerate(rungs):
+        # Lower rungs score a fixed sample; the last one samples adaptively
+        max_samples = None if rung == len(rungs) - 1 else len(scenarios)
+        evaluations = await asyncio.gather(*[
+            evaluate_system_prompt(system_prompts[i], scenarios, max_turns, max_samples) for i in alive
+        ])
+        for i, evaluation in zip(alive, evaluations, strict=True):
+            # A rung with no successful conversation keeps the lower rung's result
+            if evaluation['sample_count'] or results[i] is None:
+                results[i] = dict(evaluation, eval_rung=rung)
+        
+        if rung == len(rungs) - 1:
+            break
+        keep = max(1, math.ceil(len(alive) / eta))
+        alive = sorted(alive, key=lambda i: results[i]['avg_score'], reverse=True)[:keep]
+        logger.info(f"Rung {rung}: promoting {keep} of {len(evaluations)} system prompts")
+    
+    return results
@@ -6,9 +6,11 @@ Provides advanced metrics, analysis, and comparison capabilities.
 import asyncio
 from typing import List, Dict, Tuple, Optional
 from statistics import mean, stdev
+from backend.config.settings import settings
+from backend.core.confidence import mean_ci, settled
 from backend.core.conversation_generator import evaluate_system_prompt, generate_test_conversations
 from backend.core.logger import get_logger
-from backend.db.node_store import get_all_nodes
+from backend.db.storage import get_storage
 from backend.core.schemas import Node
 
 logger = get_logger(__name__)
@@ -18,38 +20,48 @@ async def comprehensive_system_prompt_evaluation(system_prompt: str, num_tests:
     """
     Perform comprehensive evaluation of a system prompt with extended testing.
     
+    Rounds run settings.eval_round_wave at a time, concurrently, and stop
+    early once the confidence interval on the mean score is narrower than
+    settings.eval_ci_epsilon.
+    
     Args:
         system_prompt: The system prompt to evaluate
-        num_tests: Number of test rounds to run (default 5 for robustness)
+        num_tests: Most test rounds to run (default 5 for robustness)
     
     Returns:
         Dict with comprehensive evaluation metrics
     """
-    logger.info(f"Starting comprehensive evaluation with {num_tests} test rounds")
+    logger.info(f"Starting comprehensive evaluation with up to {num_tests} test rounds")
     
     all_results = []
     
-    # Run multiple evaluation rounds for statistical significance
-    for round_num in range(num_tests):
+    async def run_round(round_num: int) -> Optional[Dict]:
         logger.debug(f"Evaluation round {round_num + 1}/{num_tests}")
-        
         try:
             # Generate test conversations for this round
             conversation_results = await generate_test_conversations(system_prompt)
-            
-            if conversation_results:
-                round_scores = [score for _, score in conversation_results]
-                round_lengths = [len(conv) // 2 for conv, _ in conversation_results]  # Turn counts
-                
-                all_results.append({
-                    'scores': round_scores,
-                    'lengths': round_lengths,
-                    'conversations': conversation_results
-                })
-                
         except Exception as e:
             logger.error(f"Evaluation round {round_num + 1} failed: {e}")
-            continue
+            return None
+        if not conversation_results:
+            return None
+        return {
+            'scores': [score for _, score in conversation_results],
+            'lengths': [len(conv) // 2 for conv, _ in conversation_results],  # Turn counts
+            'conversations': conversation_results
+        }
+    
+    # Run evaluation rounds until the mean score is known well enough
+    started = 0
+    while started < num_tests:
+        wave = min(max(1, settings.eval_round_wave), num_tests - started)
+        rounds = await asyncio.gather(*[run_round(started + i) for i in range(wave)])
+        started += wave
+        all_results.extend(result for result in rounds if result)
+        scores = [score for result in all_results for score in result['scores']]
+        if scores and settled(scores):
+            logger.info(f"Score settled after {started} rounds ({len(scores)} conversations)")
+            break
     
     if not all_results:
         logger.warning("No successful evaluation rounds")
@@ -74,6 +86,7 @@ async def comprehensive_system_prompt_evaluation(system_prompt: str, num_tests:
     metrics['total_conversations'] = len(all_conversations)
     
     logger.info(f"Comprehensive evaluation complete: avg_score={metrics['avg_score']:.3f}, "
+                f"ci=[{metrics['score_ci'][0]:.3f}, {metrics['score_ci'][1]:.3f}], "
                 f"consistency={metrics['score_consistency']:.3f}, "
                 f"efficiency={metrics['efficiency_score']:.3f}")
     
@@ -137,6 +150,7 @@ def _calculate_comprehensive_metrics(scores: List[float], lengths: List[int], co
         # Core metrics
         'avg_score': avg_score,
         'score_std': score_std,
+        'score_ci': list(mean_ci(scores)),
         'min_score': min_score,
         'max_score': max_score,
         'avg_conversation_length': avg_length,
@@ -164,6 +178,7 @@ def _create_empty_evaluation_result() -> Dict:
     return {
         'avg_score': 0.0,
         'score_std': 0.0,
+        'score_ci': [0.0, 1.0],
         'min_score': 0.0,
         'max_score': 0.0,
         'avg_conversation_length': 0.0,
@@ -254,7 +269,7 @@ async def analyze_system_prompt_evolution() -> Dict:
     
     try:
         # Get all nodes from database
-        all_nodes = get_all_nodes()
+        all_nodes = [node async for node in get_storage().iter_nodes()]
         
         if not all_nodes:
             logger.warning("No nodes found in database")
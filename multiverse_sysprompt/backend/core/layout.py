@@ -0,0 +1,191 @@
+"""Versioned UMAP layouts, refit in a background process.
+
+A refit fits UMAP on every stored embedding in a separate process, so the
+worker's event loop keeps serving LLM calls meanwhile. It then publishes
+the pickled reducer as the next layout version, together with every node's
+re-projected xy and one layout_changed event, in a single storage
+transaction. Clients reload the graph on that event instead of receiving
+one update per node, and each process swaps the new reducer in at its next
+sync(), so workers and the API always project with the same version.
+
+Reducers used to be pickled to LEGACY_REDUCER_FILE in the working directory;
+the first sync() against a storage with no layout yet publishes that file as
+version 1, so an upgraded deployment keeps projecting where its nodes are.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from umap import UMAP
+from backend.config.settings import settings
+from backend.core.logger import get_logger
+from backend.db.storage import get_storage
+
+logger = get_logger(__name__)
+
+MIN_NODES = 10  # smaller graphs keep the fallback projection
+REFIT_LOCK = "layout:refit"
+LEGACY_REDUCER_FILE = "umap_reducer.pkl"
+
+# The reducer this process projects with, and its layout version (0 = local/unpublished)
+_reducer: Optional[UMAP] = None
+_version = 0
+_legacy_tried = False
+
+_pool: Optional[ProcessPoolExecutor] = None
+_refit: Optional[asyncio.Task] = None
+
+
+def fit_umap(embeddings: Sequence[Sequence[float]]) -> UMAP:
+    """Fit a UMAP reducer with the parameters tuned for conversation clustering."""
+    emb_array = np.array([np.asarray(emb, dtype=np.float32) for emb in embeddings])
+    reducer = UMAP(
+        n_neighbors=min(15, len(emb_array) - 1),  # Adaptive to data size
+        min_dist=0.1,                             # Allow some overlap for related conversations
+        n_components=2,                           # 2D output for visualization
+        metric='cosine',                          # Good for text embeddings
+        random_state=42                           # Reproducible results
+    )
+    reducer.fit(emb_array)
+    return reducer
+
+
+def current() -> Optional[UMAP]:
+    """The reducer in use by this process, if any."""
+    return _reducer
+
+
+def version() -> int:
+    return _version
+
+
+def install(reducer: UMAP, layout_version: int = 0) -> None:
+    """Project with reducer from now on in this process."""
+    global _reducer, _version
+    _reducer, _version = reducer, layout_version
+
+
+async def sync() -> int:
+    """Swap in the newest published reducer if this process is behind; returns the version in use."""
+    storage = get_storage()
+    stored = await storage.layout_version()
+    if stored == 0 and not _legacy_tried and os.path.exists(LEGACY_REDUCER_FILE):
+        await _migrate_legacy_reducer()
+    elif stored > _version:
+        latest, blob = await storage.load_layout()
+        if blob is not None and latest > _version:
+            install(pickle.loads(blob), latest)
+            logger.info(f"Switched to layout version {latest}")
+    return _version
+
+
+async def publish(reducer: UMAP, xy: Dict[str, List[float]]) -> Optional[int]:
+    """Publish reducer as the next layout version with node coordinates; returns
+    the version, or None if another process published one first."""
+    storage = get_storage()
+    next_version = await storage.layout_version() + 1
+    message = json.dumps({"type": "layout_changed", "version": next_version, "nodes": len(xy)})
+    if not await storage.save_layout(next_version, pickle.dumps(reducer), xy, settings.ui_ws_channel, message):
+        return None
+    install(reducer, next_version)
+    return next_version
+
+
+async def _migrate_legacy_reducer() -> Optional[int]:
+    """Publish the reducer pickled by older versions as the first layout. The
+    stored nodes were projected by it, so their xy stay as they are."""
+    global _legacy_tried
+    _legacy_tried = True
+    try:
+        with open(LEGACY_REDUCER_FILE, "rb") as f:
+            reducer = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"Failed to load legacy UMAP reducer {LEGACY_REDUCER_FILE}: {e}")
+        return None
+    published = await publish(reducer, {})
+    if published:
+        logger.info(f"Published legacy reducer {LEGACY_REDUCER_FILE} as layout version {published}")
+    else:
+        await sync()  # another process migrated it first
+    return published
+
+
+async def _stored_embeddings(skip=()) -> tuple:
+    ids, embeddings = [], []
+    async for node in get_storage().iter_nodes(fields=["emb"]):
+        if node.emb and node.id not in skip:
+            ids.append(node.id)
+            embeddings.append(np.asarray(node.emb, dtype=np.float32))
+    return ids, embeddings
+
+
+async def refit(ids: Optional[List[str]] = None, embeddings: Optional[Sequence] = None) -> Optional[int]:
+    """Fit UMAP on the given (or all stored) embeddings, re-project every node
+    and publish the result as the next layout version."""
+    if embeddings is None:
+        ids, embeddings = await _stored_embeddings()
+    if len(embeddings) < MIN_NODES:
+        return None
+
+    started = time.perf_counter()
+    reducer = fit_umap(embeddings)
+    xy = {node_id: [float(x), float(y)] for node_id, (x, y) in zip(ids, reducer.embedding_, strict=True)}
+
+    # Nodes saved while UMAP was fitting are projected by the new reducer too
+    new_ids, new_embeddings = await _stored_embeddings(skip=xy)
+    if new_embeddings:
+        for node_id, (x, y) in zip(new_ids, reducer.transform(np.array(new_embeddings)), strict=True):
+            xy[node_id] = [float(x), float(y)]
+
+    published = await publish(reducer, xy)
+    if published:
+        logger.info(f"Published layout version {published}: {len(xy)} nodes in {time.perf_counter() - started:.1f}s")
+    return published
+
+
+def _refit_process() -> Optional[int]:
+    """Entry point of the refit process, which opens its own storage connections."""
+    return asyncio.run(refit())
+
+
+async def _run_refit() -> None:
+    storage = get_storage()
+    try:
+        if await asyncio.get_running_loop().run_in_executor(_pool, _refit_process):
+            await sync()
+    except Exception as e:
+        logger.error(f"Layout refit failed: {e}")
+    finally:
+        await storage.unlock(REFIT_LOCK)
+
+
+async def refit_in_background() -> bool:
+    """Start a refit in the background process unless one is already running
+    anywhere; returns whether this call started it."""
+    global _pool, _refit
+    if _refit is not None and not _refit.done():
+        return False
+    if not await get_storage().try_lock(REFIT_LOCK, settings.layout_refit_timeout):
+        return False
+    if _pool is None:
+        # spawn: the worker's event loop, connections and threads must not be forked
+        _pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    _refit = asyncio.create_task(_run_refit())
+    return True
+
+
+async def refit_if_needed() -> bool:
+    """Start a background refit once the graph has outgrown the current layout
+    by settings.layout_refit_every nodes (or has none yet)."""
+    count = await get_storage().node_count()
+    if count < MIN_NODES:
+        return False
+    if _reducer is not None and count - len(_reducer.embedding_) < settings.layout_refit_every:
+        return False
+    return await refit_in_background()
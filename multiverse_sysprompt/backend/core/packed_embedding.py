@@ -0,0 +1,89 @@
+import struct
+from collections.abc import Sequence
+from typing import Iterable, List
+
+import numpy as np
+
+# Storage formats, keyed by the short tag written next to the packed bytes
+DTYPES = {
+    "f4": np.dtype("<f4"),  # float32, lossless for OpenAI embeddings
+    "f2": np.dtype("<f2"),  # float16, half the size
+    "i8": np.dtype("i1"),  # int8 with a float32 scale prefix, quarter the size
+}
+_SCALE = struct.Struct("<f")
+
+
+def pack(values: Iterable[float], dtype: str = "f4") -> bytes:
+    """Pack an embedding into compact little-endian bytes."""
+    if dtype not in DTYPES:
+        raise ValueError(f"Unknown embedding dtype: {dtype}")
+    arr = np.asarray(values, dtype=np.float32)
+    if dtype == "i8":
+        peak = float(np.abs(arr).max()) if arr.size else 0.0
+        scale = peak / 127.0 if peak > 0 else 1.0
+        quantized = np.clip(np.rint(arr / scale), -127, 127).astype(DTYPES[dtype])
+        return _SCALE.pack(scale) + quantized.tobytes()
+    return arr.astype(DTYPES[dtype]).tobytes()
+
+
+class PackedEmbedding(Sequence):
+    """Read-only embedding backed by packed bytes, decoded on first use.
+
+    Behaves like the List[float] it replaces (len, indexing, iteration,
+    np.asarray) but nodes whose embedding is never touched skip the decode.
+    """
+
+    __slots__ = ("raw", "dtype", "_array")
+
+    def __init__(self, raw: bytes, dtype: str = "f4"):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown embedding dtype: {dtype}")
+        self.raw = raw
+        self.dtype = dtype
+        self._array = None
+
+    @property
+    def array(self) -> np.ndarray:
+        """The embedding as a read-only float32 array."""
+        if self._array is None:
+            if self.dtype == "i8":
+                (scale,) = _SCALE.unpack_from(self.raw)
+                quantized = np.frombuffer(self.raw, dtype=DTYPES["i8"], offset=_SCALE.size)
+                self._array = quantized.astype(np.float32) * np.float32(scale)
+            else:
+                # Zero-copy view over the Redis reply for float32
+                self._array = np.frombuffer(self.raw, dtype=DTYPES[self.dtype]).astype(
+                    np.float32, copy=False
+                )
+        return self._array
+
+    def tolist(self) -> List[float]:
+        return self.array.tolist()
+
+    def __len__(self) -> int:
+        if self.dtype == "i8":
+            return len(self.raw) - _SCALE.size
+        return len(self.raw) // DTYPES[self.dtype].itemsize
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.array[index].tolist()
+        return float(self.array[index])
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self.array
+        return self.array.astype(dtype)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, PackedEmbedding):
+            return self.dtype == other.dtype and self.raw == other.raw
+        if isinstance(other, (list, tuple)):
+            return self.tolist() == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"PackedEmbedding(dtype={self.dtype!r}, dims={len(self)})"
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_serializer
 from typing import Optional, List, Dict
+from backend.core.packed_embedding import PackedEmbedding
 
 
 class Node(BaseModel):
@@ -16,6 +17,43 @@ class Node(BaseModel):
     prompt_tokens: Optional[int] = None
     completion_tokens: Optional[int] = None
     agent_cost: Optional[float] = None
+    eval_rung: Optional[int] = None  # Successive-halving rung the score comes from
+    eval_confidence: Optional[float] = None  # Share of the full evaluation behind the score
+    score_ci: Optional[List[float]] = None  # [low, high] confidence interval on the score
+
+    @field_serializer("emb")
+    def _serialize_emb(self, emb):
+        # Embeddings loaded from Redis are PackedEmbedding; dump them as plain lists
+        if isinstance(emb, PackedEmbedding):
+            return emb.tolist()
+        return emb
+
+
+class NodeSummary(BaseModel):
+    """Partial Node from a projected read; fields that were not requested stay None."""
+
+    id: str
+    system_prompt: Optional[str] = None
+    conversation_samples: Optional[List[Dict]] = None
+    score: Optional[float] = None
+    avg_score: Optional[float] = None
+    sample_count: Optional[int] = None
+    depth: Optional[int] = None
+    parent: Optional[str] = None
+    emb: Optional[List[float]] = None
+    xy: Optional[List[float]] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    agent_cost: Optional[float] = None
+    eval_rung: Optional[int] = None
+    eval_confidence: Optional[float] = None
+    score_ci: Optional[List[float]] = None
+
+    @field_serializer("emb")
+    def _serialize_emb(self, emb):
+        if isinstance(emb, PackedEmbedding):
+            return emb.tolist()
+        return emb
 
 
 class FocusZone(BaseModel):
@@ -37,4 +75,6 @@ class SettingsUpdate(BaseModel):
 
     lambda_trend: Optional[float] = None
     lambda_sim: Optional[float] = None
+    lambda_max_sim: Optional[float] = None
+    lambda_density: Optional[float] = None
     lambda_depth: Optional[float] = None
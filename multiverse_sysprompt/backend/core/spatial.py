@@ -0,0 +1,49 @@
+"""Uniform grid over node coordinates, and a vectorized point-in-polygon test.
+
+Every node's xy falls in one CELL x CELL square, numbered row by row so the
+cells of one grid row within an x range are a contiguous range of ids. The
+storage engines index nodes by cell id (a sorted set on Redis, an indexed
+column on SQLite), so a focus zone fetches only the nodes in the grid rows
+its bounding box spans, then filters them exactly with points_in_polygon.
+"""
+
+import math
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+CELL = 0.25  # UMAP layouts span tens of units; the fallback projection a few
+SPAN = 1 << 20  # cells per axis, centered on the origin; ids stay exact as zset scores
+
+
+def _column(v: float) -> int:
+    return min(max(math.floor(v / CELL) + SPAN // 2, 0), SPAN - 1)
+
+
+def cell_of(xy: Sequence[float]) -> int:
+    """Grid cell id of a point."""
+    return _column(xy[1]) * SPAN + _column(xy[0])
+
+
+def cell_ranges(polygon: Sequence[Sequence[float]]) -> List[Tuple[int, int]]:
+    """(first, last) cell ids of each grid row covering the polygon's bounding box."""
+    xs, ys = [p[0] for p in polygon], [p[1] for p in polygon]
+    left, right = _column(min(xs)), _column(max(xs))
+    return [(row * SPAN + left, row * SPAN + right) for row in range(_column(min(ys)), _column(max(ys)) + 1)]
+
+
+def points_in_polygon(points: np.ndarray, polygon: Sequence[Sequence[float]]) -> np.ndarray:
+    """Boolean mask of the (n, 2) points inside polygon (even-odd ray casting,
+    one vectorized pass per edge)."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    x, y = points[:, 0], points[:, 1]
+    inside = np.zeros(len(points), dtype=bool)
+    vertices = np.asarray(polygon, dtype=np.float64)
+    for (x1, y1), (x2, y2) in zip(vertices, np.roll(vertices, -1, axis=0), strict=True):
+        if y1 == y2:
+            continue
+        # Edges crossing the point's horizontal ray, to the right of the point
+        crosses = (y1 > y) != (y2 > y)
+        at_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= crosses & (x < at_x)
+    return inside
@@ -0,0 +1,200 @@
+"""Async twin of node_store for code running on an event loop.
+
+Same keys, encoding and save script as node_store, so the two can be used
+side by side; use this one from the worker and API so Redis round trips
+overlap with in-flight LLM calls instead of blocking the loop.
+"""
+
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence
+from backend.core.schemas import Node, NodeSummary
+from backend.db.redis_client import get_async_redis
+from backend.db.node_store import (
+    BATCH_SIZE,
+    CHILDREN_PREFIX,
+    DEPTH_INDEX_PREFIX,
+    NODE_PREFIX,
+    SAMPLES_PREFIX,
+    SCORE_INDEX,
+    STATS_KEY,
+    _DELETE_LUA,
+    _DERIVED_PREFIXES,
+    _SAVE_LUA,
+    _attach_samples,
+    _chunks,
+    _decode,
+    _decode_projection,
+    _delete_keys_args,
+    _decode_samples,
+    _parse_stats,
+    _projection,
+    _queue_index,
+    _queue_samples,
+    _save_keys_args,
+)
+
+
+async def _queue_save(pipe, node: Node) -> None:
+    """Queue the hash write, samples, stats and index updates for a node."""
+    keys, args = _save_keys_args(node)
+    script = get_async_redis().register_script(_SAVE_LUA)
+    await script(keys=keys, args=args, client=pipe)
+    _queue_samples(pipe, node)
+    _queue_index(pipe, node)
+
+
+async def save(node: Node) -> None:
+    # MULTI/EXEC so readers never see a node without its index entries
+    pipe = get_async_redis().pipeline()
+    await _queue_save(pipe, node)
+    await pipe.execute()
+
+
+async def save_many(nodes: Iterable[Node], batch_size: int = BATCH_SIZE) -> None:
+    """Save many nodes using one MULTI/EXEC round trip per batch."""
+    for chunk in _chunks(list(nodes), batch_size):
+        pipe = get_async_redis().pipeline()
+        for node in chunk:
+            await _queue_save(pipe, node)
+        await pipe.execute()
+
+
+async def delete_many(node_ids: Iterable[str], batch_size: int = BATCH_SIZE) -> int:
+    """Delete leaf nodes with their index entries, stats and samples blobs."""
+    r = get_async_redis()
+    script = r.register_script(_DELETE_LUA)
+    deleted = 0
+    for chunk in _chunks(list(node_ids), batch_size):
+        pipe = r.pipeline(transaction=False)
+        for node_id in chunk:
+            pipe.hmget(NODE_PREFIX + node_id, ["depth", "parent"])
+        found = [(node_id, depth, parent) for node_id, (depth, parent) in zip(chunk, await pipe.execute(), strict=True) if depth is not None]
+        if not found:
+            continue
+        pipe = r.pipeline()
+        for node_id, depth, parent in found:
+            keys, args = _delete_keys_args(node_id, depth, parent)
+            await script(keys=keys, args=args, client=pipe)
+            pipe.delete(CHILDREN_PREFIX + node_id, *[prefix + node_id for prefix in _DERIVED_PREFIXES])
+        deleted += sum((await pipe.execute())[::2])
+    return deleted
+
+
+async def get(
+    node_id: str, fields: Optional[Sequence[str]] = None, with_samples: bool = False
+) -> Node | NodeSummary | None:
+    """Load a node; with fields, HMGET just those into a NodeSummary.
+
+    Conversation samples are only loaded when with_samples is set.
+    """
+    pipe = get_async_redis(decode_responses=False).pipeline(transaction=False)
+    names = _projection(fields) if fields is not None else None
+    if names is None:
+        pipe.hgetall(NODE_PREFIX + node_id)
+    else:
+        pipe.hmget(NODE_PREFIX + node_id, names)
+    if with_samples:
+        pipe.get(SAMPLES_PREFIX + node_id)
+    results = await pipe.execute()
+    node = _decode(results[0]) if names is None else _decode_projection(names, results[0])
+    if node and with_samples:
+        _attach_samples(node, results[1])
+    return node
+
+
+async def load_samples(node_id: str) -> List[Dict]:
+    """Load just the conversation samples of a node."""
+    blob = await get_async_redis(decode_responses=False).get(SAMPLES_PREFIX + node_id)
+    return _decode_samples(blob) if blob is not None else []
+
+
+async def get_many(
+    node_ids: Iterable[str],
+    batch_size: int = BATCH_SIZE,
+    fields: Optional[Sequence[str]] = None,
+    with_samples: bool = False,
+) -> List[Node] | List[NodeSummary]:
+    """Fetch many nodes with pipelined HGETALLs, preserving input order.
+
+    With fields, each node is an HMGET of just those fields into a
+    NodeSummary; with_samples pipelines the samples blobs alongside. Ids
+    that no longer exist are skipped.
+    """
+    names = _projection(fields) if fields is not None else None
+    nodes = []
+    for chunk in _chunks(list(node_ids), batch_size):
+        pipe = get_async_redis(decode_responses=False).pipeline(transaction=False)
+        for node_id in chunk:
+            if names is None:
+                pipe.hgetall(NODE_PREFIX + node_id)
+            else:
+                pipe.hmget(NODE_PREFIX + node_id, names)
+            if with_samples:
+                pipe.get(SAMPLES_PREFIX + node_id)
+        results = await pipe.execute()
+        step = 2 if with_samples else 1
+        for i in range(0, len(results), step):
+            data = results[i]
+            node = _decode(data) if names is None else _decode_projection(names, data)
+            if node:
+                if with_samples:
+                    _attach_samples(node, results[i + 1])
+                nodes.append(node)
+    return nodes
+
+
+async def iter_node_ids(batch_size: int = BATCH_SIZE) -> AsyncIterator[str]:
+    """Stream every stored node id with a cursor-based SCAN."""
+    seen = set()  # SCAN may return a key more than once
+    async for key in get_async_redis().scan_iter(match=NODE_PREFIX + "*", count=batch_size):
+        if key in seen:
+            continue
+        seen.add(key)
+        yield key[len(NODE_PREFIX):]
+
+
+async def iter_nodes(
+    batch_size: int = BATCH_SIZE, fields: Optional[Sequence[str]] = None
+) -> AsyncIterator[Node] | AsyncIterator[NodeSummary]:
+    """Stream every stored node, fetching batch_size nodes per round trip."""
+    batch = []
+    async for node_id in iter_node_ids(batch_size):
+        batch.append(node_id)
+        if len(batch) >= batch_size:
+            for node in await get_many(batch, batch_size, fields):
+                yield node
+            batch = []
+    if batch:
+        for node in await get_many(batch, batch_size, fields):
+            yield node
+
+
+async def get_all_nodes() -> List[Node]:
+    """Get all nodes from Redis."""
+    return [node async for node in iter_nodes()]
+
+
+async def node_count() -> int:
+    """Total number of stored nodes, from the stats hash."""
+    return int(await get_async_redis().hget(STATS_KEY, "total") or 0)
+
+
+async def node_stats() -> dict:
+    """Node totals: {"total": int, "cost": float, "depths": {depth: count}}."""
+    return _parse_stats(await get_async_redis().hgetall(STATS_KEY))
+
+
+async def top_by_score(k: int, fields: Optional[Sequence[str]] = None) -> List[Node]:
+    """Get the k highest scoring nodes, best first."""
+    if k <= 0:
+        return []
+    return await get_many(await get_async_redis().zrevrange(SCORE_INDEX, 0, k - 1), fields=fields)
+
+
+async def nodes_at_depth(depth: int, fields: Optional[Sequence[str]] = None) -> List[Node]:
+    """Get every node at the given depth."""
+    return await get_many(await get_async_redis().smembers(DEPTH_INDEX_PREFIX + str(depth)), fields=fields)
+
+
+async def children_of(node_id: str, fields: Optional[Sequence[str]] = None) -> List[Node]:
+    """Get the direct children of a node."""
+    return await get_many(await get_async_redis().smembers(CHILDREN_PREFIX + node_id), fields=fields)
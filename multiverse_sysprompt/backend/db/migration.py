@@ -5,17 +5,20 @@ This migration transforms the old conversation turn optimization into system pro
 
 import asyncio
 import json
+from itertools import islice
 from typing import List, Dict, Optional
 from backend.db.redis_client import get_redis
-from backend.db.node_store import get, save
+from backend.db.node_store import BATCH_SIZE, SAMPLES_PREFIX, clear_indexes, get_many, iter_node_ids, node_count, save_many
 from backend.core.schemas import Node
 from backend.core.utils import uuid_str
-from backend.core.embeddings import embed, to_xy
+from backend.core.embeddings import embed_many, to_xy
 from backend.agents.system_prompt_mutator import generate_initial_system_prompts
 from backend.core.logger import get_logger
 
 logger = get_logger(__name__)
 
+CONVERSATION_FIELDS = ("prompt", "reply", "score", "depth")
+
 
 async def migrate_conversation_nodes_to_system_prompts():
     """
@@ -26,21 +29,26 @@ async def migrate_conversation_nodes_to_system_prompts():
     r = get_redis()
     
     # Get all existing nodes
-    node_keys = r.keys("node:*")
-    logger.info(f"Found {len(node_keys)} existing nodes to analyze")
+    node_ids = list(iter_node_ids())
+    logger.info(f"Found {len(node_ids)} existing nodes to analyze")
     
-    if len(node_keys) == 0:
+    if len(node_ids) == 0:
         logger.info("No existing nodes found. Seeding with initial system prompts.")
         await seed_initial_system_prompts()
         return
     
     # Analyze existing nodes to understand the conversation patterns
     conversation_nodes = []
-    for key in node_keys:
-        node_id = key.decode('utf-8').replace("node:", "") if isinstance(key, bytes) else key.replace("node:", "")
-        node_data = r.hgetall(f"node:{node_id}")
-        if node_data:
-            conversation_nodes.append((node_id, node_data))
+    for start in range(0, len(node_ids), BATCH_SIZE):
+        chunk = node_ids[start:start + BATCH_SIZE]
+        pipe = r.pipeline(transaction=False)
+        for node_id in chunk:
+            # Only the text fields; emb is stored as packed bytes
+            pipe.hmget(f"node:{node_id}", *CONVERSATION_FIELDS)
+        for node_id, values in zip(chunk, pipe.execute(), strict=True):
+            node_data = {k: v for k, v in zip(CONVERSATION_FIELDS, values, strict=True) if v is not None}
+            if node_data:
+                conversation_nodes.append((node_id, node_data))
     
     logger.info(f"Analyzing {len(conversation_nodes)} conversation nodes")
     
@@ -200,10 +208,13 @@ async def clear_old_data_and_migrate(system_prompts: List[str]):
     r = get_redis()
     
     # Clear all existing nodes
-    node_keys = r.keys("node:*")
-    if node_keys:
-        r.delete(*node_keys)
-        logger.info(f"Cleared {len(node_keys)} old conversation nodes")
+    node_ids = list(iter_node_ids())
+    for start in range(0, len(node_ids), BATCH_SIZE):
+        chunk = node_ids[start:start + BATCH_SIZE]
+        r.delete(*[f"node:{node_id}" for node_id in chunk], *[SAMPLES_PREFIX + node_id for node_id in chunk])
+    if node_ids:
+        logger.info(f"Cleared {len(node_ids)} old conversation nodes")
+    clear_indexes()
     
     # Clear frontier
     r.delete("frontier")
@@ -212,7 +223,11 @@ async def clear_old_data_and_migrate(system_prompts: List[str]):
     # Create new system prompt nodes
     from backend.db.frontier import push
     
-    for i, system_prompt in enumerate(system_prompts):
+    # One batched (and cached) embeddings call for every prompt
+    embeddings = embed_many(system_prompts)
+    
+    nodes = []
+    for system_prompt, emb in zip(system_prompts, embeddings, strict=True):
         node = Node(
             id=uuid_str(),
             system_prompt=system_prompt,
@@ -221,15 +236,18 @@ async def clear_old_data_and_migrate(system_prompts: List[str]):
             avg_score=0.5,
             sample_count=0,
             depth=0,  # All are root nodes initially
-            emb=embed(system_prompt),
-            xy=list(to_xy(embed(system_prompt))),
+            emb=emb,
+            xy=list(to_xy(emb)),
         )
-        
-        save(node)
-        push(node.id, 1.0 - (i * 0.1))  # Slightly different priorities
+        nodes.append(node)
         
         logger.info(f"Created system prompt node {node.id[:8]}... with prompt: '{system_prompt[:60]}...'")
     
+    # Save all nodes in one pipelined batch before making them poppable
+    save_many(nodes)
+    for i, node in enumerate(nodes):
+        push(node.id, 1.0 - (i * 0.1))  # Slightly different priorities
+    
     logger.info(f"Successfully migrated to {len(system_prompts)} system prompt nodes")
 
 
@@ -249,15 +267,13 @@ async def verify_migration():
     """
     logger.info("Verifying migration results")
     
-    r = get_redis()
-    node_keys = r.keys("node:*")
-    
-    logger.info(f"Found {len(node_keys)} nodes after migration")
+    logger.info(f"Found {node_count()} nodes after migration")
     
     # Check a few nodes to ensure they have the new schema
-    for i, key in enumerate(node_keys[:3]):
-        node_id = key.decode('utf-8').replace("node:", "") if isinstance(key, bytes) else key.replace("node:", "")
-        node = get(node_id)
+    sample_ids = list(islice(iter_node_ids(), 3))
+    nodes_by_id = {node.id: node for node in get_many(sample_ids)}
+    for i, node_id in enumerate(sample_ids):
+        node = nodes_by_id.get(node_id)
         
         if node:
             has_system_prompt = hasattr(node, 'system_prompt') and node.system_prompt
@@ -1,32 +1,161 @@
 import json
-from typing import List
-from backend.core.schemas import Node
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+from backend.core.schemas import Node, NodeSummary
+from backend.core.packed_embedding import PackedEmbedding, pack
+from backend.core.spatial import cell_of
+from backend.config.settings import settings
 from backend.db.redis_client import get_redis
+from backend.core.logger import get_logger
+
+logger = get_logger(__name__)
 
 r = get_redis()
+# Node hashes hold packed embedding bytes, so reads go through a binary client
+r_bin = get_redis(decode_responses=False)
+
 NODE_PREFIX = "node:"
+BATCH_SIZE = 500  # Commands per pipeline round trip
 
+# Secondary indexes, kept in step with the node hashes on every save
+SCORE_INDEX = "idx:score"  # zset: node id -> score
+DEPTH_INDEX_PREFIX = "idx:depth:"  # set per depth
+CHILDREN_PREFIX = "children:"  # set of child ids per parent
+ROOTS_INDEX = "idx:roots"  # hash: node id -> id of its root
+XY_INDEX = "idx:xy"  # zset: node id -> grid cell of its xy (see core.spatial)
+# Priority terms of queued nodes (see frontier), dropped along with the node
+TERMS_KEY = "frontier:terms"
 
-def save(node: Node) -> None:
+# Conversation samples live out of line as a zlib-compressed JSON blob, so
+# node reads (and get_all_nodes) never carry the full test conversations
+SAMPLES_PREFIX = "samples:"
+# Per-node keys deleted along with the node
+_DERIVED_PREFIXES = (SAMPLES_PREFIX,)
+
+# Running totals so status checks never have to scan the keyspace
+STATS_KEY = "stats:nodes"  # hash: total, depth:<d>, cost
+
+# Stream of node creations ("add" -> id) and deletions ("del" -> id), so
+# readers such as the embedding index catch up without scanning every node;
+# capped at about NODE_LOG_MAXLEN entries, a reader that falls further behind rescans
+NODE_LOG = "log:nodes"
+NODE_LOG_MAXLEN = 100_000
+
+# Write the node hash and bump the stats only for nodes that are new,
+# adding just the change in agent_cost when an existing node is re-saved.
+# The node inherits its parent's root (a parent missing from the index is
+# taken to be a root itself).
+# KEYS: node hash, stats hash, roots index, node log.
+# ARGV: depth, agent_cost ('' if unset), id, parent ('' if none), field/value pairs
+_SAVE_LUA = f"""
+local is_new = redis.call('EXISTS', KEYS[1]) == 0
+local old_cost = tonumber(redis.call('HGET', KEYS[1], 'agent_cost') or '0') or 0
+redis.call('HSET', KEYS[1], unpack(ARGV, 5))
+local root = ARGV[3]
+if ARGV[4] ~= '' then
+    root = redis.call('HGET', KEYS[3], ARGV[4]) or ARGV[4]
+end
+redis.call('HSET', KEYS[3], ARGV[3], root)
+if is_new then
+    redis.call('HINCRBY', KEYS[2], 'total', 1)
+    redis.call('HINCRBY', KEYS[2], 'depth:' .. ARGV[1], 1)
+    redis.call('XADD', KEYS[4], 'MAXLEN', '~', {NODE_LOG_MAXLEN}, '*', 'add', ARGV[3])
+end
+local new_cost = tonumber(ARGV[2])
+if new_cost and new_cost ~= old_cost then
+    redis.call('HINCRBYFLOAT', KEYS[2], 'cost', new_cost - old_cost)
+end
+return is_new and 1 or 0
+"""
+_save_script = r.register_script(_SAVE_LUA)
+
+# Remove a node hash and its index entries, undoing its stats contribution;
+# a node that is already gone is left alone so the stats never double count.
+# KEYS: node hash, stats hash, score index, roots index, depth set, xy index, frontier terms, node log[, parent's children set]
+# ARGV: id, depth
+_DELETE_LUA = f"""
+local cost = tonumber(redis.call('HGET', KEYS[1], 'agent_cost') or '0') or 0
+if redis.call('DEL', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HINCRBY', KEYS[2], 'total', -1)
+redis.call('HINCRBY', KEYS[2], 'depth:' .. ARGV[2], -1)
+if cost ~= 0 then
+    redis.call('HINCRBYFLOAT', KEYS[2], 'cost', -cost)
+end
+redis.call('ZREM', KEYS[3], ARGV[1])
+redis.call('HDEL', KEYS[4], ARGV[1])
+redis.call('SREM', KEYS[5], ARGV[1])
+redis.call('ZREM', KEYS[6], ARGV[1])
+redis.call('HDEL', KEYS[7], ARGV[1])
+redis.call('XADD', KEYS[8], 'MAXLEN', '~', {NODE_LOG_MAXLEN}, '*', 'del', ARGV[1])
+if KEYS[9] then
+    redis.call('SREM', KEYS[9], ARGV[1])
+end
+return 1
+"""
+_delete_script = r.register_script(_DELETE_LUA)
+
+
+def _chunks(items: List, size: int) -> Iterator[List]:
+    """Yield successive slices of at most size items."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _encode(node: Node) -> dict:
+    """Flatten a Node into a Redis hash mapping."""
     # Convert to dict and remove None values
-    data = {k: v for k, v in node.model_dump().items() if v is not None}
+    data = {
+        k: v
+        for k, v in node.model_dump(exclude={"emb", "conversation_samples"}).items()
+        if v is not None
+    }
     # Convert lists and complex objects to JSON strings for Redis
     for key, value in data.items():
         if isinstance(value, (list, dict)):
             data[key] = json.dumps(value)
-    r.hset(NODE_PREFIX + node.id, mapping=data)
+    data.update(_encode_emb(node.emb))
+    return data
 
 
-def get(node_id: str) -> Node | None:
-    data = r.hgetall(NODE_PREFIX + node_id)
+def _encode_emb(emb) -> dict:
+    """Store the embedding as packed bytes tagged with its dtype."""
+    if emb is None:
+        return {}
+    dtype = settings.emb_storage_dtype
+    if isinstance(emb, PackedEmbedding) and emb.dtype == dtype:
+        return {"emb": emb.raw, "emb_dtype": dtype}
+    return {"emb": pack(emb, dtype), "emb_dtype": dtype}
+
+
+def _encode_samples(samples: List[Dict]) -> bytes:
+    """Compress the retained conversation samples, best scoring first."""
+    kept = sorted(samples, key=lambda sample: sample.get("score") or 0.0, reverse=True)
+    if settings.samples_retention > 0:
+        kept = kept[: settings.samples_retention]
+    return zlib.compress(json.dumps(kept).encode())
+
+
+def _decode_samples(blob: bytes) -> List[Dict]:
+    return json.loads(zlib.decompress(blob))
+
+
+def _decode(data: dict, model=Node):
+    """Rebuild a Node (or NodeSummary) from a binary Redis hash, or None if empty."""
     if not data:
         return None
 
+    # Text fields are utf-8; the embedding stays as bytes until it is used
+    emb = data.pop(b"emb", None)
+    emb_dtype = data.pop(b"emb_dtype", None)
+    data = {k.decode(): v.decode() for k, v in data.items()}
+
     # Parse JSON fields back to lists
-    if "emb" in data and data["emb"]:
-        data["emb"] = json.loads(data["emb"])
     if "xy" in data and data["xy"]:
         data["xy"] = json.loads(data["xy"])
+    if "score_ci" in data and data["score_ci"]:
+        data["score_ci"] = json.loads(data["score_ci"])
     if "conversation_samples" in data and data["conversation_samples"]:
         data["conversation_samples"] = json.loads(data["conversation_samples"])
 
@@ -39,6 +168,10 @@ def get(node_id: str) -> Node | None:
         data["avg_score"] = float(data["avg_score"])
     if "sample_count" in data:
         data["sample_count"] = int(data["sample_count"])
+    if "eval_rung" in data:
+        data["eval_rung"] = int(data["eval_rung"])
+    if "eval_confidence" in data:
+        data["eval_confidence"] = float(data["eval_confidence"])
     
     # Convert numeric usage fields
     for key in ("prompt_tokens", "completion_tokens", "agent_cost"):
@@ -54,24 +187,311 @@ def get(node_id: str) -> Node | None:
             data["conversation_samples"] = []
         data.pop("reply", None)
 
-    return Node(**data)
+    node = model(**data)
+    if emb_dtype:
+        # Assigned after validation so the bytes are not unpacked eagerly
+        node.emb = PackedEmbedding(emb, emb_dtype.decode())
+    elif emb:
+        # Nodes written before packed storage hold a JSON float list
+        node.emb = json.loads(emb)
+    return node
 
 
-def get_all_nodes() -> List[Node]:
-    """Get all nodes from Redis."""
-    node_keys = r.keys(NODE_PREFIX + "*")
+def _projection(fields: Sequence[str]) -> List[str]:
+    """Hash fields to HMGET for a projected read; id always comes first."""
+    unknown = set(fields) - set(NodeSummary.model_fields)
+    if unknown:
+        raise ValueError(f"Unknown node fields: {sorted(unknown)}")
+    names = ["id"] + [field for field in fields if field != "id"]
+    if "emb" in names:
+        names.append("emb_dtype")
+    if "system_prompt" in names:
+        names.append("prompt")  # Nodes from before the system prompt migration
+    return names
+
+
+def _decode_projection(names: List[str], values: List) -> NodeSummary | None:
+    """Rebuild a NodeSummary from HMGET results, or None if the node is missing."""
+    if values[0] is None:
+        return None
+    data = {name.encode(): value for name, value in zip(names, values, strict=True) if value is not None}
+    return _decode(data, NodeSummary)
+
+
+def _queue_index(pipe, node: Node) -> None:
+    """Queue the secondary index updates for a node."""
+    if node.score is not None:
+        pipe.zadd(SCORE_INDEX, {node.id: node.score})
+    pipe.sadd(DEPTH_INDEX_PREFIX + str(node.depth), node.id)
+    if node.xy:
+        pipe.zadd(XY_INDEX, {node.id: cell_of(node.xy)})
+    if node.parent:
+        pipe.sadd(CHILDREN_PREFIX + node.parent, node.id)
+
+
+def _save_keys_args(node: Node) -> tuple:
+    """KEYS and ARGV for the save script."""
+    args = [node.depth, "" if node.agent_cost is None else node.agent_cost, node.id, node.parent or ""]
+    for field, value in _encode(node).items():
+        args.extend((field, value))
+    return [NODE_PREFIX + node.id, STATS_KEY, ROOTS_INDEX, NODE_LOG], args
+
+
+def _delete_keys_args(node_id: str, depth: str, parent: Optional[str]) -> tuple:
+    """KEYS and ARGV for the delete script."""
+    keys = [NODE_PREFIX + node_id, STATS_KEY, SCORE_INDEX, ROOTS_INDEX, DEPTH_INDEX_PREFIX + depth, XY_INDEX, TERMS_KEY, NODE_LOG]
+    if parent:
+        keys.append(CHILDREN_PREFIX + parent)
+    return keys, [node_id, depth]
+
+
+def _queue_delete(pipe, node_id: str, depth: str, parent: Optional[str]) -> None:
+    """Queue a node's removal with its index entries and derived keys."""
+    keys, args = _delete_keys_args(node_id, depth, parent)
+    _delete_script(keys=keys, args=args, client=pipe)
+    pipe.delete(CHILDREN_PREFIX + node_id, *[prefix + node_id for prefix in _DERIVED_PREFIXES])
+
+
+def _queue_samples(pipe, node: Node) -> None:
+    """Queue the samples blob write; nodes loaded without samples leave it alone."""
+    if node.conversation_samples:
+        pipe.set(SAMPLES_PREFIX + node.id, _encode_samples(node.conversation_samples))
+
+
+def _queue_save(pipe, node: Node) -> None:
+    """Queue the hash write, samples, stats and index updates for a node."""
+    keys, args = _save_keys_args(node)
+    _save_script(keys=keys, args=args, client=pipe)
+    _queue_samples(pipe, node)
+    _queue_index(pipe, node)
+
+
+def save(node: Node) -> None:
+    # MULTI/EXEC so readers never see a node without its index entries
+    pipe = r.pipeline()
+    _queue_save(pipe, node)
+    pipe.execute()
+
+
+def save_many(nodes: Iterable[Node], batch_size: int = BATCH_SIZE) -> None:
+    """Save many nodes using one MULTI/EXEC round trip per batch."""
+    for chunk in _chunks(list(nodes), batch_size):
+        pipe = r.pipeline()
+        for node in chunk:
+            _queue_save(pipe, node)
+        pipe.execute()
+
+
+def delete_many(node_ids: Iterable[str], batch_size: int = BATCH_SIZE) -> int:
+    """Delete nodes with their index entries, stats and samples blobs.
+
+    Children are not touched; callers only delete leaves. Returns the number
+    of nodes that existed and were deleted.
+    """
+    deleted = 0
+    for chunk in _chunks(list(node_ids), batch_size):
+        pipe = r.pipeline(transaction=False)
+        for node_id in chunk:
+            pipe.hmget(NODE_PREFIX + node_id, ["depth", "parent"])
+        found = [(node_id, depth, parent) for node_id, (depth, parent) in zip(chunk, pipe.execute(), strict=True) if depth is not None]
+        if not found:
+            continue
+        pipe = r.pipeline()
+        for node_id, depth, parent in found:
+            _queue_delete(pipe, node_id, depth, parent)
+        # Each delete is the script result followed by the DEL of its extra keys
+        deleted += sum(pipe.execute()[::2])
+    return deleted
+
+
+def get(
+    node_id: str, fields: Optional[Sequence[str]] = None, with_samples: bool = False
+) -> Node | NodeSummary | None:
+    """Load a node; with fields, HMGET just those into a NodeSummary.
+
+    Conversation samples are only loaded when with_samples is set.
+    """
+    pipe = r_bin.pipeline(transaction=False)
+    names = _projection(fields) if fields is not None else None
+    if names is None:
+        pipe.hgetall(NODE_PREFIX + node_id)
+    else:
+        pipe.hmget(NODE_PREFIX + node_id, names)
+    if with_samples:
+        pipe.get(SAMPLES_PREFIX + node_id)
+    results = pipe.execute()
+    node = _decode(results[0]) if names is None else _decode_projection(names, results[0])
+    if node and with_samples:
+        _attach_samples(node, results[1])
+    return node
+
+
+def _attach_samples(node, blob: bytes | None) -> None:
+    """Set conversation_samples from a blob, keeping inline samples of older nodes."""
+    if blob is not None:
+        node.conversation_samples = _decode_samples(blob)
+    elif node.conversation_samples is None:
+        node.conversation_samples = []
+
+
+def load_samples(node_id: str) -> List[Dict]:
+    """Load just the conversation samples of a node."""
+    blob = r_bin.get(SAMPLES_PREFIX + node_id)
+    return _decode_samples(blob) if blob is not None else []
+
+
+def get_many(
+    node_ids: Iterable[str],
+    batch_size: int = BATCH_SIZE,
+    fields: Optional[Sequence[str]] = None,
+    with_samples: bool = False,
+) -> List[Node] | List[NodeSummary]:
+    """Fetch many nodes with pipelined HGETALLs, preserving input order.
+
+    With fields, each node is an HMGET of just those fields into a
+    NodeSummary; with_samples pipelines the samples blobs alongside. Ids
+    that no longer exist are skipped.
+    """
+    names = _projection(fields) if fields is not None else None
     nodes = []
-    
-    for key in node_keys:
-        # Handle both bytes and string keys
-        if isinstance(key, bytes):
-            key_str = key.decode('utf-8')
-        else:
-            key_str = str(key)
-            
-        node_id = key_str.replace(NODE_PREFIX, "")
-        node = get(node_id)
-        if node:
-            nodes.append(node)
-    
+    for chunk in _chunks(list(node_ids), batch_size):
+        pipe = r_bin.pipeline(transaction=False)
+        for node_id in chunk:
+            if names is None:
+                pipe.hgetall(NODE_PREFIX + node_id)
+            else:
+                pipe.hmget(NODE_PREFIX + node_id, names)
+            if with_samples:
+                pipe.get(SAMPLES_PREFIX + node_id)
+        results = pipe.execute()
+        step = 2 if with_samples else 1
+        for i in range(0, len(results), step):
+            data = results[i]
+            node = _decode(data) if names is None else _decode_projection(names, data)
+            if node:
+                if with_samples:
+                    _attach_samples(node, results[i + 1])
+                nodes.append(node)
     return nodes
+
+
+def iter_node_ids(batch_size: int = BATCH_SIZE) -> Iterator[str]:
+    """Stream every stored node id with a cursor-based SCAN."""
+    seen = set()  # SCAN may return a key more than once
+    for key in r.scan_iter(match=NODE_PREFIX + "*", count=batch_size):
+        if key in seen:
+            continue
+        seen.add(key)
+        yield key[len(NODE_PREFIX):]
+
+
+def iter_nodes(
+    batch_size: int = BATCH_SIZE,
+    fields: Optional[Sequence[str]] = None,
+    with_samples: bool = False,
+) -> Iterator[Node] | Iterator[NodeSummary]:
+    """Stream every stored node, fetching batch_size nodes per round trip."""
+    batch = []
+    for node_id in iter_node_ids(batch_size):
+        batch.append(node_id)
+        if len(batch) >= batch_size:
+            yield from get_many(batch, batch_size, fields, with_samples)
+            batch = []
+    if batch:
+        yield from get_many(batch, batch_size, fields, with_samples)
+
+
+def get_all_nodes() -> List[Node]:
+    """Get all nodes from Redis."""
+    return list(iter_nodes())
+
+
+def node_count() -> int:
+    """Total number of stored nodes, from the stats hash."""
+    return int(r.hget(STATS_KEY, "total") or 0)
+
+
+def node_stats() -> dict:
+    """Node totals: {"total": int, "cost": float, "depths": {depth: count}}."""
+    return _parse_stats(r.hgetall(STATS_KEY))
+
+
+def _parse_stats(raw: dict) -> dict:
+    depths = {
+        int(field[len("depth:"):]): int(value)
+        for field, value in raw.items()
+        if field.startswith("depth:")
+    }
+    return {
+        "total": int(raw.get("total", 0)),
+        "cost": float(raw.get("cost", 0.0)),
+        "depths": dict(sorted(depths.items())),
+    }
+
+
+def top_by_score(k: int, fields: Optional[Sequence[str]] = None) -> List[Node]:
+    """Get the k highest scoring nodes, best first."""
+    if k <= 0:
+        return []
+    return get_many(r.zrevrange(SCORE_INDEX, 0, k - 1), fields=fields)
+
+
+def nodes_at_depth(depth: int, fields: Optional[Sequence[str]] = None) -> List[Node]:
+    """Get every node at the given depth."""
+    return get_many(r.smembers(DEPTH_INDEX_PREFIX + str(depth)), fields=fields)
+
+
+def children_of(node_id: str, fields: Optional[Sequence[str]] = None) -> List[Node]:
+    """Get the direct children of a node."""
+    return get_many(r.smembers(CHILDREN_PREFIX + node_id), fields=fields)
+
+
+def clear_indexes() -> None:
+    """Drop all secondary index keys and the node stats."""
+    keys = [SCORE_INDEX, STATS_KEY, ROOTS_INDEX, XY_INDEX]
+    for prefix in (DEPTH_INDEX_PREFIX, CHILDREN_PREFIX):
+        keys.extend(r.scan_iter(match=prefix + "*", count=BATCH_SIZE))
+    for chunk in _chunks(keys, BATCH_SIZE):
+        r.delete(*chunk)
+
+
+def rebuild_indexes(batch_size: int = BATCH_SIZE) -> int:
+    """Recreate the secondary indexes and node stats from the stored nodes.
+
+    Needed once for data written before the indexes existed.
+    Returns the number of nodes indexed.
+    """
+    clear_indexes()
+    stats = {"total": 0, "cost": 0.0}
+    parents = {}
+    pipe = r.pipeline(transaction=False)
+    for node in iter_nodes(batch_size):
+        _queue_index(pipe, node)
+        parents[node.id] = node.parent
+        stats["total"] += 1
+        depth_field = f"depth:{node.depth}"
+        stats[depth_field] = stats.get(depth_field, 0) + 1
+        stats["cost"] += node.agent_cost or 0.0
+        if stats["total"] % batch_size == 0:
+            pipe.execute()
+    pipe.hset(STATS_KEY, mapping=stats)
+    pipe.execute()
+    for chunk in _chunks(list(parents), batch_size):
+        r.hset(ROOTS_INDEX, mapping={node_id: _root_of(node_id, parents) for node_id in chunk})
+    return stats["total"]
+
+
+def _root_of(node_id: str, parents: dict) -> str:
+    """Walk the parent map up to the first node without a stored parent."""
+    while parents.get(node_id) in parents:
+        node_id = parents[node_id]
+    return parents.get(node_id) or node_id
+
+
+def ensure_indexes() -> None:
+    """Build the indexes if nodes exist but were saved before indexing."""
+    if r.exists(DEPTH_INDEX_PREFIX + "0"):
+        return
+    count = rebuild_indexes()
+    if count:
+        logger.info(f"Rebuilt secondary indexes for {count} nodes")
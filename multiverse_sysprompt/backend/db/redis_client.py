@@ -1,6 +1,31 @@
+import asyncio
+import weakref
 import redis
+import redis.asyncio as aioredis
 from backend.config.settings import settings
 
+# One connection pool per (url, decode_responses); clients are cheap wrappers
+_pools: dict = {}
+# Async pools are bound to the event loop that created their connections
+_async_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
 
-def get_redis():
-    return redis.Redis.from_url(settings.redis_url, decode_responses=True)
+
+def get_redis(decode_responses: bool = True) -> redis.Redis:
+    """Sync client backed by the process-wide connection pool."""
+    key = (settings.redis_url, decode_responses)
+    pool = _pools.get(key)
+    if pool is None:
+        pool = redis.ConnectionPool.from_url(settings.redis_url, decode_responses=decode_responses)
+        _pools[key] = pool
+    return redis.Redis(connection_pool=pool)
+
+
+def get_async_redis(decode_responses: bool = True) -> aioredis.Redis:
+    """Async client backed by the running event loop's connection pool."""
+    pools = _async_pools.setdefault(asyncio.get_running_loop(), {})
+    key = (settings.redis_url, decode_responses)
+    pool = pools.get(key)
+    if pool is None:
+        pool = aioredis.ConnectionPool.from_url(settings.redis_url, decode_responses=decode_responses)
+        pools[key] = pool
+    return aioredis.Redis(connection_pool=pool)
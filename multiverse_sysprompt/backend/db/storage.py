@@ -0,0 +1,655 @@
+"""Storage interface for the worker hot path: nodes, frontier, counters, pub/sub.
+
+RedisStorage wraps the existing async Redis modules; SQLiteStorage (see
+sqlite_storage) is an embedded engine for single-host runs and CI without a
+Redis server. Pick one with settings.storage_backend.
+"""
+
+import gzip
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from redis.exceptions import WatchError
+from backend.config.settings import settings
+from backend.core.schemas import Node, NodeSummary
+from backend.core.spatial import cell_of, cell_ranges, points_in_polygon
+from backend.db import async_frontier, async_node_store
+from backend.db.frontier import CONSUMER_ID, FRONTIER_KEY, TERMS_KEY, encode_terms
+from backend.db.node_store import BATCH_SIZE, CHILDREN_PREFIX, NODE_LOG, NODE_PREFIX, XY_INDEX, _chunks, ensure_indexes
+from backend.db.redis_client import get_async_redis
+
+BACKENDS = ("redis", "sqlite")
+PRUNE_ACTIONS = ("keep", "delete", "archive")
+
+# Current 2-D layout (see core.layout) and named locks, on Redis
+LAYOUT_VERSION_KEY = "layout:version"
+LAYOUT_REDUCER_KEY = "layout:reducer"
+LOCK_PREFIX = "lock:"
+
+# Versioned shared state (e.g. the incremental projector, see core.embeddings),
+# one hash per name: version, data
+STATE_PREFIX = "state:"
+
+# Runtime settings overrides shared by every process (see orchestrator.weights)
+SETTINGS_KEY = "settings:overrides"
+
+# Counters kept per node (the selection policies' tree statistics, see
+# orchestrator.policies), named prefix + node id and deleted with the node
+VISITS_PREFIX = "policy:visits:"  # child scores backed up through the node
+VALUE_PREFIX = "policy:value:"    # their sum
+NODE_COUNTER_PREFIXES = (VISITS_PREFIX, VALUE_PREFIX)
+
+# Delete a lock only while it still holds this owner's id, so a holder whose
+# lock expired cannot release the next holder's. KEYS: lock. ARGV: owner
+_UNLOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Set xy (and its grid cell in the xy index) on the nodes that still exist,
+# so a node deleted meanwhile is not recreated as a bare hash.
+# KEYS: xy index, node hashes. ARGV: id, xy, cell per node
+_SET_XY_LUA = """
+for i = 2, #KEYS do
+  if redis.call('EXISTS', KEYS[i]) == 1 then
+    local j = (i - 2) * 3
+    redis.call('HSET', KEYS[i], 'xy', ARGV[j + 2])
+    redis.call('ZADD', KEYS[1], ARGV[j + 3], ARGV[j + 1])
+  end
+end
+"""
+
+# Node fields stored outside the node hash that an archive must still carry
+_OUT_OF_LINE = {"with_samples": True} if "conversation_samples" in Node.model_fields else {}
+
+
+def _paths(parents: Dict[str, Optional[str]], node_ids: Iterable[str]) -> Dict[str, List[str]]:
+    """Root-to-node id paths from a parent map; a missing ancestor cuts the path."""
+    paths: Dict[str, List[str]] = {}
+    for node_id in node_ids:
+        chain, current = [], node_id
+        while current in parents and current not in paths:
+            chain.append(current)
+            current = parents[current]
+        prefix = paths.get(current, [])
+        for nid in reversed(chain):
+            prefix = paths[nid] = prefix + [nid]
+    return {node_id: paths[node_id] for node_id in node_ids if node_id in paths}
+
+
+def _stream_id(entry_id: str) -> Tuple[int, int]:
+    millis, seq = entry_id.split("-")
+    return int(millis), int(seq)
+
+
+def _archive(nodes: List[Node], path: str) -> None:
+    """Append nodes as JSON lines to a gzip file (concatenated members stay readable)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with gzip.open(path, "at", encoding="utf-8") as f:
+        for node in nodes:
+            f.write(node.model_dump_json() + "\n")
+
+
+class Storage(ABC):
+    """Everything a worker expansion touches, behind one async interface."""
+
+    # Nodes
+
+    @abstractmethod
+    async def save(self, node: Node) -> None: ...
+
+    @abstractmethod
+    async def save_many(self, nodes: Iterable[Node]) -> None: ...
+
+    @abstractmethod
+    async def get(self, node_id: str, fields: Optional[Sequence[str]] = None) -> Node | NodeSummary | None: ...
+
+    @abstractmethod
+    async def get_many(
+        self, node_ids: Iterable[str], fields: Optional[Sequence[str]] = None
+    ) -> List[Node] | List[NodeSummary]: ...
+
+    @abstractmethod
+    def iter_nodes(self, fields: Optional[Sequence[str]] = None) -> AsyncIterator[Node] | AsyncIterator[NodeSummary]: ...
+
+    @abstractmethod
+    async def top_by_score(self, k: int, fields: Optional[Sequence[str]] = None) -> List[Node]: ...
+
+    @abstractmethod
+    async def get_path(self, node_id: str, fields: Optional[Sequence[str]] = None) -> List[NodeSummary]:
+        """Nodes from the root down to node_id, root first."""
+
+    async def ancestor_ids(self, node_ids: Iterable[str]) -> Dict[str, List[str]]:
+        """Root-to-node id path of each existing node among node_ids."""
+        paths = {}
+        for node_id in dict.fromkeys(node_ids):
+            path = await self.get_path(node_id, fields=["parent"])
+            if path:
+                paths[node_id] = [node.id for node in path]
+        return paths
+
+    @abstractmethod
+    async def delete_many(self, node_ids: Iterable[str]) -> int:
+        """Delete nodes (callers pass leaves) and their per-node counters; returns how many existed."""
+
+    @abstractmethod
+    async def leaves(self, node_ids: Iterable[str]) -> List[str]:
+        """The given nodes that exist and have no children."""
+
+    async def load_full(self, node_ids: Iterable[str]) -> List[Node]:
+        """Complete nodes, including anything stored out of line."""
+        return await self.get_many(node_ids)
+
+    @abstractmethod
+    async def nodes_in_polygon(self, polygon: Sequence[Sequence[float]]) -> List[str]:
+        """Ids of the nodes whose xy lies inside polygon, via the grid index (see core.spatial)."""
+
+    @abstractmethod
+    async def roots(self, node_ids: Iterable[str]) -> Dict[str, str]:
+        """Root id of each existing node among node_ids (a root maps to itself)."""
+
+    @abstractmethod
+    async def node_count(self) -> int: ...
+
+    @abstractmethod
+    async def node_log_cursor(self) -> str:
+        """Position of the latest node creation or deletion, to pass to node_changes."""
+
+    @abstractmethod
+    async def node_changes(self, cursor: str) -> Optional[Tuple[str, List[str], List[str]]]:
+        """(new cursor, created ids, deleted ids) since cursor, oldest first; None if
+        the log has been trimmed past cursor and the caller has to rescan."""
+
+    @abstractmethod
+    async def ensure_indexes(self) -> None:
+        """Index nodes saved before the secondary indexes existed (embedded engines index on write)."""
+
+    @abstractmethod
+    async def node_stats(self) -> dict:
+        """Node totals: {"total": int, "cost": float, "depths": {depth: count}}."""
+
+    # Frontier (leased claims, see frontier.claim_batch)
+
+    @abstractmethod
+    async def push(self, node_id: str, priority: float, terms: Optional[Sequence[float]] = None) -> None:
+        """Queue a node; with its priority terms, reweigh_frontier can re-score it later."""
+
+    @abstractmethod
+    async def claim_batch(self, count: int, lease_seconds: float | None = None) -> List[str]: ...
+
+    @abstractmethod
+    async def frontier_top(self, count: int) -> List[Tuple[str, float]]:
+        """The count highest priority queued nodes as (id, priority), without claiming them."""
+
+    @abstractmethod
+    async def claim(self, node_ids: Iterable[str], lease_seconds: float | None = None) -> List[str]:
+        """Lease the given nodes that are still queued (see orchestrator.policies); returns those leased."""
+
+    @abstractmethod
+    async def ack(self, node_ids: Iterable[str]) -> int: ...
+
+    @abstractmethod
+    async def nack(self, node_ids: Iterable[str]) -> int: ...
+
+    @abstractmethod
+    async def fail(self, node_ids: Iterable[str], retry: bool = True) -> List[str]:
+        """Re-queue claimed nodes whose expansion failed until they run out of
+        settings.frontier_max_attempts (at once without retry), then dead-letter
+        them; returns the dead-lettered ids."""
+
+    @abstractmethod
+    async def dead_letters(self) -> List[str]:
+        """Dead-lettered nodes, highest priority first."""
+
+    @abstractmethod
+    async def extend_leases(self, node_ids: Iterable[str], lease_seconds: float | None = None) -> int: ...
+
+    @abstractmethod
+    async def requeue_expired(self) -> List[str]: ...
+
+    @abstractmethod
+    async def frontier_size(self) -> int: ...
+
+    @abstractmethod
+    async def inflight_size(self) -> int: ...
+
+    @abstractmethod
+    async def boost(self, node_ids: Iterable[str], factor: float) -> int:
+        """Multiply the priorities of the queued nodes among node_ids; returns how many."""
+
+    @abstractmethod
+    async def reweigh_frontier(self, weights: Sequence[float]) -> int:
+        """Recompute the priority of every queued or claimed node pushed with terms as
+        its boost factor times the dot product of terms and weights; returns how many."""
+
+    @abstractmethod
+    async def trim_frontier(self, max_size: int | None = None) -> List[str]:
+        """Evict the lowest-priority tail beyond max_size; returns evicted ids."""
+
+    @abstractmethod
+    async def enforce_quotas(self, depth_quota: int | None = None, root_quota: int | None = None) -> List[str]:
+        """Evict the lowest-priority nodes beyond the per-depth/per-root quotas."""
+
+    async def prune_frontier(self) -> Dict[str, int]:
+        """Apply the frontier bounds, then handle evicted leaves per settings.frontier_prune_action.
+
+        Evicted nodes that already have children stay in the graph either
+        way. Archived leaves are written out before they are deleted.
+        """
+        action = settings.frontier_prune_action
+        if action not in PRUNE_ACTIONS:
+            raise ValueError(f"Unknown frontier prune action: {action}")
+        evicted = await self.enforce_quotas() + await self.trim_frontier()
+        removed = 0
+        if evicted and action != "keep":
+            leaves = await self.leaves(evicted)
+            if action == "archive" and leaves:
+                _archive(await self.load_full(leaves), settings.frontier_archive_path)
+            removed = await self.delete_many(leaves)
+        return {"evicted": len(evicted), "removed": removed}
+
+    # Counters
+
+    @abstractmethod
+    async def incr_counters(self, amounts: Dict[str, float]) -> Dict[str, float]:
+        """Add to named float counters; returns their new values."""
+
+    @abstractmethod
+    async def get_counter(self, name: str) -> float: ...
+
+    @abstractmethod
+    async def get_counters(self, names: Iterable[str]) -> Dict[str, float]:
+        """Several counters in one call; missing ones read 0.0."""
+
+    # Caches of derived data (see core.conversation)
+
+    @abstractmethod
+    async def cache(self, entries: Dict[str, str], ttl: Optional[int] = None) -> None:
+        """Set cache keys, expiring after ttl seconds; embedded engines need no caches and drop them."""
+
+    # Pub/sub
+
+    @abstractmethod
+    async def publish(self, channel: str, message: str) -> None: ...
+
+    @abstractmethod
+    def subscribe(self, channel: str) -> AsyncIterator[str]:
+        """Yield messages published to channel from now on."""
+
+    # Settings overrides (see orchestrator.weights)
+
+    @abstractmethod
+    async def save_settings(self, values: Dict[str, float], channel: str, message: str) -> None:
+        """Store settings overrides and publish message, in one transaction."""
+
+    @abstractmethod
+    async def load_settings(self) -> Dict[str, float]: ...
+
+    # Layouts (see core.layout)
+
+    @abstractmethod
+    async def layout_version(self) -> int:
+        """Version of the current layout, 0 before the first one."""
+
+    @abstractmethod
+    async def load_layout(self) -> Tuple[int, Optional[bytes]]:
+        """The current layout version and its pickled reducer."""
+
+    @abstractmethod
+    async def save_layout(
+        self, version: int, reducer: bytes, xy: Dict[str, List[float]], channel: str, message: str
+    ) -> bool:
+        """Make version current with its reducer, set each node's xy and publish message,
+        in one transaction; False (and nothing written) unless version follows the current one."""
+
+    # Versioned state shared by every process
+
+    @abstractmethod
+    async def state_version(self, name: str) -> int:
+        """Version of the named state, 0 before it is first saved."""
+
+    @abstractmethod
+    async def load_state(self, name: str) -> Tuple[int, Optional[bytes]]:
+        """The named state's version and data."""
+
+    @abstractmethod
+    async def save_state(self, name: str, version: int, data: bytes) -> bool:
+        """Store data as the given version of the named state; False (and nothing
+        written) unless version follows the stored one."""
+
+    # Locks
+
+    @abstractmethod
+    async def try_lock(self, name: str, seconds: float) -> bool:
+        """Take a named lock for up to seconds; False if another holder has it."""
+
+    @abstractmethod
+    async def unlock(self, name: str) -> bool:
+        """Release a lock this process holds; False if it expired and is not ours any more."""
+
+    # Batched writes (see write_buffer)
+
+    @abstractmethod
+    async def write_batch(
+        self,
+        nodes: List[Node],
+        pushes: Dict[str, float],
+        counters: Dict[str, float],
+        messages: List[Tuple[str, str]],
+        terms: Optional[Dict[str, Sequence[float]]] = None,
+        caches: Optional[Dict[str, Tuple[str, Optional[int]]]] = None,
+    ) -> Dict[str, float]:
+        """Save nodes, push frontier entries (with the priority terms of those in terms),
+        set caches ({key: (value, ttl)}), bump counters and publish (channel, message)
+        pairs in one transaction, messages last; returns the new counter values."""
+
+
+class RedisStorage(Storage):
+    """The shared Redis deployment, via async_node_store and async_frontier."""
+
+    async def save(self, node):
+        await async_node_store.save(node)
+
+    async def save_many(self, nodes):
+        await async_node_store.save_many(nodes)
+
+    async def get(self, node_id, fields=None):
+        return await async_node_store.get(node_id, fields=fields)
+
+    async def get_many(self, node_ids, fields=None):
+        return await async_node_store.get_many(node_ids, fields=fields)
+
+    async def iter_nodes(self, fields=None):
+        async for node in async_node_store.iter_nodes(fields=fields):
+            yield node
+
+    async def top_by_score(self, k, fields=None):
+        return await async_node_store.top_by_score(k, fields=fields)
+
+    async def get_path(self, node_id, fields=None):
+        names = list(NodeSummary.model_fields) if fields is None else ["parent", *fields]
+        path = []
+        node = await async_node_store.get(node_id, fields=names)
+        while node:
+            path.append(node)
+            node = await async_node_store.get(node.parent, fields=names) if node.parent else None
+        return list(reversed(path))
+
+    async def ancestor_ids(self, node_ids):
+        # One pipelined parent lookup per tree level for the whole batch
+        node_ids = list(dict.fromkeys(node_ids))
+        parents: Dict[str, Optional[str]] = {}
+        seen, level = set(node_ids), node_ids
+        while level:
+            pipe = get_async_redis().pipeline(transaction=False)
+            for node_id in level:
+                pipe.hmget(NODE_PREFIX + node_id, ["id", "parent"])
+            next_level = []
+            for node_id, (found, parent) in zip(level, await pipe.execute(), strict=True):
+                if found is None:
+                    continue
+                parents[node_id] = parent
+                if parent and parent not in seen:
+                    seen.add(parent)
+                    next_level.append(parent)
+            level = next_level
+        return _paths(parents, node_ids)
+
+    async def delete_many(self, node_ids):
+        node_ids = list(node_ids)
+        deleted = await async_node_store.delete_many(node_ids)
+        for chunk in _chunks(node_ids, BATCH_SIZE):
+            await get_async_redis().delete(*[prefix + node_id for node_id in chunk for prefix in NODE_COUNTER_PREFIXES])
+        return deleted
+
+    async def leaves(self, node_ids):
+        leaves = []
+        for chunk in _chunks(list(node_ids), BATCH_SIZE):
+            pipe = get_async_redis().pipeline(transaction=False)
+            for node_id in chunk:
+                pipe.exists(NODE_PREFIX + node_id)
+                pipe.scard(CHILDREN_PREFIX + node_id)
+            results = await pipe.execute()
+            leaves.extend(
+                node_id for node_id, exists, children in zip(chunk, results[::2], results[1::2], strict=True) if exists and not children
+            )
+        return leaves
+
+    async def load_full(self, node_ids):
+        return await async_node_store.get_many(node_ids, **_OUT_OF_LINE)
+
+    async def nodes_in_polygon(self, polygon):
+        # Candidates from the grid rows the bounding box spans, then an exact test
+        pipe = get_async_redis().pipeline(transaction=False)
+        for first, last in cell_ranges(polygon):
+            pipe.zrangebyscore(XY_INDEX, first, last)
+        candidates = [node_id for row in await pipe.execute() for node_id in row]
+        nodes = [node for node in await async_node_store.get_many(candidates, fields=["xy"]) if node.xy]
+        if not nodes:
+            return []
+        inside = points_in_polygon(np.array([node.xy for node in nodes]), polygon)
+        return [node.id for node, hit in zip(nodes, inside, strict=True) if hit]
+
+    async def roots(self, node_ids):
+        return await async_frontier.roots(node_ids)
+
+    async def node_count(self):
+        return await async_node_store.node_count()
+
+    async def ensure_indexes(self):
+        ensure_indexes()
+
+    async def node_log_cursor(self):
+        latest = await get_async_redis().xrevrange(NODE_LOG, count=1)
+        return latest[0][0] if latest else "0-0"
+
+    async def node_changes(self, cursor):
+        pipe = get_async_redis().pipeline(transaction=False)
+        pipe.xrange(NODE_LOG, count=1)
+        pipe.xrange(NODE_LOG, min="(" + cursor)
+        oldest, entries = await pipe.execute()
+        if oldest and cursor != "0-0" and _stream_id(oldest[0][0]) > _stream_id(cursor):
+            return None  # trimmed past the cursor
+        added = [fields["add"] for _, fields in entries if "add" in fields]
+        removed = [fields["del"] for _, fields in entries if "del" in fields]
+        return (entries[-1][0] if entries else cursor), added, removed
+
+    async def node_stats(self):
+        return await async_node_store.node_stats()
+
+    async def push(self, node_id, priority, terms=None):
+        await async_frontier.push(node_id, priority, terms)
+
+    async def claim_batch(self, count, lease_seconds=None):
+        return await async_frontier.claim_batch(count, lease_seconds)
+
+    async def frontier_top(self, count):
+        return await async_frontier.top(count)
+
+    async def claim(self, node_ids, lease_seconds=None):
+        return await async_frontier.claim(node_ids, lease_seconds)
+
+    async def ack(self, node_ids):
+        return await async_frontier.ack(node_ids)
+
+    async def nack(self, node_ids):
+        return await async_frontier.nack(node_ids)
+
+    async def fail(self, node_ids, retry=True):
+        return await async_frontier.fail(node_ids, retry)
+
+    async def dead_letters(self):
+        return await async_frontier.dead_letters()
+
+    async def extend_leases(self, node_ids, lease_seconds=None):
+        return await async_frontier.extend_leases(node_ids, lease_seconds)
+
+    async def requeue_expired(self):
+        return await async_frontier.requeue_expired()
+
+    async def frontier_size(self):
+        return await async_frontier.size()
+
+    async def inflight_size(self):
+        return await async_frontier.inflight_size()
+
+    async def boost(self, node_ids, factor):
+        return await async_frontier.boost(node_ids, factor)
+
+    async def reweigh_frontier(self, weights):
+        return await async_frontier.reweigh(weights)
+
+    async def trim_frontier(self, max_size=None):
+        return await async_frontier.trim(max_size)
+
+    async def enforce_quotas(self, depth_quota=None, root_quota=None):
+        return await async_frontier.enforce_quotas(depth_quota, root_quota)
+
+    async def incr_counters(self, amounts):
+        # One round trip; INCRBYFLOAT returns each new total
+        pipe = get_async_redis().pipeline(transaction=False)
+        for name, amount in amounts.items():
+            pipe.incrbyfloat(name, amount)
+        return {name: float(value) for name, value in zip(amounts, await pipe.execute(), strict=True)}
+
+    async def get_counter(self, name):
+        return float(await get_async_redis().get(name) or 0.0)
+
+    async def get_counters(self, names):
+        names = list(dict.fromkeys(names))
+        if not names:
+            return {}
+        return {name: float(value or 0.0) for name, value in zip(names, await get_async_redis().mget(names), strict=True)}
+
+    async def cache(self, entries, ttl=None):
+        pipe = get_async_redis().pipeline(transaction=False)
+        for key, value in entries.items():
+            pipe.set(key, value, ex=ttl)
+        await pipe.execute()
+
+    async def publish(self, channel, message):
+        await get_async_redis().publish(channel, message)
+
+    async def subscribe(self, channel):
+        pubsub = get_async_redis().pubsub()
+        await pubsub.subscribe(channel)
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    yield message["data"]
+        finally:
+            await pubsub.unsubscribe(channel)
+            await pubsub.aclose()
+
+    async def save_settings(self, values, channel, message):
+        pipe = get_async_redis().pipeline()
+        pipe.hset(SETTINGS_KEY, mapping=values)
+        pipe.publish(channel, message)
+        await pipe.execute()
+
+    async def load_settings(self):
+        return {name: float(value) for name, value in (await get_async_redis().hgetall(SETTINGS_KEY)).items()}
+
+    async def layout_version(self):
+        return int(await get_async_redis().get(LAYOUT_VERSION_KEY) or 0)
+
+    async def load_layout(self):
+        pipe = get_async_redis(decode_responses=False).pipeline()
+        pipe.get(LAYOUT_VERSION_KEY)
+        pipe.get(LAYOUT_REDUCER_KEY)
+        version, reducer = await pipe.execute()
+        return int(version or 0), reducer
+
+    async def save_layout(self, version, reducer, xy, channel, message):
+        r = get_async_redis()
+        set_xy = r.register_script(_SET_XY_LUA)
+        async with r.pipeline() as pipe:
+            # WATCH makes the version check and the writes one compare-and-set
+            await pipe.watch(LAYOUT_VERSION_KEY)
+            if int(await pipe.get(LAYOUT_VERSION_KEY) or 0) != version - 1:
+                return False
+            pipe.multi()
+            pipe.set(LAYOUT_REDUCER_KEY, reducer)
+            pipe.set(LAYOUT_VERSION_KEY, version)
+            for chunk in _chunks(list(xy.items()), BATCH_SIZE):
+                await set_xy(
+                    keys=[XY_INDEX, *[NODE_PREFIX + node_id for node_id, _ in chunk]],
+                    args=[arg for node_id, coords in chunk for arg in (node_id, json.dumps(coords), cell_of(coords))],
+                    client=pipe,
+                )
+            pipe.publish(channel, message)
+            try:
+                await pipe.execute()
+            except WatchError:
+                return False
+        return True
+
+    async def state_version(self, name):
+        return int(await get_async_redis().hget(STATE_PREFIX + name, "version") or 0)
+
+    async def load_state(self, name):
+        version, data = await get_async_redis(decode_responses=False).hmget(STATE_PREFIX + name, ["version", "data"])
+        return int(version or 0), data
+
+    async def save_state(self, name, version, data):
+        async with get_async_redis(decode_responses=False).pipeline() as pipe:
+            # WATCH makes the version check and the write one compare-and-set
+            await pipe.watch(STATE_PREFIX + name)
+            if int(await pipe.hget(STATE_PREFIX + name, "version") or 0) != version - 1:
+                return False
+            pipe.multi()
+            pipe.hset(STATE_PREFIX + name, mapping={"version": version, "data": data})
+            try:
+                await pipe.execute()
+            except WatchError:
+                return False
+        return True
+
+    async def try_lock(self, name, seconds):
+        return bool(await get_async_redis().set(LOCK_PREFIX + name, CONSUMER_ID, nx=True, px=int(seconds * 1000)))
+
+    async def unlock(self, name):
+        script = get_async_redis().register_script(_UNLOCK_LUA)
+        return bool(await script(keys=[LOCK_PREFIX + name], args=[CONSUMER_ID]))
+
+    async def write_batch(self, nodes, pushes, counters, messages, terms=None, caches=None):
+        pipe = get_async_redis().pipeline()
+        for node in nodes:
+            await async_node_store._queue_save(pipe, node)
+        if pushes:
+            pipe.zadd(FRONTIER_KEY, pushes)
+        if terms:
+            pipe.hset(TERMS_KEY, mapping={node_id: encode_terms(values) for node_id, values in terms.items()})
+        for key, (value, ttl) in (caches or {}).items():
+            pipe.set(key, value, ex=ttl)
+        for name, amount in counters.items():
+            pipe.incrbyfloat(name, amount)
+        for channel, message in messages:
+            pipe.publish(channel, message)
+        results = await pipe.execute()
+        # INCRBYFLOAT replies sit just before the PUBLISH replies
+        start = len(results) - len(messages) - len(counters)
+        replies = results[start:start + len(counters)]
+        return {name: float(value) for name, value in zip(counters, replies, strict=True)}
+
+
+_storage: Dict[str, Storage] = {}
+
+
+def get_storage() -> Storage:
+    """Storage for settings.storage_backend, one instance per backend per process."""
+    backend = settings.storage_backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    if backend not in _storage:
+        if backend == "sqlite":
+            from backend.db.sqlite_storage import SQLiteStorage
+
+            _storage[backend] = SQLiteStorage(settings.sqlite_path)
+        else:
+            _storage[backend] = RedisStorage()
+    return _storage[backend]
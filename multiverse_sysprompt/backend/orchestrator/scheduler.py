@@ -2,11 +2,13 @@ import numpy as np
 from typing import List, Optional, Dict
 from backend.config.settings import settings
 from backend.core.schemas import Node, FocusZone
-from backend.db.node_store import get, save
-from backend.db.redis_client import get_redis
-from backend.db.frontier import push
+from backend.db.node_store import top_by_score
+from backend.db.storage import get_storage
 from backend.core.utils import uuid_str
-from backend.core.embeddings import embed, to_xy
+from backend.core import layout
+from backend.core.embedding_index import EmbeddingIndex
+from backend.core.spatial import points_in_polygon
+from backend.core.embeddings import embed_async, to_xy_many_async
 from backend.core.logger import get_logger
 from backend.agents.mutator import variants as a_variants
 
@@ -18,52 +20,67 @@ def calculate_similarity(vec: List[float], other_vecs: List[List[float]]) -> flo
     if not vec or not other_vecs:
         return 0.0
 
-    vec_array = np.array(vec)
+    vec_array = np.asarray(vec, dtype=np.float32)
     vec_norm = np.linalg.norm(vec_array)
 
     if vec_norm == 0:
         return 0.0
 
-    similarities = []
-    for other in other_vecs:
-        other_array = np.array(other)
-        other_norm = np.linalg.norm(other_array)
+    # One matrix-vector product; zero vectors are left out of the mean
+    others = np.asarray(other_vecs, dtype=np.float32)
+    other_norms = np.linalg.norm(others, axis=1)
+    nonzero = other_norms > 0
+    if not nonzero.any():
+        return 0.0
 
-        if other_norm == 0:
-            continue
+    similarities = (others[nonzero] @ vec_array) / (other_norms[nonzero] * vec_norm)
+    return float(similarities.mean())
 
-        cosine_sim = np.dot(vec_array, other_array) / (vec_norm * other_norm)
-        similarities.append(cosine_sim)
 
-    return np.mean(similarities) if similarities else 0.0
+def novelty_features(
+    vec: Optional[List[float]], index: EmbeddingIndex, reference: Optional[List[str]] = None
+) -> Dict[str, float]:
+    """Similarity to the nearest node and k-NN density of vec, against the whole
+    indexed graph or just the reference node ids."""
+    if not vec:
+        return {"max_sim": 0.0, "density": 0.0}
+    sims = index.similarities(vec, reference)
+    if not len(sims):
+        return {"max_sim": 0.0, "density": 0.0}
+    k = min(settings.novelty_k, len(sims))
+    nearest = np.partition(sims, len(sims) - k)[-k:]
+    return {"max_sim": float(nearest.max()), "density": float(nearest.mean())}
 
 
 def get_top_k_nodes(k: int = 10) -> List[Node]:
-    """Get top K nodes by score from Redis."""
-    r = get_redis()
-    node_keys = r.keys("node:*")
+    """Get top K nodes by score from the score index."""
+    return top_by_score(k)
 
-    nodes = []
-    for key in node_keys[: k * 2]:  # Get more than K to filter
-        node_id = key.replace("node:", "")
-        node = get(node_id)
-        if node and node.score is not None:
-            nodes.append(node)
 
-    # Sort by score and return top K
-    nodes.sort(key=lambda n: n.score or 0.0, reverse=True)
-    return nodes[:k]
+# Terms of a node's priority, in the order frontier entries store them so
+# priorities can be recomputed when the weights change (see orchestrator.weights)
+PRIORITY_TERMS = ("score", "delta", "sim", "max_sim", "density", "depth")
 
 
-def calculate_priority(
+def priority_weights() -> List[float]:
+    """Weight of each of PRIORITY_TERMS under the current settings."""
+    return [
+        1.0,
+        settings.lambda_trend,
+        -settings.lambda_sim,
+        -settings.lambda_max_sim,
+        -settings.lambda_density,
+        -settings.lambda_depth,
+    ]
+
+
+def priority_terms(
     node: Node,
     parent_score: Optional[float] = None,
     top_k_embeddings: Optional[List[List[float]]] = None,
-) -> float:
-    """
-    Calculate priority for a node.
-    Priority = S + λ_trend*ΔS - λ_sim - λ_depth*depth
-    """
+    features: Optional[Dict[str, float]] = None,
+) -> List[float]:
+    """A node's PRIORITY_TERMS values; the priority is their dot product with priority_weights()."""
     # Base score
     score = node.score or 0.0
 
@@ -77,76 +94,69 @@ def calculate_priority(
     if node.emb and top_k_embeddings:
         similarity = calculate_similarity(node.emb, top_k_embeddings)
 
-    # Calculate priority
-    priority = (
-        score
-        + settings.lambda_trend * delta_score
-        - settings.lambda_sim * similarity
-        - settings.lambda_depth * node.depth
-    )
+    # Novelty penalties against the embedding index
+    max_sim = features["max_sim"] if features else 0.0
+    density = features["density"] if features else 0.0
+
+    return [float(score), float(delta_score), float(similarity), max_sim, density, float(node.depth)]
+
+
+def weigh(terms: List[float]) -> float:
+    """Priority of a node's terms under the current weights."""
+    return float(np.dot(terms, priority_weights()))
+
+
+def seed_terms(priority: float) -> List[float]:
+    """Terms of a seed pushed at a fixed priority: the score term, whose weight
+    is always 1, carries it, so re-scoring keeps the seed where it was put."""
+    return [float(priority)] + [0.0] * (len(PRIORITY_TERMS) - 1)
+
+
+def calculate_priority(
+    node: Node,
+    parent_score: Optional[float] = None,
+    top_k_embeddings: Optional[List[List[float]]] = None,
+    features: Optional[Dict[str, float]] = None,
+) -> float:
+    """
+    Calculate priority for a node.
+    Priority = S + λ_trend*ΔS - λ_sim*sim - λ_max_sim*max_sim - λ_density*density - λ_depth*depth
+    with max_sim and density from novelty_features, when given.
+    """
+    terms = priority_terms(node, parent_score, top_k_embeddings, features)
+    priority = weigh(terms)
 
     logger.debug(
         f"Priority calc for {node.id}: "
-        f"score={score:.3f}, delta={delta_score:.3f}, "
-        f"sim={similarity:.3f}, depth={node.depth} -> {priority:.3f}"
+        + ", ".join(f"{name}={value:.3f}" for name, value in zip(PRIORITY_TERMS, terms, strict=True))
+        + f" -> {priority:.3f}"
     )
 
-    return float(priority)  # Convert numpy float to Python float
+    return priority
 
 
 def point_in_polygon(point: List[float], polygon: List[List[float]]) -> bool:
     """Check if a point is inside a polygon using ray casting algorithm."""
-    x, y = point
-    n = len(polygon)
-    inside = False
-
-    p1x, p1y = polygon[0]
-    for i in range(1, n + 1):
-        p2x, p2y = polygon[i % n]
-        if y > min(p1y, p2y):
-            if y <= max(p1y, p2y):
-                if x <= max(p1x, p2x):
-                    if p1y != p2y:
-                        xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                    if p1x == p2x or x <= xinters:
-                        inside = not inside
-        p1x, p1y = p2x, p2y
-
-    return inside
+    return bool(points_in_polygon(np.array([point]), polygon)[0])
 
 
 async def boost_or_seed(payload: FocusZone) -> Dict[str, any]:
     """
     Either boost existing nodes in the polygon or seed new ones if empty.
     """
-    r = get_redis()
+    storage = get_storage()
     polygon = payload.poly
     mode = payload.mode
 
-    # Find all nodes with xy coordinates
-    nodes_in_polygon = []
-    all_node_keys = r.keys("node:*")
-
-    for node_key in all_node_keys:
-        node_id = node_key.replace("node:", "")
-        node = get(node_id)
-
-        if node and node.xy:
-            if point_in_polygon(node.xy, polygon):
-                nodes_in_polygon.append(node)
+    # Nodes in the zone, from the spatial grid index
+    nodes_in_polygon = await storage.nodes_in_polygon(polygon)
 
     if nodes_in_polygon:
-        # Boost existing nodes by multiplying their frontier priority
+        # Boost existing nodes by multiplying their frontier priority, in one script
         boost_factor = 2.0 if mode == "explore" else 1.5
+        boosted = await storage.boost(nodes_in_polygon, boost_factor)
 
-        for node in nodes_in_polygon:
-            # Get current priority and boost it
-            current_priority = r.zscore("frontier", node.id)
-            if current_priority is not None:
-                new_priority = float(current_priority) * boost_factor
-                push(node.id, new_priority)
-
-        logger.info(f"Boosted {len(nodes_in_polygon)} nodes in focus zone")
+        logger.info(f"Boosted {boosted} of {len(nodes_in_polygon)} nodes in focus zone")
         return {"status": "boosted", "nodes_affected": len(nodes_in_polygon)}
     else:
         # No nodes in polygon - seed a new one
@@ -165,8 +175,9 @@ async def boost_or_seed(payload: FocusZone) -> Dict[str, any]:
         seed_text = prompt_variants[0]
 
         # Create new node
-        emb = embed(seed_text)
-        xy = list(to_xy(emb))
+        emb = await embed_async(seed_text)
+        await layout.sync()
+        xy = list((await to_xy_many_async([emb]))[0])
 
         # Adjust xy to be near centroid
         # Simple approach: blend embedding projection with centroid
@@ -183,8 +194,8 @@ async def boost_or_seed(payload: FocusZone) -> Dict[str, any]:
         )
 
         # Save and push to frontier
-        save(node)
-        push(node.id, 1.0)  # High priority for new exploration
+        await storage.save(node)
+        await storage.push(node.id, 1.0, seed_terms(1.0))  # High priority for new exploration
 
         logger.info(f"Seeded new node {node.id} in focus zone")
         return {"status": "seeded", "nodes_affected": 1}
@@ -1,38 +1,79 @@
 import asyncio
-from typing import List, Dict
-from backend.db.frontier import pop_batch, push, size as frontier_size
-from backend.db.node_store import get, save
-from backend.db.redis_client import get_redis
+import signal
+from typing import List, Dict, Optional, Tuple
+import openai
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+from tenacity import RetryError
+from backend.db.storage import get_storage
+from backend.db.write_buffer import WriteBuffer, writer
 from backend.agents.system_prompt_mutator import mutate_system_prompt
-from backend.core.conversation_generator import evaluate_system_prompt
+from backend.core.conversation_generator import evaluate_system_prompt, evaluate_system_prompts_staged
 from backend.core.schemas import Node, GraphUpdate
 from backend.core.utils import uuid_str
 from backend.core.logger import get_logger
-from backend.core.embeddings import embed, to_xy, refit_reducer_if_needed
-from backend.orchestrator.scheduler import calculate_priority, get_top_k_nodes
+from backend.config.settings import settings
+from backend.core import layout
+from backend.core.embedding_index import EmbeddingIndex
+from backend.core.embeddings import embed_many_async, projection_stats, refit_reducer_if_needed, to_xy_many_async
+from backend.core.embedding_cache import cache as embedding_cache
+from backend.orchestrator import weights
+from backend.orchestrator.policies import SelectionPolicy, get_policy
+from backend.orchestrator.scheduler import novelty_features, priority_terms, weigh
 
 logger = get_logger(__name__)
+storage = get_storage()
 
 BATCH_SIZE = 20  # Process 20 system prompt nodes simultaneously
 
+# Every node's normalized embedding, for novelty against the whole graph
+index = EmbeddingIndex()
 
-async def process_system_prompt_variant(system_prompt_variant: str, parent: Node, top_k_embeddings: List[List[float]]) -> Node:
-    """Process a single system prompt variant: generate test conversations → evaluate → save."""
+# Errors another attempt may not hit: rate limits and lost connections (also
+# once the LLM client's own retries ran out), timeouts and cancellation. A
+# node failing with anything else, e.g. a PolicyError, is dead-lettered.
+TRANSIENT_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+    RetryError,
+    TimeoutError,
+    ConnectionError,
+    RedisConnectionError,
+    RedisTimeoutError,
+    asyncio.CancelledError,
+)
+
+
+async def place_variants(prompts: List[str]) -> List[Tuple[List[float], List[float]]]:
+    """Embedding and 2D coordinates of each variant: one embeddings request and
+    one projection, run off the event loop, for all siblings."""
+    embeddings = await embed_many_async(prompts)
+    coords = await to_xy_many_async(embeddings)
+    return [(emb, list(xy)) for emb, xy in zip(embeddings, coords, strict=True)]
+
+
+async def process_system_prompt_variant(system_prompt_variant: str, parent: Node, top_k_embeddings: List[List[float]], placements: Optional[asyncio.Future] = None, position: int = 0, reference: Optional[List[str]] = None, evaluation: Optional[Dict] = None) -> Node:
+    """Process a single system prompt variant: generate test conversations → evaluate → save.
+    
+    A staged evaluation done for all siblings is passed in as evaluation."""
     child_id = uuid_str()
     
     try:
         # Evaluate the system prompt by generating multiple test conversations
-        logger.debug(f"  🧪 Evaluating system prompt variant: '{system_prompt_variant[:50]}...'")
-        
-        evaluation_results = await evaluate_system_prompt(system_prompt_variant)
+        if evaluation is None:
+            logger.debug(f"  🧪 Evaluating system prompt variant: '{system_prompt_variant[:50]}...'")
+            evaluation = await evaluate_system_prompt(system_prompt_variant)
+        evaluation_results = evaluation
         
         avg_score = evaluation_results['avg_score']
         conversation_samples = evaluation_results['conversation_samples']
         sample_count = evaluation_results['sample_count']
         
-        # Generate embedding and 2D projection of the system prompt text
-        emb = embed(system_prompt_variant)
-        xy = list(to_xy(emb))
+        # Embedding and 2D projection of the system prompt text, computed for
+        # all siblings while they were evaluated
+        if placements is None:
+            placements = asyncio.ensure_future(place_variants([system_prompt_variant]))
+        emb, xy = (await placements)[position]
         
         # Create child node with system prompt data
         child = Node(
@@ -46,23 +87,29 @@ async def process_system_prompt_variant(system_prompt_variant: str, parent: Node
             parent=parent.id,
             emb=emb,
             xy=xy,
+            eval_rung=evaluation_results.get('eval_rung'),
+            eval_confidence=evaluation_results.get('eval_confidence'),
+            score_ci=evaluation_results.get('score_ci'),
         )
         
         # Calculate priority using scheduler (same formula, different meaning)
-        priority = calculate_priority(
-            child, parent_score=parent.score, top_k_embeddings=top_k_embeddings
+        terms = priority_terms(
+            child, parent_score=parent.score, top_k_embeddings=top_k_embeddings,
+            features=novelty_features(emb, index, reference),
         )
+        priority = weigh(terms)
         
-        # Save child and push to frontier with calculated priority
-        save(child)
-        push(child.id, priority)
+        # Save child and push to frontier with calculated priority; inside a
+        # batch these are queued on its write buffer and flushed together
+        await writer().save(child)
+        await writer().push(child.id, priority, terms)
+        index.add(child.id, emb)
         
         # Publish GraphUpdate to Redis for WebSocket broadcast
         graph_update = GraphUpdate(
             id=child.id, xy=child.xy, score=child.score, parent=child.parent
         )
-        r = get_redis()
-        r.publish("graph_updates", graph_update.model_dump_json())
+        await writer().publish("graph_updates", graph_update.model_dump_json())
         
         # Enhanced logging to show system prompt evaluation results
         prompt_preview = system_prompt_variant[:70] + "..." if len(system_prompt_variant) > 70 else system_prompt_variant
@@ -71,7 +118,7 @@ async def process_system_prompt_variant(system_prompt_variant: str, parent: Node
         
         logger.info(f"  ✅ {child_id[:8]}... AVG_SCORE={avg_score:.3f} priority={priority:.3f}")
         logger.info(f"     📝 System prompt: '{prompt_preview}'")
-        logger.info(f"     📊 Results: {sample_count} conversations, {success_rate:.1%} success, {avg_length:.1f} avg turns")
+        logger.info(f"     📊 Results: {sample_count} conversations, {success_rate:.1%} success, {avg_length:.1f} avg turns, confidence={child.eval_confidence or 0.0:.0%}")
         return child
         
     except Exception as e:
@@ -79,11 +126,12 @@ async def process_system_prompt_variant(system_prompt_variant: str, parent: Node
         raise
 
 
-async def process_system_prompt_node(parent_id: str, top_k_embeddings: List[List[float]]) -> List[Node]:
+async def process_system_prompt_node(parent_id: str, top_k_embeddings: List[List[float]], parent: Optional[Node] = None, reference: Optional[List[str]] = None) -> List[Node]:
     """Process a single system prompt node: generate variants and evaluate them in parallel."""
     
-    # Get parent node
-    parent = get(parent_id)
+    # Get parent node unless the batch already prefetched it
+    if parent is None:
+        parent = await storage.get(parent_id)
     if not parent:
         logger.error(f"❌ Parent system prompt node {parent_id[:8]}... not found")
         return []
@@ -102,17 +150,27 @@ async def process_system_prompt_node(parent_id: str, top_k_embeddings: List[List
         performance_data = {
             'avg_score': getattr(parent, 'avg_score', 0.0),
             'sample_count': getattr(parent, 'sample_count', 0),
-            'conversation_samples': getattr(parent, 'conversation_samples', [])
         }
         
         system_prompt_variants = await mutate_system_prompt(parent.system_prompt, performance_data, k=3)
         logger.info(f"  🧬 Generated {len(system_prompt_variants)} system prompt variants")
         
+        # Embed and project all variants at once while they are evaluated
+        # (marked retrieved so a failure nobody awaited is not reported twice)
+        placements = asyncio.ensure_future(place_variants(system_prompt_variants))
+        placements.add_done_callback(lambda f: f.cancelled() or f.exception())
+        
+        # Staged evaluation: a cheap rung for every variant, the full one only
+        # for the best (successive halving)
+        evaluations = [None] * len(system_prompt_variants)
+        if settings.staged_evaluation:
+            evaluations = await evaluate_system_prompts_staged(system_prompt_variants)
+        
         # Process all 3 system prompt variants in parallel
         # Note: Each variant will generate and evaluate multiple test conversations
         variant_tasks = [
-            process_system_prompt_variant(system_prompt_variant, parent, top_k_embeddings)
-            for system_prompt_variant in system_prompt_variants
+            process_system_prompt_variant(system_prompt_variant, parent, top_k_embeddings, placements, i, reference, evaluations[i])
+            for i, system_prompt_variant in enumerate(system_prompt_variants)
         ]
         
         children = await asyncio.gather(*variant_tasks, return_exceptions=True)
@@ -129,27 +187,63 @@ async def process_system_prompt_node(parent_id: str, top_k_embeddings: List[List
         
     except Exception as e:
         logger.error(f"❌ Failed to process system prompt node {parent_id[:8]}...: {e}")
-        return []
+        raise
 
 
-async def process_batch(node_ids: List[str]) -> int:
+async def process_batch(node_ids: List[str], policy: Optional[SelectionPolicy] = None) -> int:
     """Process a batch of system prompt nodes in parallel."""
     if not node_ids:
         return 0
     
     logger.info(f"🚀 Processing batch of {len(node_ids)} system prompt nodes")
     
+    # Project the batch with the latest published layout
+    await layout.sync()
+    
     # Get top K nodes for similarity calculation (shared across batch)
-    top_k_nodes = get_top_k_nodes(k=10)
+    top_k_nodes = await storage.top_by_score(10, fields=["emb"])
     top_k_embeddings = [n.emb for n in top_k_nodes if n.emb]
     
+    # Pick up nodes other processes saved; novelty is measured against every
+    # node, or only the top K with novelty_reference="top_k"
+    await index.sync(storage)
+    reference = [n.id for n in top_k_nodes] if settings.novelty_reference == "top_k" else None
+    
+    # Prefetch all parents in one pipelined round trip
+    parents = {node.id: node for node in await storage.get_many(node_ids)}
+    
     # Process all system prompt nodes in parallel
     node_tasks = [
-        process_system_prompt_node(node_id, top_k_embeddings)
+        process_system_prompt_node(node_id, top_k_embeddings, parent=parents.get(node_id), reference=reference)
         for node_id in node_ids
     ]
     
-    results = await asyncio.gather(*node_tasks, return_exceptions=True)
+    # Keep the batch's leases alive while its LLM calls are in flight, and
+    # flush its writes before any parent is acked
+    keeper = asyncio.create_task(keep_leases(node_ids))
+    try:
+        async with WriteBuffer(storage, weigh=weigh):
+            results = await asyncio.gather(*node_tasks, return_exceptions=True)
+    finally:
+        keeper.cancel()
+    
+    # Transient failures go back to the frontier for another attempt, up to
+    # settings.frontier_max_attempts; other failures are dead-lettered at once
+    failed = {node_id: result for node_id, result in zip(node_ids, results, strict=True) if isinstance(result, BaseException)}
+    await storage.ack([node_id for node_id in node_ids if node_id not in failed])
+    if failed:
+        transient = [node_id for node_id, error in failed.items() if isinstance(error, TRANSIENT_ERRORS)]
+        dead = await storage.fail(transient)
+        dead += await storage.fail([node_id for node_id in failed if node_id not in transient], retry=False)
+        logger.warning(f"↩️  Re-queued {len(failed) - len(dead)} failed nodes, dead-lettered {len(dead)}")
+    
+    # Let the selection policy back the new children's scores up the tree
+    if policy is not None:
+        await policy.observe(storage, {
+            node_id: [child.score for child in result if child.score is not None]
+            for node_id, result in zip(node_ids, results, strict=True)
+            if isinstance(result, list)
+        })
     
     # Count total children created
     total_children = 0
@@ -157,32 +251,48 @@ async def process_batch(node_ids: List[str]) -> int:
         if isinstance(result, list):
             total_children += len(result)
     
-    logger.info(f"🎉 Batch complete: {len(node_ids)} system prompt nodes → {total_children} children, frontier={frontier_size()}")
+    logger.info(f"🎉 Batch complete: {len(node_ids)} system prompt nodes → {total_children} children, frontier={await storage.frontier_size()}")
     
-    # Refit UMAP reducer if we have enough new data
-    refit_reducer_if_needed()
+    # Refit UMAP in the background if we have enough new data
+    await refit_reducer_if_needed()
     
     return total_children
 
 
+async def keep_leases(node_ids: List[str]) -> None:
+    """Renew the leases on a claimed batch until it is cancelled."""
+    while True:
+        await asyncio.sleep(settings.frontier_lease_seconds / 3)
+        await storage.extend_leases(node_ids)
+
+
 async def log_worker_heartbeat():
     """Log worker status every 15 seconds with velocity tracking."""
-    r = get_redis()
-    last_node_count = 0
+    last_total = 0
     
     while True:
         await asyncio.sleep(15)  # Faster for parallel processing
         
-        f_size = frontier_size()
-        node_keys = r.keys("node:*")
-        node_count = len(node_keys)
+        # Reap leases left behind by crashed or killed workers
+        requeued = await storage.requeue_expired()
+        if requeued:
+            logger.warning(f"♻️  Re-queued {len(requeued)} nodes with expired leases")
+        
+        # Keep the frontier within its size and per-depth/per-root bounds
+        pruned = await storage.prune_frontier()
+        if pruned["evicted"]:
+            logger.info(f"✂️  Evicted {pruned['evicted']} frontier nodes, removed {pruned['removed']} leaves")
+        
+        f_size = await storage.frontier_size()
+        in_flight = await storage.inflight_size()
+        total = await storage.node_count()
         
         # Calculate velocity
-        nodes_created = node_count - last_node_count
+        nodes_created = total - last_total
         velocity = nodes_created / 15  # nodes per second
-        last_node_count = node_count
+        last_total = total
         
-        logger.info(f"💓 SYSTEM PROMPT HEARTBEAT: frontier={f_size} system_prompt_nodes={node_count} velocity={velocity:.1f}n/s")
+        logger.info(f"💓 SYSTEM PROMPT HEARTBEAT: frontier={f_size} in_flight={in_flight} system_prompt_nodes={total} velocity={velocity:.1f}n/s emb_cache_hits={embedding_cache.stats()['hit_rate']:.0%} xy_ms={projection_stats()['ms_per_call']:.1f}")
 
 
 async def main():
@@ -193,11 +303,23 @@ async def main():
     # Start heartbeat task
     heartbeat_task = asyncio.create_task(log_worker_heartbeat())
     
+    # Use the scheduler weights set at runtime, and follow later changes
+    await weights.load()
+    weights_task = asyncio.create_task(weights.follow())
+    
+    # Pick nodes to expand with the configured selection policy
+    policy = get_policy()
+    logger.info(f"🧭 Selection policy: {policy.name}")
+    
+    # /worker/stop sends SIGTERM; cancel so the current batch is handed back
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    node_ids: List[str] = []
+    
     try:
         while True:
             try:
-                # Pop a batch of high-priority system prompt nodes
-                node_ids = pop_batch(BATCH_SIZE)
+                # Claim the batch of system prompt nodes the selection policy picks
+                node_ids = await policy.select(storage, BATCH_SIZE)
                 
                 if not node_ids:
                     # No system prompt nodes available, wait a bit
@@ -206,7 +328,8 @@ async def main():
                     continue
                 
                 # Process the entire batch of system prompt nodes in parallel
-                children_created = await process_batch(node_ids)
+                children_created = await process_batch(node_ids, policy)
+                node_ids = []
                 
                 if children_created > 0:
                     # Small delay before next batch to prevent overwhelming
@@ -217,15 +340,23 @@ async def main():
                 break
             except Exception as e:
                 logger.error(f"Worker error: {e}")
+                # Counted as a failed attempt, so a batch that keeps failing is given up on
+                await storage.fail(node_ids)
+                node_ids = []
                 await asyncio.sleep(1)
                 
     finally:
-        # Cancel heartbeat task
-        heartbeat_task.cancel()
-        try:
-            await heartbeat_task
-        except asyncio.CancelledError:
-            pass
+        # Hand any unfinished claim back to the frontier; acked ids are ignored
+        if node_ids:
+            await storage.nack(node_ids)
+        
+        # Cancel heartbeat and weights tasks
+        for task in (heartbeat_task, weights_task):
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
 
 
 if __name__ == "__main__":
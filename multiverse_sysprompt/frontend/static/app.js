@@ -45,6 +45,12 @@ class SystemPromptVisualizer {
         this.ws.onmessage = (event) => {
             try {
                 const update = JSON.parse(event.data);
+                if (update.type === 'layout_changed') {
+                    // Every node moved at once: reload the graph instead of patching it
+                    this.addToActivityLog(`🗺️ Layout v${update.version} (${update.nodes} nodes)`, 'connection');
+                    this.loadInitialData();
+                    return;
+                }
                 this.handleNodeUpdate(update);
             } catch (error) {
                 console.error('Failed to parse WebSocket message:', error);
@@ -10,6 +10,7 @@ from backend.core.schemas import Node
 from backend.core.utils import uuid_str
 from backend.db.node_store import save
 from backend.db.frontier import push
+from backend.orchestrator.scheduler import seed_terms
 from backend.core.logger import get_logger
 from backend.core.embeddings import fit_reducer, embed, to_xy
 
@@ -42,7 +43,7 @@ def main():
 
     # Save node and push to frontier
     save(root)
-    push(root.id, 1.0)
+    push(root.id, 1.0, seed_terms(1.0))
 
     logger.info(f"Seeded root node {root.id} with system prompt: {root_system_prompt[:60]}...")
     print(f"Root system prompt node created: {root.id}")
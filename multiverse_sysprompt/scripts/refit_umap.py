@@ -1,8 +1,16 @@
 #!/usr/bin/env python3
 """
 Script to refit UMAP reducer on existing conversation data and update all node coordinates.
+
+The reducer is published as the next layout version together with every
+node's new xy (see backend/core/layout.py); running workers switch to it and
+connected clients reload the graph.
+
+Pass a snapshot directory (see scripts/snapshot.py) to fit on its memory-mapped
+embedding matrix instead of decoding every embedding from Redis.
 """
 
+import argparse
 import asyncio
 import sys
 import os
@@ -10,55 +18,40 @@ import os
 # Add the project root to the Python path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from backend.core.embeddings import fit_reducer, to_xy
-from backend.db.node_store import get_all_nodes, save
+from backend.core import layout
+from backend.db.snapshot import load_snapshot
 from backend.core.logger import get_logger
 
 logger = get_logger(__name__)
 
 
-async def refit_all_nodes():
-    """Refit UMAP on all existing nodes and update their coordinates."""
-    
-    # Get all nodes
-    nodes = get_all_nodes()
-    if len(nodes) < 5:
-        print(f"❌ Need at least 5 nodes to refit UMAP, only found {len(nodes)}")
+async def refit_all_nodes(snapshot_dir: str | None = None):
+    """Refit UMAP on all existing nodes and publish their new coordinates."""
+    ids = embeddings = None
+    if snapshot_dir:
+        # Straight from the snapshot matrix; nodes without an embedding have emb_row -1
+        table, matrix = load_snapshot(snapshot_dir)
+        rows = [
+            (node_id, row)
+            for node_id, row in zip(table["id"].to_pylist(), table["emb_row"].to_pylist(), strict=True)
+            if row >= 0
+        ]
+        ids = [node_id for node_id, _ in rows]
+        embeddings = matrix[[row for _, row in rows]]
+        print(f"📦 Using snapshot embeddings from {snapshot_dir}")
+
+    print("🔧 Refitting UMAP on existing embeddings...")
+    version = await layout.refit(ids, embeddings)
+    if version is None:
+        print(f"❌ Need at least {layout.MIN_NODES} embedded nodes, or another refit published first")
         return
-    
-    print(f"📊 Found {len(nodes)} nodes")
-    
-    # Extract existing embeddings
-    embeddings = [node.emb for node in nodes if node.emb]
-    if len(embeddings) < 5:
-        print(f"❌ Need at least 5 embeddings to refit UMAP, only found {len(embeddings)}")
-        return
-    
-    print(f"🔧 Refitting UMAP on {len(embeddings)} existing embeddings...")
-    
-    # Fit UMAP reducer using existing embeddings (much faster)
-    fit_reducer(embeddings=embeddings)
-    
-    print("📍 Updating all node coordinates with new UMAP projection...")
-    
-    # Update all node coordinates
-    updated_count = 0
-    for node in nodes:
-        if node.emb:
-            old_xy = node.xy
-            new_xy = list(to_xy(node.emb))
-            
-            if old_xy != new_xy:
-                node.xy = new_xy
-                save(node)
-                updated_count += 1
-                
-                if updated_count <= 5:  # Show first few updates
-                    print(f"  📌 {node.id[:8]}... moved from ({old_xy[0]:.2f}, {old_xy[1]:.2f}) to ({new_xy[0]:.2f}, {new_xy[1]:.2f})")
-    
-    print(f"✅ Updated coordinates for {updated_count} nodes")
+
+    print(f"✅ Published layout version {version} with updated coordinates for every node")
     print("🎯 UMAP refit complete! Visualization should now show semantic clustering.")
 
 
 if __name__ == "__main__":
-    asyncio.run(refit_all_nodes())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Refit UMAP and update node coordinates")
+    parser.add_argument("--snapshot", help="snapshot directory to fit on")
+    args = parser.parse_args()
+    asyncio.run(refit_all_nodes(args.snapshot))
\ No newline at end of file
@@ -0,0 +1,66 @@
+import itertools
+
+import pytest
+
+from backend.config.settings import settings
+from backend.core import conversation_generator
+from backend.core.confidence import mean_ci, t_quantile
+from backend.core.conversation_generator import evaluate_system_prompt
+from backend.core.evaluation import comprehensive_system_prompt_evaluation
+
+
+def _fake_conversations(monkeypatch, scores):
+    scores = itertools.cycle(scores)
+    calls = []
+
+    async def fake_conversation(system_prompt, scenario):
+        calls.append(scenario["scenario_type"])
+        turns = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hmm"}] * 12
+        return turns, next(scores)
+
+    monkeypatch.setattr(conversation_generator, "generate_single_conversation", fake_conversation)
+    return calls
+
+
+def test_confidence_interval():
+    assert t_quantile(0.975, 5) == pytest.approx(2.5706, abs=1e-3)
+    low, high = mean_ci([0.3, 0.5, 0.4, 0.6], level=0.95)
+    half = 3.1824 * 0.1290994 / 2
+    assert (low, high) == pytest.approx((0.45 - half, 0.45 + half), abs=1e-3)
+    assert mean_ci([0.7]) == (0.0, 1.0)
+
+
+@pytest.mark.asyncio
+async def test_sampling_stops_once_the_interval_is_narrow(monkeypatch):
+    monkeypatch.setattr(settings, "eval_ci_epsilon", 0.1)
+    calls = _fake_conversations(monkeypatch, [0.5, 0.52, 0.48])
+
+    result = await evaluate_system_prompt("steady")
+    assert result["sample_count"] == 3 and len(calls) == 3
+    assert result["score_ci"][1] - result["score_ci"][0] < 0.1
+
+
+@pytest.mark.asyncio
+async def test_noisy_scores_sample_up_to_the_budget(monkeypatch):
+    monkeypatch.setattr(settings, "eval_ci_epsilon", 0.1)
+    monkeypatch.setattr(settings, "eval_max_samples", 8)
+    monkeypatch.setattr(settings, "eval_sample_wave", 3)
+    calls = _fake_conversations(monkeypatch, [0.1, 0.9])
+
+    result = await evaluate_system_prompt("noisy")
+    # 3 scenarios, a wave of 3, then the 2 left in the budget, cycling scenarios
+    assert result["sample_count"] == 8
+    assert calls[3:6] == ["cold_outreach", "portfolio_diversification", "post_rugpull_trauma"]
+    assert result["score_ci"][1] - result["score_ci"][0] > 0.1
+    # A fixed sample, as lower successive-halving rungs request
+    assert (await evaluate_system_prompt("noisy", max_samples=3))["sample_count"] == 3
+
+
+@pytest.mark.asyncio
+async def test_comprehensive_rounds_stop_early(monkeypatch):
+    monkeypatch.setattr(settings, "eval_round_wave", 2)
+    calls = _fake_conversations(monkeypatch, [0.6, 0.62, 0.61])
+
+    result = await comprehensive_system_prompt_evaluation("steady", num_tests=5)
+    assert result["num_test_rounds"] == 2 and len(calls) == 6
+    assert result["score_ci"][0] < 0.61 < result["score_ci"][1]
@@ -0,0 +1,73 @@
+import uuid
+import zlib
+
+import pytest
+
+from backend.config.settings import settings
+from backend.core.schemas import Node
+from backend.db import async_node_store
+from backend.db.node_store import SAMPLES_PREFIX, get, get_all_nodes, load_samples, save, r_bin
+
+
+def _sample_node(n_samples: int) -> Node:
+    return Node(
+        id=str(uuid.uuid4()),
+        system_prompt="Be persuasive",
+        conversation_samples=[
+            {"conversation": [{"role": "user", "content": f"turn {i}"}], "score": i / 10}
+            for i in range(n_samples)
+        ],
+        score=0.5,
+        depth=0,
+    )
+
+
+def test_samples_stored_out_of_line():
+    node = _sample_node(3)
+    save(node)
+
+    assert not r_bin.hexists(f"node:{node.id}", "conversation_samples")
+    blob = r_bin.get(SAMPLES_PREFIX + node.id)
+    assert blob is not None
+    assert len(zlib.decompress(blob)) > 0
+
+    # Plain reads leave the samples in Redis
+    assert get(node.id).conversation_samples == []
+    assert get_all_nodes()[0].conversation_samples == []
+
+    loaded = get(node.id, with_samples=True)
+    assert [s["score"] for s in loaded.conversation_samples] == [0.2, 0.1, 0.0]
+    assert load_samples(node.id) == loaded.conversation_samples
+
+
+def test_samples_retention_keeps_best():
+    node = _sample_node(settings.samples_retention + 3)
+    save(node)
+
+    samples = load_samples(node.id)
+    assert len(samples) == settings.samples_retention
+    assert samples[0]["score"] == max(s["score"] for s in node.conversation_samples)
+
+
+def test_resave_without_samples_keeps_blob():
+    node = _sample_node(2)
+    save(node)
+
+    loaded = get(node.id)
+    loaded.score = 0.9
+    save(loaded)
+
+    assert len(load_samples(node.id)) == 2
+    assert get(node.id).score == 0.9
+
+
+@pytest.mark.asyncio
+async def test_async_get_with_samples():
+    node = _sample_node(2)
+    await async_node_store.save(node)
+
+    assert (await async_node_store.get(node.id)).conversation_samples == []
+    loaded = await async_node_store.get(node.id, with_samples=True)
+    assert len(loaded.conversation_samples) == 2
+    assert await async_node_store.load_samples(node.id) == loaded.conversation_samples
+    assert await async_node_store.load_samples("missing") == []
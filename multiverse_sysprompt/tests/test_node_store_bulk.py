@@ -0,0 +1,25 @@
+from backend.db.node_store import save_many, get_many, iter_nodes, get_all_nodes
+from backend.core.schemas import Node
+import uuid
+
+
+def test_save_many_get_many_roundtrip():
+    nodes = [
+        Node(id=str(uuid.uuid4()), system_prompt=f"p{i}", depth=i % 3, score=i / 10, xy=[i, -i])
+        for i in range(7)
+    ]
+    save_many(nodes, batch_size=3)
+
+    # Order follows the requested ids and missing ids are skipped
+    ids = [n.id for n in reversed(nodes)] + ["missing"]
+    loaded = get_many(ids, batch_size=2)
+    assert loaded == list(reversed(nodes))
+
+
+def test_iter_nodes_streams_everything():
+    nodes = [Node(id=str(uuid.uuid4()), system_prompt="hello", depth=0) for _ in range(25)]
+    save_many(nodes)
+
+    streamed = list(iter_nodes(batch_size=4))
+    assert sorted(n.id for n in streamed) == sorted(n.id for n in nodes)
+    assert len(get_all_nodes()) == 25
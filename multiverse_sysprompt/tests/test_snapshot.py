@@ -0,0 +1,29 @@
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from backend.core.schemas import Node
+from backend.db.node_store import get, get_all_nodes, save_many
+from backend.db.redis_client import get_redis
+from backend.db.snapshot import export_snapshot, import_snapshot, load_snapshot
+
+
+def test_snapshot_roundtrip_keeps_samples(tmp_path):
+    samples = [{"conversation": [{"role": "user", "content": "hi"}], "score": 0.6}]
+    nodes = [
+        Node(id="root", system_prompt="Be kind", depth=0, score=0.6, conversation_samples=samples, emb=[0.5, 0.25]),
+        Node(id="child", system_prompt="Be kinder", depth=1, parent="root", sample_count=3, emb=[1.0, -1.0]),
+    ]
+    save_many(nodes)
+
+    manifest = export_snapshot(str(tmp_path))
+    assert manifest["nodes"] == 2
+    _, embeddings = load_snapshot(str(tmp_path))
+    assert embeddings.shape == (2, 2)
+
+    get_redis().flushdb()
+    assert import_snapshot(str(tmp_path)) == 2
+
+    assert get("root", with_samples=True).conversation_samples == samples
+    assert get("child").emb == [1.0, -1.0]
+    assert len(get_all_nodes()) == 2
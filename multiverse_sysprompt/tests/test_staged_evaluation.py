@@ -0,0 +1,42 @@
+import uuid
+
+import pytest
+
+from backend.config.settings import settings
+from backend.core import conversation_generator
+from backend.core.conversation_generator import evaluate_system_prompts_staged
+from backend.core.schemas import Node
+from backend.db.node_store import get, save
+
+QUALITY = {"weak": 0.2, "good": 0.8, "fair": 0.5}
+
+
+@pytest.mark.asyncio
+async def test_successive_halving_promotes_best_sibling(monkeypatch):
+    monkeypatch.setattr(settings, "eval_first_rung_scenarios", 1)
+    monkeypatch.setattr(settings, "eval_first_rung_turns", 4)
+    monkeypatch.setattr(settings, "eval_halving_eta", 3)
+    calls = []
+
+    async def fake_conversation(system_prompt, scenario):
+        calls.append((system_prompt, scenario["scenario_type"], scenario["max_turns"]))
+        turns = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "no"}]
+        return turns * 2, QUALITY[system_prompt]
+
+    monkeypatch.setattr(conversation_generator, "generate_single_conversation", fake_conversation)
+    results = await evaluate_system_prompts_staged(["weak", "good", "fair"])
+
+    # Everyone runs one scenario capped at 4 turns; only "good" gets the full evaluation
+    assert sorted(c for c in calls if c[2] == 4) == [("fair", "cold_outreach", 4), ("good", "cold_outreach", 4), ("weak", "cold_outreach", 4)]
+    assert sorted(c for c in calls if c[2] != 4) == [("good", "cold_outreach", 8), ("good", "portfolio_diversification", 6), ("good", "post_rugpull_trauma", 10)]
+    assert [r["eval_rung"] for r in results] == [0, 1, 0]
+    assert [r["sample_count"] for r in results] == [1, 3, 1]
+    assert results[1]["eval_confidence"] == 1.0
+    assert results[0]["eval_confidence"] == pytest.approx(4 / 24)
+
+
+def test_eval_fields_roundtrip():
+    node = Node(id=str(uuid.uuid4()), system_prompt="Be brief", score=0.4, depth=1, eval_rung=0, eval_confidence=0.25)
+    save(node)
+    loaded = get(node.id)
+    assert (loaded.eval_rung, loaded.eval_confidence) == (0, 0.25)
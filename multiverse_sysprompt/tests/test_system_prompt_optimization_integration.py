@@ -172,7 +172,7 @@ async def test_schema_compatibility():
     
     # Save and retrieve
     save(test_node)
-    retrieved = get(test_node.id)
+    retrieved = get(test_node.id, with_samples=True)
     
     assert retrieved is not None
     assert retrieved.system_prompt == test_node.system_prompt